@@ -0,0 +1,240 @@
+"""
+Backtest hors-ligne : rejoue un CSV horaire (ds, y, T, RH, NO2(GT)) à travers le
+pipeline de prédiction avec une origine glissante.
+
+Pour chaque origine t : contexte = les `n_context` heures avant t (comme le contexte
+de `build_future_df`), régresseurs des `horizon` pas futurs = valeurs observées
+(régresseurs "parfaits"), cible = y observé. Les fenêtres sont réparties par lots
+entre plusieurs process ; chaque worker charge le modèle UNE fois et prédit un lot
+entier en une seule passe (`forecast_frames`).
+
+    python -m app.backtest --csv models/train_df_deploy.csv --horizon 6 --workers 4
+"""
+import argparse
+import json
+import multiprocessing as mp
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from app.model_loader import INFERENCE_BACKEND, WARM_SNAPSHOT, ensure_model_loaded
+from app.services.features import COLUMNS, N_CONTEXT, build_future_df
+from app.services.inference import forecast_frames, postprocess_yhat
+
+MODEL_PATH = "models/neuralprophet_co_deployable.pkl"
+TRAIN_CSV = "models/train_df_deploy.csv"
+CLIP_LO, CLIP_HI = 0.0, 15.0
+
+# État par worker (initialisé une fois par process)
+_W: Dict[str, object] = {}
+
+
+def load_series(csv_path: str) -> pd.DataFrame:
+    df = pd.read_csv(csv_path)
+    df["ds"] = pd.to_datetime(df["ds"], errors="coerce")
+    df = df.dropna(subset=["ds"]).sort_values("ds").drop_duplicates("ds")
+    # Axe horaire complet : les trous deviennent des NaN (fenêtres ignorées)
+    df = df.set_index("ds").asfreq("h").reset_index()
+    return df[["ds"] + COLUMNS]
+
+
+def origins_for(values: np.ndarray, n_context: int, horizon: int, stride: int) -> np.ndarray:
+    """Origines t dont le contexte [t-n_context, t) et les pas [t, t+horizon) sont complets."""
+    n = len(values)
+    candidates = np.arange(n_context, n - horizon + 1, stride)
+    if len(candidates) == 0:
+        return candidates
+    # Lignes entièrement observées, puis fenêtres sans trou (somme glissante)
+    ok = ~np.isnan(values).any(axis=1)
+    bad = np.concatenate([[0], np.cumsum(~ok)])
+    window_bad = bad[candidates + horizon] - bad[candidates - n_context]
+    return candidates[window_bad == 0]
+
+
+def _init_worker(values, ds, n_context, horizon, dates, csv_path, model_args, torch_threads):
+    try:
+        import torch
+
+        torch.set_num_threads(torch_threads)
+    except ImportError:
+        pass
+    _W.update(values=values, ds=ds, n_context=n_context, horizon=horizon, dates=dates, csv_path=csv_path)
+    _W["model"] = ensure_model_loaded(*model_args)
+
+
+def _frame(t: int) -> pd.DataFrame:
+    values, n_context, horizon = _W["values"], _W["n_context"], _W["horizon"]
+    future = [
+        {"T": float(r[1]), "RH": float(r[2]), "NO2(GT)": float(r[3])}
+        for r in values[t:t + horizon]
+    ]
+    df = build_future_df(
+        _W["csv_path"],
+        future[0],
+        n_context=n_context,
+        horizon=horizon,
+        future_feats=future,
+        context=values[t - n_context:t],
+    )
+    if _W["dates"] == "historical":
+        df["ds"] = _W["ds"][t - n_context:t + horizon]
+    return df
+
+
+def _run_chunk(origins: List[int]) -> np.ndarray:
+    """Lignes (origine, pas, y observé, yhat brut) pour un lot d'origines."""
+    horizon = _W["horizon"]
+    frames = {str(t): _frame(t) for t in origins}
+    trajs = forecast_frames(_W["model"], frames, {k: horizon for k in frames})
+    values = _W["values"]
+    out = np.empty((len(origins) * horizon, 4), dtype=np.float64)
+    i = 0
+    for t in origins:
+        yhat = trajs[str(t)]["yhat1"].to_numpy(dtype=np.float64)
+        for k in range(horizon):
+            out[i] = (t, k + 1, values[t + k, 0], yhat[k])
+            i += 1
+    return out
+
+
+def score(rows: np.ndarray) -> dict:
+    """MAE / RMSE (sortie clippée comme en production) et couverture du clip [0, 15]."""
+    y, raw = rows[:, 2], rows[:, 3]
+    yhat = np.array([postprocess_yhat(v) for v in raw])
+    err = yhat - y
+    return {
+        "n": int(len(rows)),
+        "mae": float(np.mean(np.abs(err))),
+        "rmse": float(np.sqrt(np.mean(err ** 2))),
+        "mae_raw": float(np.mean(np.abs(raw - y))),
+        # Part des valeurs observées dans [0, 15] (ce que le clip peut représenter)
+        "y_in_clip": float(np.mean((y >= CLIP_LO) & (y <= CLIP_HI))),
+        # Part des sorties brutes modifiées par le post-traitement
+        "yhat_clipped": float(np.mean((raw < CLIP_LO) | (raw > CLIP_HI))),
+    }
+
+
+def run_backtest(
+    csv_path: str,
+    horizon: int = 1,
+    stride: int = 1,
+    n_context: int = N_CONTEXT,
+    workers: int = os.cpu_count() or 1,
+    chunk_size: int = 64,
+    dates: str = "remap",
+    limit: Optional[int] = None,
+    model_args: tuple = (MODEL_PATH, TRAIN_CSV, WARM_SNAPSHOT, INFERENCE_BACKEND),
+    progress: bool = True,
+) -> dict:
+    series = load_series(csv_path)
+    values = series[COLUMNS].to_numpy(dtype=np.float64)
+    ds = series["ds"].to_numpy()
+    origins = origins_for(values, n_context, horizon, stride)
+    if limit is not None:
+        origins = origins[:limit]
+    if len(origins) == 0:
+        raise ValueError("Aucune fenêtre complète : CSV trop court ou trop lacunaire")
+
+    chunks = [origins[i:i + chunk_size].tolist() for i in range(0, len(origins), chunk_size)]
+    workers = max(1, min(workers, len(chunks)))
+    torch_threads = max(1, (os.cpu_count() or 1) // workers)
+
+    t0 = time.perf_counter()
+    parts = []
+    # "spawn" : pas de fork d'un process qui aurait déjà initialisé torch
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=mp.get_context("spawn"),
+        initializer=_init_worker,
+        initargs=(values, ds, n_context, horizon, dates, csv_path, model_args, torch_threads),
+    ) as pool:
+        futures = [pool.submit(_run_chunk, c) for c in chunks]
+        for done, fut in enumerate(as_completed(futures), 1):
+            parts.append(fut.result())
+            if progress and (done % max(1, len(futures) // 10) == 0 or done == len(futures)):
+                print(f"  {done}/{len(futures)} lots ({time.perf_counter() - t0:.0f} s)", flush=True)
+
+    rows = np.concatenate(parts)
+    rows = rows[np.argsort(rows[:, 0] * (horizon + 1) + rows[:, 1], kind="stable")]
+    summary = {
+        "csv": csv_path,
+        "origins": int(len(origins)),
+        "horizon": horizon,
+        "stride": stride,
+        "n_context": n_context,
+        "dates": dates,
+        "workers": workers,
+        "seconds": time.perf_counter() - t0,
+        "overall": score(rows),
+        "by_step": {int(k): score(rows[rows[:, 1] == k]) for k in range(1, horizon + 1)},
+    }
+    # Détail par prédiction (retiré du résumé avant export JSON)
+    summary["rows"] = rows
+    summary["ds"] = ds
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backtest à origine glissante du modèle CO.")
+    parser.add_argument("--csv", default=TRAIN_CSV, help="CSV horaire ds,y,T,RH,NO2(GT)")
+    parser.add_argument("--model", default=MODEL_PATH)
+    parser.add_argument("--backend", default=INFERENCE_BACKEND, choices=["neuralprophet", "numpy"])
+    parser.add_argument("--horizon", type=int, default=1)
+    parser.add_argument("--stride", type=int, default=1, help="pas (heures) entre deux origines")
+    parser.add_argument("--n-context", type=int, default=N_CONTEXT)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--chunk-size", type=int, default=64, help="fenêtres prédites par passe modèle")
+    parser.add_argument(
+        "--dates", choices=["remap", "historical"], default="remap",
+        help="remap: axe temporel recalé sur l'heure courante (comme en production) ; historical: dates du CSV",
+    )
+    parser.add_argument("--limit", type=int, default=None, help="nombre max d'origines")
+    parser.add_argument("--out", default=None, help="CSV des prédictions (origine, pas, y, yhat)")
+    parser.add_argument("--json", default=None, help="résumé JSON")
+    args = parser.parse_args()
+
+    res = run_backtest(
+        args.csv,
+        horizon=args.horizon,
+        stride=args.stride,
+        n_context=args.n_context,
+        workers=args.workers,
+        chunk_size=args.chunk_size,
+        dates=args.dates,
+        limit=args.limit,
+        model_args=(args.model, TRAIN_CSV, WARM_SNAPSHOT, args.backend),
+    )
+    rows, ds = res.pop("rows"), res.pop("ds")
+
+    o = res["overall"]
+    print(f"{res['origins']} origines x {res['horizon']} pas en {res['seconds']:.1f} s ({res['workers']} workers)")
+    print(f"MAE={o['mae']:.3f}  RMSE={o['rmse']:.3f}  MAE brut={o['mae_raw']:.3f}  "
+          f"y dans [0, 15]={o['y_in_clip']:.1%}  yhat clippé={o['yhat_clipped']:.1%}")
+    if res["horizon"] > 1:
+        for k, s in res["by_step"].items():
+            print(f"  t+{k}h : MAE={s['mae']:.3f}  RMSE={s['rmse']:.3f}")
+
+    if args.out:
+        origin = rows[:, 0].astype(int)
+        step = rows[:, 1].astype(int)
+        pd.DataFrame({
+            "origin_ds": ds[origin],
+            "ds": ds[origin + step - 1],
+            "step": step,
+            "y": rows[:, 2],
+            "yhat_raw": rows[:, 3],
+            "yhat": [postprocess_yhat(v) for v in rows[:, 3]],
+        }).to_csv(args.out, index=False)
+        print(f"prédictions -> {args.out}")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(res, f, indent=2)
+        print(f"résumé -> {args.json}")
+
+
+if __name__ == "__main__":
+    main()
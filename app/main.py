@@ -1,20 +1,75 @@
+import asyncio
+import logging
+import os
 import random
-import numpy as np
-from typing import Optional, List
+from contextlib import asynccontextmanager
+from typing import Optional, List, Dict, Tuple
 
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
 from dotenv import load_dotenv
 
 from app.schemas import (
     PredictRequest,
     PredictResponse,
     RealtimeResponse,
-    RealtimeCityResponse,
+    BatchPredictRequest,
+    BatchPredictItem,
+    BatchPredictResponse,
+    ForecastRequest,
+    ForecastResponse,
+    ForecastPoint,
+    CityOut,
+    CitiesResponse,
+    NearestCitiesResponse,
 )
-from app.model_loader import load_and_warm_model
-from app.services.weatherapi import fetch_weather, extract_features, extract_realtime
-from app.services.features import build_future_df
-from app.schemas import RealtimeResponse, RealtimeCityResponse
+from app.model_loader import (
+    MODEL_RELOAD_INTERVAL_S,
+    ensure_model_loaded,
+    model_status,
+    model_version,
+    reload_if_updated,
+)
+from app.services.weatherapi import (
+    WEATHER_DEADLINE_S,
+    UpstreamError,
+    extract_features,
+    extract_hourly_features,
+    extract_realtime,
+    fetch_current,
+    fetch_forecast,
+    fetch_weather_async,
+    upstream_stats,
+    weather_bulk,
+    weather_cache,
+    weather_client,
+    weather_ttl,
+)
+from app.services.cities import Location, get_city_registry
+from app.services.features import N_CONTEXT, build_future_df, current_hour, future_hours, seconds_to_next_hour
+from app.services.inference import forecast_frames, forecast_trajectory, postprocess_yhat
+from app.services.batcher import MICROBATCH_ENABLED, MicroBatcher
+from app.services.executor import QueueFullError, inference_executor
+from app.services.observations import (
+    OBSERVATIONS_CONTEXT,
+    city_key as observation_city_key,
+    observation_store,
+    row_from_realtime,
+)
+from app.services.poller import (
+    POLLER_ENABLED,
+    POLLER_INTERVAL_S,
+    SNAPSHOT_FALLBACK,
+    SNAPSHOT_MAX_AGE_S,
+    Poller,
+)
+from app.services.http_cache import cache_headers, conditional, etag_for, not_modified
+from app.services.result_cache import RESULT_CACHE_ENABLED, result_cache, result_key
+from app.services.serialization import ORJSONResponse, columnar, parse_fields, project
+from app.services.stream import STREAM_MAX_CITIES, realtime_broadcaster
+from app.services.metrics import GaugeSet, MetricsMiddleware, registry, stage
+from app.services.resilience import deadline
 
 
 load_dotenv()
@@ -23,14 +78,103 @@ MODEL_PATH = "models/neuralprophet_co_deployable.pkl"
 TRAIN_CSV = "models/train_df_deploy.csv"
 FALLBACK = "models/airquality_fallback_final.csv"
 
-app = FastAPI(title="Air Quality CO Predictor")
+log = logging.getLogger(__name__)
+
+# Chargement du modèle au démarrage (désactivable pour le dev: EAGER_MODEL_LOAD=0).
+# En tâche de fond par défaut : /health et /realtime répondent avant l'import de torch,
+# /ready passe à 200 une fois le modèle chargé. MODEL_LOAD_BLOCKING=1 => attendu avant de servir.
+EAGER_MODEL_LOAD = os.getenv("EAGER_MODEL_LOAD", "1") == "1"
+MODEL_LOAD_BLOCKING = os.getenv("MODEL_LOAD_BLOCKING", "0") == "1"
+
+
+def get_model():
+    return ensure_model_loaded(MODEL_PATH, TRAIN_CSV)
+
+
+async def _watch_checkpoints():
+    """Bascule à chaud quand `python -m app.online_update` publie un nouveau checkpoint."""
+    while True:
+        await asyncio.sleep(MODEL_RELOAD_INTERVAL_S)
+        try:
+            if await run_in_threadpool(reload_if_updated):
+                log.info("Nouveau modèle servi : %s", model_version())
+                # Les prévisions pré-calculées du poller viennent de l'ancien modèle
+                if POLLER_ENABLED:
+                    await poller.refresh_all()
+        except Exception:
+            log.exception("Rechargement du checkpoint impossible")
+
+
+async def _load_model(refresh_snapshots: bool):
+    try:
+        await run_in_threadpool(get_model)
+    except Exception:
+        # On démarre quand même : /ready le signale et /predict retentera le chargement
+        log.exception("Chargement du modèle au démarrage impossible")
+        return
+    # Premier tour du poller fait sans modèle : on complète les prévisions t+1h
+    if refresh_snapshots and POLLER_ENABLED:
+        await poller.refresh_all()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await weather_client.start()
+    tasks = []
+    if EAGER_MODEL_LOAD:
+        if MODEL_LOAD_BLOCKING:
+            await _load_model(refresh_snapshots=False)
+        else:
+            tasks.append(asyncio.create_task(_load_model(refresh_snapshots=True)))
+    if POLLER_ENABLED:
+        poller.start()
+    if MODEL_RELOAD_INTERVAL_S > 0:
+        tasks.append(asyncio.create_task(_watch_checkpoints()))
+    try:
+        yield
+    finally:
+        for task in tasks:
+            task.cancel()
+        await poller.stop()
+        await micro_batcher.stop()
+        await weather_bulk.stop()
+        await weather_client.close()
+
+
+app = FastAPI(title="Air Quality CO Predictor", lifespan=lifespan, default_response_class=ORJSONResponse)
+# Durée / code par route + en-tête Server-Timing (fetch_weather, build_future_df, predict...)
+app.add_middleware(MetricsMiddleware)
+
+# Villes par défaut de /realtime, rafraîchies par le poller (les autres villes du
+# registre sont servies à la demande). Coordonnées => pas d'ambiguïté de geocoding.
+DEFAULT_CITIES = [c.strip() for c in os.getenv("DEFAULT_CITIES", "Montreal,Trois-Rivieres").split(",") if c.strip()]
+
 
-# Villes attendues par l'énoncé (Montréal et Trois-Rivières)
-# On utilise des coordonnées pour éviter les ambiguïtés de geocoding.
-CITY_QUERIES = {
-    "Montreal": "45.5017,-73.5673",
-    "Trois-Rivieres": "46.3438,-72.5430",
-}
+def _default_city_queries() -> Dict[str, str]:
+    registry = get_city_registry()
+    out = {}
+    for name in DEFAULT_CITIES:
+        city = registry.get(name)
+        if city is None:
+            log.warning("Ville par défaut absente du registre : %s", name)
+            continue
+        out[city.name] = city.query
+    return out
+
+
+CITY_QUERIES = _default_city_queries()
+
+
+def _location(q: str) -> Location:
+    """Nom du registre ou "lat,lon" -> Location ; tout autre texte est transmis tel quel à WeatherAPI."""
+    loc = get_city_registry().resolve(q)
+    if loc is not None:
+        return loc
+    name = (q or "").strip()
+    if not name:
+        raise ValueError("city vide. Utiliser un nom du registre (GET /cities), \"lat,lon\" ou un lieu WeatherAPI")
+    # Lieu hors registre (ex: "Paris", code postal) : WeatherAPI le résout (lieu introuvable => 400)
+    return Location(name, name)
 
 
 @app.get("/health")
@@ -38,75 +182,660 @@ def health():
     return {"status": "ok"}
 
 
+@app.get("/ready")
+def ready():
+    """Prêt uniquement quand le modèle est chargé (à utiliser comme readiness probe)."""
+    status = model_status()
+    return JSONResponse(status_code=200 if status["ready"] else 503, content=status)
+
+
+@app.get("/cache/stats")
+def cache_stats():
+    """Compteurs hit/miss/latence des caches en mémoire."""
+    return {
+        "weather": weather_cache.snapshot_stats(),
+        # Regroupement des miss current.json en requêtes bulk (taille des lots)
+        "weather_bulk": weather_bulk.snapshot_stats(),
+        # Circuit breaker, requêtes de couverture, réponses "stale" servies
+        "weather_upstream": upstream_stats(),
+        "predict_results": result_cache.snapshot_stats(),
+    }
+
+
+@app.get("/inference/stats")
+def inference_stats():
+    """Pool d'inférence (file, attente, exécution) et distribution des tailles de micro-lots."""
+    return {
+        "executor": inference_executor.snapshot_stats(),
+        "microbatch": micro_batcher.snapshot_stats(),
+        "poller": poller.snapshot_stats(),
+        "stream": realtime_broadcaster.snapshot_stats(),
+    }
+
+
+@app.get("/cities", response_model=CitiesResponse)
+def cities():
+    """Noms des villes du registre (`data/cities.csv`)."""
+    registry = get_city_registry()
+    return CitiesResponse(count=len(registry), cities=registry.names())
+
+
+@app.get("/cities/nearest", response_model=NearestCitiesResponse)
+def cities_nearest(
+    lat: float = Query(..., ge=-90, le=90),
+    lon: float = Query(..., ge=-180, le=180),
+    n: int = Query(5, ge=1, le=100),
+):
+    """Les `n` villes du registre les plus proches de (lat, lon) (KD-tree, O(log n))."""
+    return NearestCitiesResponse(
+        lat=lat,
+        lon=lon,
+        cities=[
+            CityOut(name=c.name, lat=c.lat, lon=c.lon, region=c.region, distance_km=round(km, 3))
+            for c, km in get_city_registry().nearest(lat, lon, n)
+        ],
+    )
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    """Métriques au format texte Prometheus."""
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
+
+async def _record_observations(rows: List[Optional[dict]]):
+    """Historise les mesures temps réel (un échec de stockage ne fait pas échouer la requête)."""
+    try:
+        await run_in_threadpool(observation_store.append_many, rows)
+    except Exception:
+        log.exception("Écriture des observations impossible")
+
+
+def _render_cities(rows: List[dict], fields: Optional[str], fmt: str) -> ORJSONResponse:
+    proj = parse_fields(fields)
+    if proj:
+        rows = [project(r, proj) for r in rows]
+    if fmt == "columnar":
+        return ORJSONResponse({"count": len(rows), "columns": columnar(rows)})
+    return ORJSONResponse({"cities": rows})
+
+
+def _render_model(model, fields: Optional[str]) -> ORJSONResponse:
+    proj = parse_fields(fields)
+    if not proj:
+        return ORJSONResponse(model)
+    return ORJSONResponse(project(model.model_dump(mode="json", by_alias=True), proj))
+
+
 @app.get("/realtime", response_model=RealtimeResponse)
-def realtime(city: Optional[str] = None):
+async def realtime(
+    request: Request,
+    city: Optional[str] = None,
+    fields: Optional[str] = None,
+    fmt: str = Query("nested", alias="format", pattern="^(nested|columnar)$"),
+):
     """Retourne les mesures *temps réel* de qualité de l'air.
 
-    - Si `city` est fourni, on renvoie la ville demandée (si elle fait partie des villes attendues).
-    - Sinon, on renvoie Montréal + Trois-Rivières.
+    - Si `city` est fourni (nom du registre ou "lat,lon"), on renvoie ce lieu.
+    - Sinon, on renvoie les villes par défaut (appels WeatherAPI en parallèle).
+    - `?fields=city,ts,current_air_quality.pollutants_ugm3.CO` : projection (chemins pointés)
+    - `?format=columnar` : `{"count", "columns": {"chemin.pointé": [une valeur par ville]}}`
+    - ETag (`ts` WeatherAPI de chaque ville) : `If-None-Match` => 304 ; `max-age` = temps
+      restant avant le prochain rafraîchissement attendu
     """
     try:
-        cities: List[str]
+        locations: List[Location]
         if city:
-            city_key = city.strip()
-            if city_key not in CITY_QUERIES:
-                raise HTTPException(
-                    status_code=400,
-                    detail=f"city invalide. Valeurs acceptées: {list(CITY_QUERIES.keys())}",
-                )
-            cities = [city_key]
+            locations = [_location(city)]
         else:
-            cities = list(CITY_QUERIES.keys())
+            locations = [Location(name, q) for name, q in CITY_QUERIES.items()]
 
-        out: List[RealtimeCityResponse] = []
-        for c in cities:
-            payload = fetch_weather(CITY_QUERIES[c])  # coordonnées => plus fiable
-            normalized = extract_realtime(payload, city_fallback=c)
-            out.append(RealtimeCityResponse(**normalized))
+        # 1) Snapshots pré-calculés par le poller (O(1))
+        # Dicts déjà normalisés par extract_realtime : pas de (re)validation Pydantic
+        out: List[Optional[dict]] = [None] * len(locations)
+        # Secondes avant le prochain changement attendu, par ville (0 si servie "stale")
+        max_ages: List[float] = [0.0] * len(locations)
+        missing = []
+        for i, loc in enumerate(locations):
+            usable = _usable_snapshot(loc.name)
+            if usable is None:
+                missing.append(i)
+                continue
+            snap, stale = usable
+            out[i] = {**snap.data["realtime"], "age_s": round(snap.age_s, 1), "stale": stale}
+            max_ages[i] = 0.0 if stale else POLLER_INTERVAL_S - snap.age_s
 
-        return RealtimeResponse(cities=out)
+        # 2) Calcul à la demande pour le reste (coordonnées => plus fiable)
+        with deadline(WEATHER_DEADLINE_S):
+            results = await asyncio.gather(*(fetch_current(locations[i].query) for i in missing))
+        rows = []
+        for i, res in zip(missing, results):
+            normalized = extract_realtime(res.payload, city_fallback=locations[i].name)
+            out[i] = {**normalized, "age_s": _round_age(res.age_s), "stale": res.stale}
+            max_ages[i] = 0.0 if res.stale else weather_ttl(res.payload)
+            if not res.stale:
+                rows.append(row_from_realtime(locations[i].name, normalized))
+
+        await _record_observations(rows)
+        etag = etag_for(
+            "realtime", [(loc.name, r.get("ts"), r["stale"]) for loc, r in zip(locations, out)], fields, fmt
+        )
+        return conditional(request, etag, min(max_ages), lambda: _render_cities(out, fields, fmt))
 
     except HTTPException:
         raise
+    except UpstreamError as e:
+        raise _upstream_error(e)
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 
+def _round_age(age_s: Optional[float]) -> Optional[float]:
+    return None if age_s is None else round(age_s, 1)
+
+
+def _upstream_error(e: UpstreamError) -> HTTPException:
+    """WeatherAPI en panne sans réponse de secours : 502 (et Retry-After si le circuit est ouvert)."""
+    retry_after = weather_client.breaker.retry_after_s()
+    headers = {"Retry-After": str(max(1, round(retry_after)))} if retry_after > 0 else None
+    return HTTPException(status_code=502, detail=str(e), headers=headers)
+
+
+@app.get("/realtime/stream")
+async def realtime_stream(city: Optional[List[str]] = Query(None)):
+    """Flux SSE des mesures temps réel, poussées à chaque rafraîchissement du poller.
+
+    - `?city=Montreal&city=Quebec` : seulement ces villes (ajoutées au poller si besoin) ;
+      sans `city`, toutes les villes suivies.
+    - `event: snapshot` = objet `RealtimeCityResponse` complet, `event: delta` = champs modifiés
+      depuis la version `base` (à fusionner côté client).
+    """
+    if not POLLER_ENABLED:
+        raise HTTPException(status_code=503, detail="Flux indisponible : poller désactivé (POLLER_ENABLED=0)")
+
+    queries: Dict[str, str] = {}
+    if city:
+        try:
+            queries = {loc.name: loc.query for loc in (_location(c) for c in city)}
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        new = [name for name in queries if name not in poller.cities]
+        if len(poller.cities) + len(new) > STREAM_MAX_CITIES:
+            raise HTTPException(status_code=400, detail=f"Trop de villes suivies (max {STREAM_MAX_CITIES})")
+
+    return StreamingResponse(
+        _stream_events(queries),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+async def _stream_events(queries: Dict[str, str]):
+    """Abonnement pris dans le générateur : un client parti avant le premier envoi ne retient rien."""
+    acquired: List[str] = []
+    sub = None
+    try:
+        # Comptage des abonnés : la ville quitte le poller avec son dernier abonné
+        for name, query in queries.items():
+            poller.acquire(name, query)
+            acquired.append(name)
+        sub = realtime_broadcaster.subscribe(list(queries) if queries else None)
+        async for msg in realtime_broadcaster.events(sub):
+            yield msg
+    finally:
+        if sub is not None:
+            realtime_broadcaster.unsubscribe(sub)
+        for name in acquired:
+            if poller.release(name):
+                realtime_broadcaster.forget(name)
+
+
+def _features_from_request(req: PredictRequest) -> Optional[dict]:
+    """Features fournies dans la requête (None => à récupérer via WeatherAPI)."""
+    if req.temp_c is None or req.rh is None:
+        return None
+    return {
+        "T": float(req.temp_c),
+        "RH": float(req.rh),
+        "NO2(GT)": float(req.no2_ugm3) if req.no2_ugm3 is not None else None,
+    }
+
+
+def _clip(x, lo: float, hi: float) -> float:
+    return float(min(max(x, lo), hi))
+
+
+def _features_from_payload(payload: dict) -> dict:
+    feats = extract_features(payload)
+
+    # Clipping simple pour éviter les valeurs hors-distribution
+    feats["RH"] = _clip(feats["RH"], 0.0, 100.0)
+    if feats.get("NO2(GT)") is not None:
+        feats["NO2(GT)"] = _clip(feats["NO2(GT)"], 0.0, 500.0)
+    feats["T"] = _clip(feats["T"], -50.0, 50.0)
+    return feats
+
+
+def _predict_location(req: PredictRequest) -> Location:
+    """Lieu de la prédiction ; avec features fournies, un nom hors registre reste une simple étiquette."""
+    return _location(req.city)
+
+
+async def _resolve_features(req: PredictRequest, loc: Location) -> Tuple[dict, Optional[float]]:
+    """Features (soit fournies, soit récupérées via WeatherAPI) + âge si météo de secours."""
+    feats = _features_from_request(req)
+    if feats is not None:
+        return feats, None
+    res = await fetch_current(loc.query)
+    return _features_from_payload(res.payload), res.age_s
+
+
+async def _resolve_inputs(req: PredictRequest) -> Tuple[Location, dict, Optional[List[dict]], str, Optional[float]]:
+    """
+    Lieu + features actuelles + régresseurs des pas futurs + âge des données météo
+    (None si fraîches, sinon âge de la plus ancienne réponse de secours utilisée).
+
+    Pour horizon > 1 (et features non fournies), les pas t+2h... viennent des
+    prévisions horaires WeatherAPI ; sinon persistance des features actuelles.
+    """
+    loc = _predict_location(req)
+    # Budget commun aux appels WeatherAPI de la requête
+    with deadline(WEATHER_DEADLINE_S):
+        if req.horizon <= 1 or _features_from_request(req) is not None:
+            feats, age_s = await _resolve_features(req, loc)
+            return loc, feats, None, "persistence", age_s
+
+        (feats, age_s), forecast = await asyncio.gather(
+            _resolve_features(req, loc),
+            fetch_forecast(loc.query, req.horizon),
+        )
+    hourly = extract_hourly_features(forecast.payload)
+    # t+1h garde les features actuelles (comme /predict horizon=1)
+    future_feats = [None] + [hourly.get(h) for h in future_hours(req.horizon)[1:]]
+    ages = [a for a in (age_s, forecast.age_s) if a is not None]
+    return loc, feats, future_feats, "weatherapi_forecast", max(ages) if ages else None
+
+
+def _mark_age(resp, age_s: Optional[float]):
+    """Réponse calculée à partir d'une météo de secours : âge + `stale`."""
+    if age_s is not None:
+        resp.age_s = round(age_s, 1)
+        resp.stale = True
+    return resp
+
+
+def _points(traj) -> List[ForecastPoint]:
+    # ✅ Clip physique + clip "dataset-realistic"
+    return [
+        ForecastPoint.model_construct(ds=str(ds), yhat1=postprocess_yhat(float(y)))
+        for ds, y in zip(traj["ds"], traj["yhat1"])
+    ]
+
+
+def _to_response(city: str, traj, feats: dict) -> PredictResponse:
+    points = _points(traj)
+    # Données internes déjà typées : construction sans validation
+    return PredictResponse.model_construct(
+        city=city,
+        ds=points[0].ds,
+        yhat1=points[0].yhat1,
+        inputs=feats,
+        trajectory=points if len(points) > 1 else None,
+    )
+
+
+def _context_for(city: Optional[str]):
+    """Observations réelles de la ville comme contexte, si assez d'heures sont disponibles."""
+    if not OBSERVATIONS_CONTEXT or not city:
+        return None
+    try:
+        return observation_store.context_block(city, N_CONTEXT, current_hour())
+    except Exception:
+        log.exception("Lecture du contexte observé impossible (%s)", city)
+        return None
+
+
+def _build_frame(feats: dict, horizon: int, future_feats: Optional[List[dict]], city: Optional[str]):
+    # Contexte: observations de la ville si disponibles, sinon historique fallback
+    context = _context_for(city)
+    with stage("build_future_df"):
+        return build_future_df(
+            FALLBACK,
+            feats,
+            horizon=horizon,
+            future_feats=future_feats,
+            context=context,
+        )
+
+
+def _run_single(
+    feats: dict,
+    horizon: int = 1,
+    future_feats: Optional[List[dict]] = None,
+    city: Optional[str] = None,
+):
+    # 2) Build df_future (contexte historique + `horizon` pas futurs)
+    df_future = _build_frame(feats, horizon, future_feats, city)
+
+    # 3) Load model
+    m = get_model()
+
+    # 4) Predict (toute la trajectoire en une passe)
+    with stage("predict"):
+        return forecast_trajectory(m, df_future, horizon)
+
+
+async def _infer(fn, *args):
+    """
+    Inférence torch bloquante => exécutée dans le pool d'inférence borné.
+
+    File pleine => HTTP 503 + Retry-After (backpressure) plutôt qu'une latence non bornée.
+    """
+    try:
+        return await inference_executor.run(fn, *args)
+    except QueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+
+
+async def _predict_traj(feats: dict, horizon: int, future_feats: Optional[List[dict]], city: Optional[str]):
+    # "inference" = attente (file / micro-lot) + exécution, vu de la requête
+    with stage("inference"):
+        if MICROBATCH_ENABLED:
+            return await micro_batcher.submit((feats, horizon, future_feats, city))
+        return await _infer(_run_single, feats, horizon, future_feats, city)
+
+
+async def _run_cached(
+    feats: dict,
+    horizon: int,
+    future_feats: Optional[List[dict]],
+    city: Optional[str],
+    nocache: bool,
+):
+    """Trajectoire via le cache de résultats (features quantifiées + heure cible + version modèle)."""
+    if nocache or not RESULT_CACHE_ENABLED:
+        return await _predict_traj(feats, horizon, future_feats, city)
+
+    if model_version() is None:
+        await _infer(get_model)  # la version du modèle fait partie de la clé
+    # Le contexte dépend de la ville dès qu'on utilise les observations stockées
+    context_id = observation_city_key(city) if OBSERVATIONS_CONTEXT and city else None
+    key = result_key(feats, future_feats, horizon, future_hours(1)[0], model_version(), context_id)
+    return await result_cache.aget_or_compute(
+        key,
+        lambda: _predict_traj(feats, horizon, future_feats, city),
+    )
+
+
+def _snapshot_prediction(req: PredictRequest) -> Optional[PredictResponse]:
+    """Prédiction t+1h pré-calculée par le poller, si elle vise encore l'heure courante."""
+    if req.horizon != 1 or _features_from_request(req) is not None:
+        return None
+    loc = get_city_registry().resolve(req.city)
+    usable = _usable_snapshot(loc.name) if loc is not None else None
+    if usable is None:
+        return None
+    snap, stale = usable
+    if snap.data.get("traj") is None or snap.data.get("target_hour") != future_hours(1)[0]:
+        return None
+    resp = _to_response(loc.name, snap.data["traj"], snap.data["feats"])
+    resp.age_s = round(snap.age_s, 1)
+    resp.stale = stale
+    return resp
+
+
+def _predict_etag(city: str, feats: dict, future_feats: Optional[List[dict]], horizon: int, stale: bool, fields):
+    """Une prédiction ne change qu'avec l'heure cible, les entrées ou le modèle."""
+    return etag_for("predict", city, future_hours(1)[0], feats, future_feats, horizon, model_version(), stale, fields)
+
+
+def _predict_max_age(age_s: Optional[float], stale: bool) -> float:
+    """Jusqu'au changement d'heure cible, borné par le prochain rafraîchissement des entrées."""
+    if stale:
+        return 0.0
+    return min(seconds_to_next_hour(), POLLER_INTERVAL_S - (age_s or 0.0))
+
+
+@app.get("/predict", response_model=PredictResponse)
+async def predict_get(
+    request: Request,
+    city: str,
+    horizon: int = Query(1, ge=1, le=72),
+    nocache: bool = False,
+    fields: Optional[str] = None,
+):
+    """Comme `POST /predict` (features WeatherAPI), mais cacheable : ETag + `If-None-Match` => 304."""
+    return await _predict(PredictRequest(city=city, horizon=horizon), nocache, fields, request)
+
+
 @app.post("/predict", response_model=PredictResponse)
-def predict(req: PredictRequest):
+async def predict(req: PredictRequest, nocache: bool = False, fields: Optional[str] = None):
+    """`?nocache=true` contourne le cache de résultats et les snapshots (debug) ; `?fields=` projette la réponse."""
+    return await _predict(req, nocache, fields, None)
+
+
+async def _predict(req: PredictRequest, nocache: bool, fields: Optional[str], request: Optional[Request]):
+    # Pas de 304 pour POST : `request` n'est fourni que par GET /predict
     try:
-        # 1) Features: soit fournies, soit récupérées via WeatherAPI
-        feats = {}
-        if req.temp_c is not None and req.rh is not None:
-            feats["T"] = float(req.temp_c)
-            feats["RH"] = float(req.rh)
-            feats["NO2(GT)"] = float(req.no2_ugm3) if req.no2_ugm3 is not None else None
-        else:
-            payload = fetch_weather(req.city)
-            feats = extract_features(payload)
+        if not nocache:
+            snap_resp = _snapshot_prediction(req)
+            if snap_resp is not None:
+                return conditional(
+                    request,
+                    _predict_etag(snap_resp.city, snap_resp.inputs, None, req.horizon, snap_resp.stale, fields),
+                    _predict_max_age(snap_resp.age_s, snap_resp.stale),
+                    lambda: _render_model(snap_resp, fields),
+                )
 
-            # Clipping simple pour éviter les valeurs hors-distribution
-            feats["RH"] = float(np.clip(feats["RH"], 0.0, 100.0))
-            if feats.get("NO2(GT)") is not None:
-                feats["NO2(GT)"] = float(np.clip(feats["NO2(GT)"], 0.0, 500.0))
-            feats["T"] = float(np.clip(feats["T"], -50.0, 50.0))
+        # 1) Features: soit fournies, soit récupérées via WeatherAPI
+        loc, feats, future_feats, _, age_s = await _resolve_inputs(req)
 
-        # 2) Build df_future (historique fallback + 1 pas futur)
-        df_future = build_future_df(FALLBACK, feats)
+        # 2) Le client a déjà cette prédiction : 304 sans passe modèle
+        stale = age_s is not None
+        etag = _predict_etag(loc.name, feats, future_feats, req.horizon, stale, fields)
+        headers = cache_headers(etag, _predict_max_age(None, stale))
+        if not nocache and not_modified(request, etag):
+            return Response(status_code=304, headers=headers)
 
-        # 3) Load model
-        m = load_and_warm_model(MODEL_PATH, TRAIN_CSV)
+        traj = await _run_cached(feats, req.horizon, future_feats, loc.name, nocache)
+        resp = _render_model(_mark_age(_to_response(loc.name, traj, feats), age_s), fields)
+        resp.headers.update(headers)
+        return resp
 
-        # 4) Predict
-        fc = m.predict(df_future)
-        raw_yhat = float(fc["yhat1"].iloc[-1])
+    except HTTPException:
+        raise
+    except UpstreamError as e:
+        raise _upstream_error(e)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
-        # ✅ Clip physique + clip "dataset-realistic"
-        raw_yhat *= -1 if raw_yhat < 0 else 1
-        yhat = float(np.clip(raw_yhat, 0.0, 15.0))
-        ds = str(fc["ds"].iloc[-1])
 
-        return PredictResponse(city=req.city, ds=ds, yhat1=yhat, inputs=feats)
+@app.post("/forecast", response_model=ForecastResponse)
+async def forecast(req: ForecastRequest, nocache: bool = False, fields: Optional[str] = None):
+    """Trajectoire CO sur les `horizon` prochaines heures (une seule passe modèle)."""
+    try:
+        loc, feats, future_feats, source, age_s = await _resolve_inputs(req)
+        traj = await _run_cached(feats, req.horizon, future_feats, loc.name, nocache)
+        return _render_model(_mark_age(ForecastResponse.model_construct(
+            city=loc.name,
+            horizon=req.horizon,
+            points=_points(traj),
+            inputs=feats,
+            regressor_source=source,
+        ), age_s), fields)
 
+    except HTTPException:
+        raise
+    except UpstreamError as e:
+        raise _upstream_error(e)
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
+
+
+def _run_items(items: List[tuple]) -> List[object]:
+    """
+    Exécute plusieurs prédictions `(feats, horizon, future_feats, city)` en une seule passe modèle.
+
+    Retourne une trajectoire ou une Exception par item, dans l'ordre.
+    """
+    out: List[object] = [None] * len(items)
+
+    # Un df_future par item valide, empilés avec une colonne ID
+    frames, horizons = {}, {}
+    for i, (feats, horizon, future_feats, city) in enumerate(items):
+        try:
+            frames[str(i)] = _build_frame(feats, horizon, future_feats, city)
+            horizons[str(i)] = horizon
+        except Exception as e:
+            out[i] = e
+
+    # Une seule passe modèle pour tout le lot
+    if frames:
+        try:
+            m = get_model()
+            with stage("predict"):
+                trajs = forecast_frames(m, frames, horizons)
+            for key, traj in trajs.items():
+                out[int(key)] = traj
+        except Exception as e:
+            for key in frames:
+                out[int(key)] = e
+    return out
+
+
+# Micro-batching : les /predict concurrents (ex: début d'heure) partagent une passe modèle
+micro_batcher = MicroBatcher(lambda items: _infer(_run_items, items))
+
+
+async def _refresh_city(city: str, query: str) -> dict:
+    """Tour du poller pour une ville : météo temps réel + prévision t+1h pré-calculée."""
+    payload = await fetch_weather_async(query)
+    normalized = extract_realtime(payload, city_fallback=city)
+    await _record_observations([row_from_realtime(city, normalized)])
+
+    target_hour = future_hours(1)[0]
+    feats = _features_from_payload(payload)
+    # Modèle pas encore chargé : on publie les mesures, la prévision suivra (pas d'attente)
+    traj = await _run_cached(feats, 1, None, city, nocache=False) if model_status()["ready"] else None
+    return {"realtime": normalized, "feats": feats, "traj": traj, "target_hour": target_hour}
+
+
+# Rafraîchissement périodique des villes connues => endpoints servis depuis un snapshot
+poller = Poller(CITY_QUERIES, _refresh_city)
+
+
+def _publish_snapshot(snap):
+    """Listener du poller : pousse le nouvel état de la ville aux abonnés SSE."""
+    data = {k: v for k, v in snap.data["realtime"].items() if k != "raw"}
+    realtime_broadcaster.publish(snap.city, data, snap.updated_at)
+
+
+poller.add_listener(_publish_snapshot)
+
+
+def _cache_gauges(field: str):
+    caches = {"weather": weather_cache, "predict_results": result_cache}
+    return lambda: {(name, ): c.snapshot_stats()[field] for name, c in caches.items()}
+
+
+registry.register(GaugeSet("aq_cache_hit_ratio", "Taux de hit des caches", _cache_gauges("hit_ratio"), ["cache"]))
+registry.register(GaugeSet("aq_cache_entries", "Entrées en cache", _cache_gauges("size"), ["cache"]))
+registry.register(GaugeSet(
+    "aq_model_load_seconds", "Durée du dernier chargement du modèle",
+    lambda: {(): model_status()["load_seconds"]},
+))
+registry.register(GaugeSet("aq_model_ready", "1 si le modèle est chargé", lambda: {(): model_status()["ready"]}))
+registry.register(GaugeSet(
+    "aq_model_swaps", "Bascules à chaud vers un nouveau checkpoint", lambda: {(): model_status()["swaps"]},
+))
+registry.register(GaugeSet(
+    "aq_inference_queue", "Pool d'inférence : tâches en cours / en attente / rejetées (503)",
+    lambda: {
+        (k, ): v for k, v in inference_executor.snapshot_stats().items()
+        if k in ("in_flight", "queue_depth", "rejected")
+    },
+    ["state"],
+))
+registry.register(GaugeSet(
+    "aq_microbatch_avg_size", "Taille moyenne des micro-lots",
+    lambda: {(): micro_batcher.snapshot_stats()["avg_batch_size"]},
+))
+registry.register(GaugeSet(
+    "aq_stream_subscribers", "Abonnés au flux SSE /realtime/stream",
+    lambda: {(): realtime_broadcaster.snapshot_stats()["subscribers"]},
+))
+registry.register(GaugeSet(
+    "aq_weather_circuit_open", "1 si le circuit WeatherAPI est ouvert (appels court-circuités)",
+    lambda: {(): weather_client.breaker.state == "open"},
+))
+registry.register(GaugeSet(
+    "aq_snapshot_age_seconds", "Âge du snapshot du poller par ville",
+    lambda: {(c, ): age for c, age in poller.snapshot_stats()["ages_s"].items()},
+    ["city"],
+))
+
+
+def _usable_snapshot(city: str):
+    """(snapshot, stale) si un snapshot peut être servi pour `city`, sinon None (calcul à la demande)."""
+    if not POLLER_ENABLED:
+        return None
+    snap = poller.get(city)
+    if snap is None:
+        return None
+    if snap.age_s <= SNAPSHOT_MAX_AGE_S:
+        return snap, False
+    if SNAPSHOT_FALLBACK == "stale":
+        return snap, True
+    return None
+
+
+@app.post("/predict/batch", response_model=BatchPredictResponse)
+async def predict_batch(req: BatchPredictRequest):
+    """Prédit plusieurs villes en une seule passe NeuralProphet.
+
+    Les erreurs sont rapportées par item : un item invalide ne fait pas échouer le lot.
+    """
+    items = req.items
+    errors: Dict[int, str] = {}
+    inputs_by_idx: Dict[int, tuple] = {}
+
+    # 1) Features (appels WeatherAPI concurrents ; une même ville n'est appelée
+    #    qu'une fois grâce au single-flight du cache)
+    resolved = await asyncio.gather(*(_resolve_inputs(it) for it in items), return_exceptions=True)
+    for i, r in enumerate(resolved):
+        if isinstance(r, Exception):
+            errors[i] = str(r)
+        else:
+            inputs_by_idx[i] = r
+
+    # 2) + 3) Frames empilés et une seule passe modèle
+    idx = sorted(inputs_by_idx)
+    batch = []
+    for i in idx:
+        loc, feats, future_feats, _, _ = inputs_by_idx[i]
+        batch.append((feats, items[i].horizon, future_feats, loc.name))
+    trajs = await _infer(_run_items, batch)
+    forecasts = {}
+    for i, traj in zip(idx, trajs):
+        if isinstance(traj, Exception):
+            errors[i] = str(traj)
+        else:
+            forecasts[i] = traj
+
+    results: List[BatchPredictItem] = []
+    for i, it in enumerate(items):
+        traj = forecasts.get(i)
+        if i in errors or traj is None:
+            err = errors.get(i, "prédiction manquante")
+            results.append(BatchPredictItem.model_construct(index=i, city=it.city, ok=False, result=None, error=err))
+            continue
+        loc, feats, _, _, age_s = inputs_by_idx[i]
+        results.append(BatchPredictItem.model_construct(
+            index=i,
+            city=loc.name,
+            ok=True,
+            result=_mark_age(_to_response(loc.name, traj, feats), age_s),
+            error=None,
+        ))
+
+    return ORJSONResponse(BatchPredictResponse.model_construct(results=results))
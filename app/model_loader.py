@@ -1,11 +1,36 @@
-import joblib
-import pandas as pd
+import argparse
+import json
+import os
+import threading
+import time
 from functools import lru_cache
+from typing import Optional
+
+from app.services.metrics import stage
 
 REGRESSORS = ["T", "RH", "NO2(GT)"]
 
+# Snapshot du modèle déjà "warm" (produit hors-ligne par `python -m app.model_loader`)
+WARM_SNAPSHOT = os.getenv("WARM_SNAPSHOT", "models/neuralprophet_co_warm.np")
+
+# Backend d'inférence: "neuralprophet" (défaut) ou "numpy" (export de
+# `python -m app.services.numpy_engine`, sans torch)
+INFERENCE_BACKEND = os.getenv("INFERENCE_BACKEND", "neuralprophet")
+NUMPY_EXPORT = os.getenv("NUMPY_EXPORT", "models/neuralprophet_co_numpy.npz")
+
+# Checkpoints versionnés produits par `python -m app.online_update` ; `LATEST` contient
+# le nom du checkpoint courant (prioritaire sur le snapshot warm)
+CHECKPOINT_DIR = os.getenv("MODEL_CHECKPOINT_DIR", "models/checkpoints")
+# Période de vérification de `LATEST` par les serveurs (0 = pas de bascule à chaud)
+MODEL_RELOAD_INTERVAL_S = float(os.getenv("MODEL_RELOAD_INTERVAL_S", "60"))
+
+
 @lru_cache(maxsize=1)
 def load_and_warm_model(model_path: str, train_csv_path: str):
+    # Imports lourds (joblib -> NeuralProphet -> torch) seulement au chargement effectif
+    import joblib
+    import pandas as pd
+
     m = joblib.load(model_path)
 
     train_df = pd.read_csv(train_csv_path)
@@ -23,3 +48,193 @@ def load_and_warm_model(model_path: str, train_csv_path: str):
         minimal=True
     )
     return m
+
+
+def save_warm_snapshot(m, snapshot_path: str) -> None:
+    """Persiste le modèle fitté (state_dict torch + config) de façon atomique."""
+    from neuralprophet import save
+
+    tmp = f"{snapshot_path}.tmp"
+    save(m, tmp)
+    os.replace(tmp, snapshot_path)
+
+
+def load_warm_snapshot(snapshot_path: str):
+    """Désérialise un snapshot warm : aucun fit, seulement le chargement."""
+    from neuralprophet import load
+
+    return load(snapshot_path, map_location="cpu")
+
+
+def _write_atomic(path: str, text: str) -> None:
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(text)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def latest_checkpoint(checkpoint_dir: str = CHECKPOINT_DIR) -> Optional[str]:
+    """Chemin du checkpoint pointé par `LATEST` (None s'il n'y en a pas)."""
+    try:
+        with open(os.path.join(checkpoint_dir, "LATEST"), encoding="utf-8") as f:
+            name = f.read().strip()
+    except FileNotFoundError:
+        return None
+    path = os.path.join(checkpoint_dir, f"{name}.np")
+    return path if name and os.path.exists(path) else None
+
+
+def publish_checkpoint(m, name: str, meta: dict, checkpoint_dir: str = CHECKPOINT_DIR) -> str:
+    """
+    Écrit `<name>.np` + `<name>.json` puis bascule `LATEST` (chaque écriture est atomique) :
+    un serveur qui lit `LATEST` voit soit l'ancien checkpoint, soit le nouveau complet.
+    """
+    os.makedirs(checkpoint_dir, exist_ok=True)
+    path = os.path.join(checkpoint_dir, f"{name}.np")
+    save_warm_snapshot(m, path)
+    _write_atomic(os.path.join(checkpoint_dir, f"{name}.json"), json.dumps(meta, indent=2))
+    _write_atomic(os.path.join(checkpoint_dir, "LATEST"), name + "\n")
+    return path
+
+
+# ----------------------------
+# État du modèle pour le process courant
+# ----------------------------
+
+_LOCK = threading.Lock()
+_STATE = {
+    "model": None,
+    "source": None,
+    "path": None,
+    "version": None,
+    "loaded_at": None,
+    "load_seconds": None,
+    "error": None,
+    "swaps": 0,
+}
+
+
+def _prepare_for_serving(m) -> None:
+    """Réglages d'inférence appliqués une fois au chargement, jamais sur le chemin des requêtes."""
+    # Fitté sur une seule série ("__df__") : les frames multi-séries de `predict_frames`
+    # (IDs = villes) utilisent les paramètres de normalisation globaux (identiques ici).
+    # Le backend NumPy n'a pas de normalisation par ID.
+    cfg = getattr(m, "config_normalization", None)
+    if cfg is not None:
+        cfg.unknown_data_normalization = True
+
+
+def _install(m, source: str, path: str, t0: float) -> None:
+    _prepare_for_serving(m)
+    _STATE.update(
+        model=m,
+        source=source,
+        path=path,
+        version=f"{os.path.basename(path)}@{int(os.path.getmtime(path))}",
+        loaded_at=time.time(),
+        load_seconds=time.perf_counter() - t0,
+        error=None,
+    )
+
+
+def ensure_model_loaded(
+    model_path: str,
+    train_csv_path: str,
+    snapshot_path: Optional[str] = WARM_SNAPSHOT,
+    backend: str = INFERENCE_BACKEND,
+):
+    """
+    Retourne le modèle du process, en le chargeant au premier appel.
+
+    Backend "numpy" : charge l'export NumPy (pas de torch). Sinon priorité au dernier
+    checkpoint incrémental, puis au snapshot warm (désérialisation seule) ; à défaut,
+    mini-fit de `load_and_warm_model`.
+    """
+    m = _STATE["model"]
+    if m is not None:
+        return m
+
+    with _LOCK:
+        if _STATE["model"] is not None:
+            return _STATE["model"]
+
+        t0 = time.perf_counter()
+        try:
+            checkpoint = latest_checkpoint() if backend != "numpy" else None
+            with stage("model_load"):
+                if backend == "numpy":
+                    from app.services.numpy_engine import NumpyPredictor
+
+                    m, source, path = NumpyPredictor.load(NUMPY_EXPORT), "numpy-export", NUMPY_EXPORT
+                elif checkpoint is not None:
+                    m, source, path = load_warm_snapshot(checkpoint), "checkpoint", checkpoint
+                elif snapshot_path and os.path.exists(snapshot_path):
+                    m, source, path = load_warm_snapshot(snapshot_path), "snapshot", snapshot_path
+                else:
+                    m, source, path = load_and_warm_model(model_path, train_csv_path), "warm-fit", model_path
+        except Exception as e:
+            _STATE["error"] = str(e)
+            raise
+
+        _install(m, source, path, t0)
+        return m
+
+
+def reload_if_updated(backend: str = INFERENCE_BACKEND, checkpoint_dir: str = CHECKPOINT_DIR) -> bool:
+    """
+    Bascule à chaud sur le checkpoint pointé par `LATEST` s'il a changé.
+
+    Le chargement se fait hors verrou ; seul le remplacement de la référence est
+    protégé. Les requêtes en cours gardent l'ancien modèle jusqu'à leur fin, les
+    suivantes obtiennent le nouveau (et une nouvelle version => clés de cache neuves).
+    """
+    if backend == "numpy" or _STATE["model"] is None:
+        return False
+    path = latest_checkpoint(checkpoint_dir)
+    if path is None or path == _STATE["path"]:
+        return False
+
+    t0 = time.perf_counter()
+    with stage("model_load"):
+        m = load_warm_snapshot(path)
+    with _LOCK:
+        _install(m, "checkpoint", path, t0)
+        _STATE["swaps"] += 1
+    return True
+
+
+def model_version() -> Optional[str]:
+    """Identifiant du modèle servi (fichier + mtime), utilisé dans les clés de cache."""
+    return _STATE["version"]
+
+
+def model_status() -> dict:
+    return {
+        "ready": _STATE["model"] is not None,
+        "source": _STATE["source"],
+        "version": _STATE["version"],
+        "path": _STATE["path"],
+        "swaps": _STATE["swaps"],
+        "loaded_at": _STATE["loaded_at"],
+        "load_seconds": _STATE["load_seconds"],
+        "error": _STATE["error"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Warm le modèle NeuralProphet et persiste un snapshot.")
+    parser.add_argument("--model", default="models/neuralprophet_co_deployable.pkl")
+    parser.add_argument("--train-csv", default="models/train_df_deploy.csv")
+    parser.add_argument("--out", default=WARM_SNAPSHOT)
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    m = load_and_warm_model(args.model, args.train_csv)
+    save_warm_snapshot(m, args.out)
+    print(f"Snapshot écrit: {args.out} ({time.perf_counter() - t0:.1f}s)")
+
+
+if __name__ == "__main__":
+    main()
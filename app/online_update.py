@@ -0,0 +1,241 @@
+"""
+Mise à jour incrémentale du modèle à partir des observations historisées.
+
+Ne prend que les heures observées depuis le dernier checkpoint (`trained_until`),
+affine les poids courants sur quelques epochs, puis publie un checkpoint versionné
+(`models/checkpoints/co-000042.np` + `.json`) et bascule `LATEST`. Les serveurs
+surveillent `LATEST` (`MODEL_RELOAD_INTERVAL_S`) et basculent à chaud.
+
+    python -m app.online_update --epochs 3 --holdout-hours 12
+"""
+import argparse
+import glob
+import inspect
+import json
+import os
+import sys
+import time
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from app.model_loader import (
+    CHECKPOINT_DIR,
+    WARM_SNAPSHOT,
+    ensure_model_loaded,
+    latest_checkpoint,
+    load_warm_snapshot,
+    model_status,
+    publish_checkpoint,
+)
+from app.services.features import COLUMNS, current_hour
+from app.services.inference import postprocess_yhat
+from app.services.observations import OBSERVATIONS_MAX_GAP_H, ObservationStore, OBSERVATIONS_DB
+
+MODEL_PATH = "models/neuralprophet_co_deployable.pkl"
+TRAIN_CSV = "models/train_df_deploy.csv"
+
+
+def current_meta(checkpoint_dir: str = CHECKPOINT_DIR) -> Tuple[Optional[str], dict]:
+    """(nom, métadonnées) du checkpoint courant ; (None, {}) avant la première mise à jour."""
+    path = latest_checkpoint(checkpoint_dir)
+    if path is None:
+        return None, {}
+    name = os.path.splitext(os.path.basename(path))[0]
+    try:
+        with open(os.path.join(checkpoint_dir, f"{name}.json"), encoding="utf-8") as f:
+            return name, json.load(f)
+    except FileNotFoundError:
+        return name, {}
+
+
+def new_rows(store: ObservationStore, after_hour: Optional[str], before_hour: str) -> Dict[str, pd.DataFrame]:
+    """Séries horaires ds, y, T, RH, NO2(GT) par ville, heures complètes uniquement."""
+    raw = store.hourly_since(after_hour, before_hour)
+    out = {}
+    for city, g in raw.groupby("city"):
+        df = pd.DataFrame({
+            "ds": pd.to_datetime(g["ts_hour"]),
+            # Modèle entraîné sur CO en mg/m³ ; WeatherAPI donne des µg/m³
+            "y": g["co"].to_numpy() / 1000.0,
+            "T": g["temp_c"].to_numpy(),
+            "RH": g["humidity"].to_numpy(),
+            "NO2(GT)": g["no2"].to_numpy(),
+        }).set_index("ds").asfreq("h")
+        # Mêmes règles que le contexte servi : petits trous interpolés, le reste écarté
+        df = df.interpolate(limit=OBSERVATIONS_MAX_GAP_H, limit_area="inside").dropna()
+        if len(df):
+            out[city] = df.reset_index()[["ds"] + COLUMNS]
+    return out
+
+
+def mae(m, frames: Dict[str, pd.DataFrame]) -> Optional[float]:
+    """MAE (sortie post-traitée comme en production) sur des séries observées.
+
+    Seules les lignes prévues comptent : avec des lags AR, les `n_lags` premières lignes
+    de chaque série n'ont pas de `yhat1`. NaN si aucune ligne n'est prévue.
+    """
+    if not frames:
+        return None
+    errs = []
+    for df in frames.values():
+        fc = m.predict(df)
+        yhat = np.array([postprocess_yhat(v) for v in fc["yhat1"].to_numpy(dtype=float)])
+        y = df["y"].to_numpy(dtype=float)[-len(yhat):]
+        ok = np.isfinite(yhat) & np.isfinite(y)
+        errs.append(np.abs(yhat[ok] - y[ok]))
+    errs = np.concatenate(errs)
+    return float(np.mean(errs)) if len(errs) else float("nan")
+
+
+def fine_tune(m, frames: Dict[str, pd.DataFrame], epochs: int, learning_rate: float):
+    """Quelques epochs à partir des poids courants, sur toutes les villes à la fois.
+
+    Un seul `fit` sur un df multi-séries (`ID` = ville) : chaque epoch mélange les villes,
+    au lieu d'affiner ville après ville (la dernière ville traitée l'emportait).
+    """
+    if "continue_training" not in inspect.signature(m.fit).parameters:
+        # Un re-fit complet écraserait les poids courants : pas de mise à jour silencieuse
+        raise RuntimeError("NeuralProphet sans `continue_training` : mise à jour incrémentale impossible")
+    stacked = pd.concat([df.assign(ID=str(city)) for city, df in frames.items()], ignore_index=True)
+    metrics = m.fit(
+        stacked,
+        freq="h",
+        epochs=epochs,
+        learning_rate=learning_rate,
+        progress="off",
+        minimal=True,
+        continue_training=True,
+    )
+    if isinstance(metrics, pd.DataFrame) and len(metrics):
+        return {k: float(v) for k, v in metrics.iloc[-1].items() if isinstance(v, (int, float))}
+    return None
+
+
+def prune(checkpoint_dir: str, keep: int, current: str) -> int:
+    """Supprime les checkpoints les plus anciens (le courant est toujours gardé)."""
+    names = sorted(os.path.splitext(os.path.basename(p))[0] for p in glob.glob(os.path.join(checkpoint_dir, "co-*.np")))
+    removed = 0
+    for name in names[:-keep] if keep > 0 else []:
+        if name == current:
+            continue
+        for ext in (".np", ".json"):
+            try:
+                os.remove(os.path.join(checkpoint_dir, name + ext))
+            except FileNotFoundError:
+                pass
+        removed += 1
+    return removed
+
+
+def run_update(
+    checkpoint_dir: str = CHECKPOINT_DIR,
+    db_path: str = OBSERVATIONS_DB,
+    epochs: int = 3,
+    learning_rate: float = 1e-3,
+    min_rows: int = 24,
+    holdout_hours: int = 0,
+    tolerance: float = 0.05,
+    keep: int = 5,
+) -> dict:
+    parent, meta = current_meta(checkpoint_dir)
+    after = meta.get("trained_until")
+    before = current_hour().strftime("%Y-%m-%d %H:00")  # heure en cours exclue (incomplète)
+
+    store = ObservationStore(db_path)
+    # Pré-filtre avant de charger le modèle (recompté ci-dessous, contexte exclu)
+    n_new = sum(len(df) for df in new_rows(store, after, before).values())
+    if n_new < min_rows:
+        return {"status": "skipped", "reason": f"{n_new} nouvelles heures (< {min_rows})", "trained_until": after}
+
+    t0 = time.perf_counter()
+    # Poids de départ : checkpoint courant, sinon snapshot warm / mini-fit
+    if parent is not None:
+        m = load_warm_snapshot(latest_checkpoint(checkpoint_dir))
+    else:
+        m = ensure_model_loaded(MODEL_PATH, TRAIN_CSV, WARM_SNAPSHOT, "neuralprophet")
+        parent = model_status()["source"]
+
+    # Lags AR : chaque série commence par les `n_lags` heures observées qui précèdent
+    # (déjà apprises, elles ne servent que d'entrées) ; NeuralProphet exige n_lags + 1 lignes
+    n_lags = int(getattr(m, "n_lags", 0) or 0)
+    context_after = None
+    if after:
+        context_after = (pd.Timestamp(after) - pd.Timedelta(hours=n_lags)).strftime("%Y-%m-%d %H:00")
+    frames, holdout = {}, {}
+    for city, df in new_rows(store, context_after, before).items():
+        # Les dernières heures de chaque ville servent à valider avant publication,
+        # précédées de leurs n_lags heures de contexte
+        if holdout_hours > 0 and len(df) - holdout_hours > n_lags:
+            holdout[city] = df.iloc[-(holdout_hours + n_lags):].reset_index(drop=True)
+            df = df.iloc[:-holdout_hours]
+        if len(df) > n_lags and (after is None or df["ds"].max() > pd.Timestamp(after)):
+            frames[city] = df
+
+    def n_fresh(df: pd.DataFrame) -> int:
+        return int((df["ds"] > pd.Timestamp(after)).sum()) if after else len(df)
+
+    n_rows = sum(n_fresh(df) for df in frames.values())
+    if n_rows < min_rows:
+        return {"status": "skipped", "reason": f"{n_rows} nouvelles heures (< {min_rows})", "trained_until": after}
+
+    mae_before = mae(m, holdout) if holdout else None
+    train_metrics = fine_tune(m, frames, epochs, learning_rate)
+    mae_after = mae(m, holdout) if holdout else None
+
+    result = {
+        "parent": parent,
+        "rows": n_rows,
+        "cities": {c: n_fresh(df) for c, df in frames.items()},
+        "epochs": epochs,
+        "learning_rate": learning_rate,
+        "holdout_mae_before": mae_before,
+        "holdout_mae_after": mae_after,
+        "train_metrics": train_metrics,
+        "seconds": time.perf_counter() - t0,
+    }
+    # MAE NaN (aucune heure de holdout prévue) : pas de validation possible => pas de publication
+    if holdout and not (mae_after <= mae_before * (1 + tolerance)):
+        # Checkpoint non publié : les mêmes heures seront reprises à la prochaine exécution
+        return {"status": "rejected", **result}
+
+    version = int(meta.get("version", 0)) + 1
+    name = f"co-{version:06d}"
+    last_hour = max(df["ds"].max() for df in frames.values())
+    # Les heures de validation font partie du prochain lot d'entraînement
+    trained_until = last_hour.strftime("%Y-%m-%d %H:00")
+    result.update(name=name, version=version, trained_until=trained_until, created_at=time.time())
+    path = publish_checkpoint(m, name, result, checkpoint_dir)
+    removed = prune(checkpoint_dir, keep, name)
+    return {"status": "published", "path": path, "pruned": removed, **result}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Affine le modèle sur les nouvelles observations et publie un checkpoint.")
+    parser.add_argument("--checkpoint-dir", default=CHECKPOINT_DIR)
+    parser.add_argument("--db", default=OBSERVATIONS_DB)
+    parser.add_argument("--epochs", type=int, default=3)
+    parser.add_argument("--learning-rate", type=float, default=1e-3)
+    parser.add_argument("--min-rows", type=int, default=24, help="nouvelles heures minimum pour lancer une mise à jour")
+    parser.add_argument("--holdout-hours", type=int, default=0, help="dernières heures par ville gardées pour valider")
+    parser.add_argument("--tolerance", type=float, default=0.05, help="dégradation de MAE tolérée sur le holdout")
+    parser.add_argument("--keep", type=int, default=5, help="checkpoints conservés")
+    args = parser.parse_args()
+
+    res = run_update(
+        checkpoint_dir=args.checkpoint_dir,
+        db_path=args.db,
+        epochs=args.epochs,
+        learning_rate=args.learning_rate,
+        min_rows=args.min_rows,
+        holdout_hours=args.holdout_hours,
+        tolerance=args.tolerance,
+        keep=args.keep,
+    )
+    print(json.dumps(res, indent=2, default=str))
+    sys.exit(1 if res["status"] == "rejected" else 0)
+
+
+if __name__ == "__main__":
+    main()
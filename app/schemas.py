@@ -3,10 +3,22 @@ from typing import Optional, Dict, List, Any
 
 
 class PredictRequest(BaseModel):
-    city: str = Field(..., examples=["Montreal"])
+    # Nom du registre (GET /cities) ou coordonnées "lat,lon"
+    city: str = Field(..., examples=["Montreal", "46.3438,-72.5430"])
     no2_ugm3: Optional[float] = None
     temp_c: Optional[float] = None
     rh: Optional[float] = None
+    # Nombre d'heures prédites (t+1h ... t+horizon)
+    horizon: int = Field(1, ge=1, le=72)
+
+
+class ForecastRequest(PredictRequest):
+    horizon: int = Field(24, ge=1, le=72)
+
+
+class ForecastPoint(BaseModel):
+    ds: str
+    yhat1: float
 
 
 class PredictResponse(BaseModel):
@@ -14,6 +26,62 @@ class PredictResponse(BaseModel):
     ds: str
     yhat1: float
     inputs: Dict[str, Any]
+    # Renseignée seulement si horizon > 1 (ds/yhat1 restent le pas t+1h)
+    trajectory: Optional[List[ForecastPoint]] = None
+    # Servi depuis un snapshot pré-calculé ou une météo de secours : âge (s) et péremption
+    age_s: Optional[float] = None
+    stale: bool = False
+
+
+class ForecastResponse(BaseModel):
+    city: str
+    horizon: int
+    points: List[ForecastPoint]
+    inputs: Dict[str, Any]
+    # "weatherapi_forecast" (prévisions horaires) ou "persistence" (features actuelles répétées)
+    regressor_source: str
+    # WeatherAPI indisponible : entrées issues de la dernière réponse valide (âge en s)
+    age_s: Optional[float] = None
+    stale: bool = False
+
+
+class BatchPredictRequest(BaseModel):
+    items: List[PredictRequest] = Field(..., min_length=1, max_length=200)
+
+
+class BatchPredictItem(BaseModel):
+    index: int
+    city: str
+    ok: bool
+    result: Optional[PredictResponse] = None
+    error: Optional[str] = None
+
+
+class BatchPredictResponse(BaseModel):
+    results: List[BatchPredictItem]
+
+
+# ----------------------------
+# REGISTRE DES VILLES
+# ----------------------------
+
+class CityOut(BaseModel):
+    name: str
+    lat: float
+    lon: float
+    region: str = ""
+    distance_km: Optional[float] = None
+
+
+class CitiesResponse(BaseModel):
+    count: int
+    cities: List[str]
+
+
+class NearestCitiesResponse(BaseModel):
+    lat: float
+    lon: float
+    cities: List[CityOut]
 
 
 # ----------------------------
@@ -57,6 +125,10 @@ class RealtimeCityResponse(BaseModel):
 
     raw: Optional[Dict[str, Any]] = None
 
+    # Servi depuis un snapshot pré-calculé ou une météo de secours : âge (s) et péremption
+    age_s: Optional[float] = None
+    stale: bool = False
+
 
 class RealtimeResponse(BaseModel):
     cities: List[RealtimeCityResponse]
@@ -0,0 +1,125 @@
+import asyncio
+import contextvars
+import os
+import time
+from typing import Any, Awaitable, Callable, List, Optional
+
+MICROBATCH_ENABLED = os.getenv("MICROBATCH_ENABLED", "1") == "1"
+MICROBATCH_MAX_SIZE = int(os.getenv("MICROBATCH_MAX_SIZE", "32"))
+MICROBATCH_MAX_WAIT_MS = float(os.getenv("MICROBATCH_MAX_WAIT_MS", "5"))
+
+
+class _Pending:
+    __slots__ = ("item", "future", "enqueued")
+
+    def __init__(self, item, future):
+        self.item = item
+        self.future = future
+        self.enqueued = time.perf_counter()
+
+
+class MicroBatcher:
+    """
+    Regroupe les appels concurrents arrivant dans une petite fenêtre en UNE passe modèle.
+
+    Un lot part dès qu'il atteint `max_batch_size` ou que `max_wait_ms` s'est écoulé
+    depuis sa première requête. `run_batch(items)` doit renvoyer un résultat par item,
+    dans le même ordre ; chaque appelant récupère le sien.
+    """
+
+    def __init__(
+        self,
+        run_batch: Callable[[List[Any]], Awaitable[List[Any]]],
+        max_batch_size: int = MICROBATCH_MAX_SIZE,
+        max_wait_ms: float = MICROBATCH_MAX_WAIT_MS,
+    ):
+        self.run_batch = run_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait_s = max_wait_ms / 1000.0
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._inflight = set()
+        self.stats = {
+            "batches": 0,
+            "items": 0,
+            "batch_size_hist": {},
+            "queue_seconds_total": 0.0,
+            "queue_seconds_max": 0.0,
+        }
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._queue = asyncio.Queue()
+            # Contexte vierge : la collecte ne doit pas hériter des timings de la requête qui l'a démarrée
+            self._task = asyncio.get_running_loop().create_task(self._collect(), context=contextvars.Context())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def submit(self, item) -> Any:
+        self.start()
+        fut = asyncio.get_running_loop().create_future()
+        await self._queue.put(_Pending(item, fut))
+        return await fut
+
+    async def _collect(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.max_wait_s
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            # Le lot s'exécute en tâche de fond : la collecte du lot suivant continue
+            task = loop.create_task(self._dispatch(batch))
+            self._inflight.add(task)
+            task.add_done_callback(self._inflight.discard)
+
+    def _record(self, batch: List[_Pending]):
+        now = time.perf_counter()
+        s = self.stats
+        s["batches"] += 1
+        s["items"] += len(batch)
+        s["batch_size_hist"][len(batch)] = s["batch_size_hist"].get(len(batch), 0) + 1
+        for p in batch:
+            waited = now - p.enqueued
+            s["queue_seconds_total"] += waited
+            s["queue_seconds_max"] = max(s["queue_seconds_max"], waited)
+
+    async def _dispatch(self, batch: List[_Pending]):
+        self._record(batch)
+        try:
+            results = await self.run_batch([p.item for p in batch])
+        except Exception as e:
+            for p in batch:
+                if not p.future.done():
+                    p.future.set_exception(e)
+            return
+        for p, res in zip(batch, results):
+            if p.future.done():
+                continue
+            if isinstance(res, Exception):
+                p.future.set_exception(res)
+            else:
+                p.future.set_result(res)
+
+    def snapshot_stats(self) -> dict:
+        out = dict(self.stats)
+        out["batch_size_hist"] = dict(sorted(self.stats["batch_size_hist"].items()))
+        out["avg_batch_size"] = out["items"] / out["batches"] if out["batches"] else 0.0
+        out["queue_seconds_avg"] = out["queue_seconds_total"] / out["items"] if out["items"] else 0.0
+        out["max_batch_size"] = self.max_batch_size
+        out["max_wait_ms"] = self.max_wait_s * 1000.0
+        return out
@@ -0,0 +1,119 @@
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+
+class TTLCache:
+    """
+    Cache en mémoire avec TTL par entrée + "single-flight".
+
+    - `ttl_for(value)` permet de calculer l'expiration à partir de la valeur
+      (ex: aligner sur `last_updated` de WeatherAPI)
+    - plusieurs miss concurrents sur la même clé => un seul appel à `compute`
+    """
+
+    def __init__(self, ttl_s: float, max_entries: Optional[int] = None):
+        self.ttl_s = float(ttl_s)
+        self.max_entries = max_entries
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()  # key -> (expires_at, value)
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+        self._lock = threading.Lock()
+        self.stats = {
+            "hits": 0,
+            "misses": 0,
+            "coalesced": 0,
+            "evictions": 0,
+            "compute_count": 0,
+            "compute_seconds_total": 0.0,
+            "compute_seconds_max": 0.0,
+        }
+
+    def _get_fresh(self, key, now):
+        item = self._data.get(key)
+        if item is None:
+            return False, None
+        expires_at, value = item
+        if expires_at <= now:
+            del self._data[key]
+            return False, None
+        self._data.move_to_end(key)
+        return True, value
+
+    def get(self, key):
+        with self._lock:
+            found, value = self._get_fresh(key, time.time())
+            return value if found else None
+
+    def set(self, key, value, ttl_s: Optional[float] = None):
+        ttl = self.ttl_s if ttl_s is None else ttl_s
+        with self._lock:
+            self._data[key] = (time.time() + ttl, value)
+            self._data.move_to_end(key)
+            if self.max_entries is not None:
+                while len(self._data) > self.max_entries:
+                    self._data.popitem(last=False)
+                    self.stats["evictions"] += 1
+
+    def _record_compute(self, seconds: float):
+        with self._lock:
+            self.stats["compute_count"] += 1
+            self.stats["compute_seconds_total"] += seconds
+            self.stats["compute_seconds_max"] = max(self.stats["compute_seconds_max"], seconds)
+
+    async def aget_or_compute(
+        self,
+        key,
+        compute: Callable[[], Awaitable[Any]],
+        ttl_for: Optional[Callable[[Any], float]] = None,
+    ):
+        """
+        Single-flight via une tâche partagée par clé.
+
+        `compute` tourne dans une tâche détachée que chaque appelant attend via `shield` :
+        l'annulation d'un appelant (client déconnecté) n'annule ni le calcul ni les autres.
+        """
+        with self._lock:
+            found, value = self._get_fresh(key, time.time())
+            if found:
+                self.stats["hits"] += 1
+                return value
+            task = self._inflight.get(key)
+            if task is not None:
+                self.stats["coalesced"] += 1
+            else:
+                self.stats["misses"] += 1
+
+        if task is None:
+            task = self._inflight[key] = asyncio.get_running_loop().create_task(
+                self._acompute(key, compute, ttl_for)
+            )
+            # Évite le warning "Task exception was never retrieved" si tous les appelants sont partis
+            task.add_done_callback(lambda t: t.cancelled() or t.exception())
+        return await asyncio.shield(task)
+
+    async def _acompute(self, key, compute: Callable[[], Awaitable[Any]], ttl_for):
+        t0 = time.perf_counter()
+        try:
+            value = await compute()
+            self._record_compute(time.perf_counter() - t0)
+            self.set(key, value, ttl_for(value) if ttl_for else None)
+            return value
+        finally:
+            self._inflight.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def snapshot_stats(self) -> dict:
+        with self._lock:
+            out = dict(self.stats)
+            out["size"] = len(self._data)
+        lookups = out["hits"] + out["misses"] + out["coalesced"]
+        out["hit_ratio"] = (out["hits"] + out["coalesced"]) / lookups if lookups else 0.0
+        out["compute_seconds_avg"] = (
+            out["compute_seconds_total"] / out["compute_count"] if out["compute_count"] else 0.0
+        )
+        return out
@@ -0,0 +1,159 @@
+"""
+Registre des municipalités (fichier `data/cities.csv` : name, lat, lon, region).
+
+- recherche par nom : dict normalisé (sans accents / casse / tirets) => O(1)
+- plus proches voisins : KD-tree sur les vecteurs unitaires 3D (distance de corde
+  monotone en la distance orthodromique) => O(log n), sans cas particulier aux pôles
+"""
+import csv
+import os
+import re
+import threading
+import unicodedata
+from typing import TYPE_CHECKING, Dict, List, NamedTuple, Optional, Tuple
+
+# NumPy / scipy ne servent qu'à la recherche par coordonnées (importés au premier besoin)
+if TYPE_CHECKING:
+    import numpy as np
+
+CITIES_CSV = os.getenv("CITIES_CSV", "data/cities.csv")
+# Coordonnées à moins de cette distance d'une ville du registre => rattachées à cette ville
+CITY_SNAP_KM = float(os.getenv("CITY_SNAP_KM", "5"))
+
+EARTH_RADIUS_KM = 6371.0088
+
+_COORDS_RE = re.compile(r"^\s*(-?\d+(?:\.\d+)?)\s*,\s*(-?\d+(?:\.\d+)?)\s*$")
+
+
+class City(NamedTuple):
+    name: str
+    lat: float
+    lon: float
+    region: str = ""
+
+    @property
+    def query(self) -> str:
+        """Requête WeatherAPI (coordonnées => pas d'ambiguïté de geocoding)."""
+        return f"{self.lat:.4f},{self.lon:.4f}"
+
+
+class Location(NamedTuple):
+    """Lieu résolu : `name` sert de clé (snapshots, observations), `query` est envoyé à WeatherAPI."""
+    name: str
+    query: str
+    city: Optional[City] = None
+
+
+def normalize_name(name: str) -> str:
+    """"Trois-Rivières" / "trois rivieres" / "TROIS_RIVIERES" -> "trois rivieres"."""
+    folded = unicodedata.normalize("NFKD", name).encode("ascii", "ignore").decode()
+    return " ".join(re.sub(r"[^a-z0-9]+", " ", folded.lower()).split())
+
+
+def parse_coords(q: str) -> Optional[Tuple[float, float]]:
+    """"lat,lon" -> (lat, lon), None si `q` n'est pas une coordonnée valide."""
+    m = _COORDS_RE.match(q)
+    if m is None:
+        return None
+    lat, lon = float(m.group(1)), float(m.group(2))
+    if not (-90.0 <= lat <= 90.0 and -180.0 <= lon <= 180.0):
+        return None
+    return lat, lon
+
+
+def _unit_vectors(lat, lon) -> "np.ndarray":
+    import numpy as np
+
+    lat, lon = np.radians(lat), np.radians(lon)
+    cos_lat = np.cos(lat)
+    return np.column_stack([cos_lat * np.cos(lon), cos_lat * np.sin(lon), np.sin(lat)])
+
+
+class CityRegistry:
+    def __init__(self, cities: List[City]):
+        self.cities = cities
+        self._by_name: Dict[str, int] = {}
+        for i, c in enumerate(cities):
+            self._by_name.setdefault(normalize_name(c.name), i)
+        self._tree = None
+        self._tree_lock = threading.Lock()
+
+    @classmethod
+    def from_csv(cls, path: str = CITIES_CSV) -> "CityRegistry":
+        with open(path, newline="", encoding="utf-8") as f:
+            cities = [
+                City(row["name"].strip(), float(row["lat"]), float(row["lon"]), (row.get("region") or "").strip())
+                for row in csv.DictReader(f)
+            ]
+        return cls(cities)
+
+    def __len__(self) -> int:
+        return len(self.cities)
+
+    def names(self) -> List[str]:
+        return [c.name for c in self.cities]
+
+    def get(self, name: str) -> Optional[City]:
+        i = self._by_name.get(normalize_name(name))
+        return self.cities[i] if i is not None else None
+
+    def _kdtree(self):
+        # Construit au premier appel
+        if self._tree is None:
+            with self._tree_lock:
+                if self._tree is None:
+                    import numpy as np
+                    from scipy.spatial import cKDTree
+
+                    lat = np.array([c.lat for c in self.cities], dtype=np.float64)
+                    lon = np.array([c.lon for c in self.cities], dtype=np.float64)
+                    self._tree = cKDTree(_unit_vectors(lat, lon))
+        return self._tree
+
+    def nearest(self, lat: float, lon: float, n: int = 1) -> List[Tuple[City, float]]:
+        """Les `n` villes les plus proches de (lat, lon), avec leur distance en km."""
+        import numpy as np
+
+        n = min(n, len(self.cities))
+        if n <= 0:
+            return []
+        chord, idx = self._kdtree().query(_unit_vectors(lat, lon)[0], k=n)
+        chord, idx = np.atleast_1d(chord), np.atleast_1d(idx)
+        km = 2.0 * EARTH_RADIUS_KM * np.arcsin(np.clip(chord / 2.0, 0.0, 1.0))
+        return [(self.cities[i], float(d)) for i, d in zip(idx, km)]
+
+    def resolve(self, q: str) -> Optional[Location]:
+        """
+        Nom enregistré ou "lat,lon" -> Location.
+
+        Des coordonnées proches (< CITY_SNAP_KM) d'une ville du registre sont rattachées
+        à cette ville ; sinon le lieu reste identifié par ses coordonnées arrondies.
+        None si `q` n'est ni un nom connu ni une coordonnée.
+        """
+        city = self.get(q)
+        if city is not None:
+            return Location(city.name, city.query, city)
+
+        coords = parse_coords(q)
+        if coords is None:
+            return None
+        lat, lon = coords
+        if self.cities:
+            city, km = self.nearest(lat, lon, 1)[0]
+            if km <= CITY_SNAP_KM:
+                return Location(city.name, city.query, city)
+        name = f"{lat:.4f},{lon:.4f}"
+        return Location(name, name)
+
+
+_REGISTRY: Optional[CityRegistry] = None
+_REGISTRY_LOCK = threading.Lock()
+
+
+def get_city_registry() -> CityRegistry:
+    global _REGISTRY
+    if _REGISTRY is None:
+        with _REGISTRY_LOCK:
+            if _REGISTRY is None:
+                _REGISTRY = CityRegistry.from_csv(CITIES_CSV)
+    return _REGISTRY
@@ -0,0 +1,110 @@
+import asyncio
+import contextvars
+import math
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable
+
+INFERENCE_WORKERS = int(os.getenv("INFERENCE_WORKERS", "2"))
+INFERENCE_MAX_QUEUE = int(os.getenv("INFERENCE_MAX_QUEUE", "32"))
+
+
+class QueueFullError(Exception):
+    """File d'inférence pleine : le client doit réessayer après `retry_after` secondes."""
+
+    def __init__(self, retry_after: int):
+        super().__init__("File d'inférence pleine, réessayer plus tard")
+        self.retry_after = retry_after
+
+
+class InferenceExecutor:
+    """
+    Pool dédié à l'inférence (torch est bloquant) avec file bornée.
+
+    Les `m.predict` d'un même modèle sont sérialisés (`inference.model_lock`) : plusieurs
+    workers ne parallélisent que la préparation des frames, pas la passe modèle.
+
+    Au-delà de `max_workers` tâches en cours + `max_queue` en attente, `run` lève
+    `QueueFullError` immédiatement (backpressure) au lieu d'empiler des requêtes
+    dont la latence exploserait.
+    """
+
+    def __init__(self, max_workers: int = INFERENCE_WORKERS, max_queue: int = INFERENCE_MAX_QUEUE):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="inference")
+        self._pending = 0  # modifié uniquement depuis l'event loop
+        self._lock = threading.Lock()
+        self.stats = {
+            "submitted": 0,
+            "completed": 0,
+            "rejected": 0,
+            "wait_seconds_total": 0.0,
+            "wait_seconds_max": 0.0,
+            "run_seconds_total": 0.0,
+            "run_seconds_max": 0.0,
+        }
+
+    def _record(self, wait: float, run: float):
+        with self._lock:
+            s = self.stats
+            s["completed"] += 1
+            s["wait_seconds_total"] += wait
+            s["wait_seconds_max"] = max(s["wait_seconds_max"], wait)
+            s["run_seconds_total"] += run
+            s["run_seconds_max"] = max(s["run_seconds_max"], run)
+
+    def _retry_after(self) -> int:
+        """Estimation: temps pour écouler la file au débit moyen observé (passes modèle sérialisées)."""
+        with self._lock:
+            done = self.stats["completed"]
+            avg_run = self.stats["run_seconds_total"] / done if done else 1.0
+        return max(1, math.ceil(avg_run * self._pending))
+
+    async def run(self, fn: Callable[..., Any], *args) -> Any:
+        if self._pending >= self.max_workers + self.max_queue:
+            self.stats["rejected"] += 1
+            raise QueueFullError(self._retry_after())
+
+        self._pending += 1
+        self.stats["submitted"] += 1
+        enqueued = time.perf_counter()
+
+        def _task():
+            started = time.perf_counter()
+            try:
+                return fn(*args)
+            finally:
+                self._record(started - enqueued, time.perf_counter() - started)
+
+        # Copie du contexte : les `stage()` exécutés dans le thread alimentent le Server-Timing
+        ctx = contextvars.copy_context()
+        try:
+            return await asyncio.wrap_future(self._pool.submit(ctx.run, _task))
+        finally:
+            self._pending -= 1
+
+    def queue_depth(self) -> int:
+        return max(0, self._pending - self.max_workers)
+
+    def snapshot_stats(self) -> dict:
+        with self._lock:
+            out = dict(self.stats)
+        done = out["completed"]
+        out.update(
+            workers=self.max_workers,
+            max_queue=self.max_queue,
+            in_flight=self._pending,
+            queue_depth=self.queue_depth(),
+            wait_seconds_avg=out["wait_seconds_total"] / done if done else 0.0,
+            run_seconds_avg=out["run_seconds_total"] / done if done else 0.0,
+        )
+        return out
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+inference_executor = InferenceExecutor()
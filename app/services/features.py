@@ -1,30 +1,142 @@
-import pandas as pd
-import numpy as np
+import os
+import threading
+from datetime import datetime, timedelta
+from typing import TYPE_CHECKING, List, Optional
+from zoneinfo import ZoneInfo
+
+# pandas / NumPy ne sont importés qu'à la construction d'un df_future (chemin modèle) :
+# /health, /realtime et le poller n'en ont pas besoin
+if TYPE_CHECKING:
+    import numpy as np
+    import pandas as pd
 
 REGRESSORS = ["T", "RH", "NO2(GT)"]
+COLUMNS = ["y"] + REGRESSORS
+N_CONTEXT = 48
+# Heure locale des `ts` WeatherAPI pour les villes servies
+LOCAL_TZ = ZoneInfo("America/Toronto")
+
+
+class ContextStore:
+    """
+    Historique fallback chargé UNE fois (invalidation par mtime du fichier).
+
+    On garde les `n_context` dernières lignes sous forme d'un bloc NumPy
+    (n_context, 4) pré-calculé, en lecture seule et partagé entre requêtes.
+    """
+
+    def __init__(self, csv_path: str):
+        self.csv_path = csv_path
+        self._lock = threading.Lock()
+        self._mtime = None
+        self._values = None          # historique complet trié (n, 4)
+        self._templates = {}         # n_context -> bloc (n_context, 4)
+
+    def _load(self):
+        import numpy as np
+        import pandas as pd
+
+        hist = pd.read_csv(self.csv_path)
+        hist["ds"] = pd.to_datetime(hist["ds"])
+        hist = hist.sort_values("ds")
+        self._values = hist[COLUMNS].to_numpy(dtype=np.float64)
+        self._templates = {}
+
+    def template(self, n_context: int) -> "np.ndarray":
+        mtime = os.path.getmtime(self.csv_path)
+        with self._lock:
+            if self._values is None or mtime != self._mtime:
+                self._load()
+                self._mtime = mtime
+
+            block = self._templates.get(n_context)
+            if block is None:
+                block = self._values[-n_context:].copy()
+                block.setflags(write=False)
+                self._templates[n_context] = block
+            return block
+
+
+_STORES = {}
+_STORES_LOCK = threading.Lock()
+
+
+def get_context_store(csv_path: str) -> ContextStore:
+    with _STORES_LOCK:
+        store = _STORES.get(csv_path)
+        if store is None:
+            store = _STORES[csv_path] = ContextStore(csv_path)
+        return store
+
+
+def current_hour() -> datetime:
+    """Heure locale courante arrondie à l'heure (naïve, comme les `ts` WeatherAPI)."""
+    return datetime.now(LOCAL_TZ).replace(minute=0, second=0, microsecond=0, tzinfo=None)
+
+
+def seconds_to_next_hour() -> float:
+    """Secondes avant le changement d'heure locale (nouvelle heure cible des prédictions)."""
+    now = datetime.now(LOCAL_TZ).replace(tzinfo=None)
+    return (current_hour() + timedelta(hours=1) - now).total_seconds()
+
+
+def future_hours(horizon: int) -> List[str]:
+    """Heures locales des pas futurs (t+1h ... t+horizon) au format `hour.time` de WeatherAPI."""
+    now = current_hour()
+    return [(now + timedelta(hours=k + 1)).strftime("%Y-%m-%d %H:00") for k in range(horizon)]
+
+
+def _hourly_axis(n_rows: int, horizon: int = 1) -> "np.ndarray":
+    """Axe temporel horaire qui finit à t+horizon (heure courante arrondie + horizon)."""
+    import numpy as np
+
+    now = current_hour()
+    start = np.datetime64(now, "h") - (n_rows - horizon - 1)
+    return (start + np.arange(n_rows)).astype("datetime64[ns]")
+
 
-def build_future_df(fallback_csv_path: str, new_feats: dict, n_context: int = 48) -> pd.DataFrame:
-    hist = pd.read_csv(fallback_csv_path)
-    hist["ds"] = pd.to_datetime(hist["ds"])
-    hist = hist.sort_values("ds")
+def build_future_df(
+    fallback_csv_path: str,
+    new_feats: dict,
+    n_context: int = N_CONTEXT,
+    horizon: int = 1,
+    future_feats: Optional[List[dict]] = None,
+    context: Optional["np.ndarray"] = None,
+) -> "pd.DataFrame":
+    """
+    Contexte historique (remappé pour finir "maintenant") + `horizon` pas futurs.
 
-    context = hist[["ds", "y"] + REGRESSORS].tail(n_context).copy()
+    `future_feats[k]` donne les régresseurs du pas t+k+1 ; à défaut on applique
+    la persistance de `new_feats` (features actuelles) sur tout l'horizon.
+    `context` (n, 4) remplace l'historique fallback (ex: observations réelles de la ville).
+    """
+    import numpy as np
+    import pandas as pd
 
-    # Remapper les dates du contexte pour finir "maintenant" (heure courante arrondie)
-    now = pd.Timestamp.now(tz="America/Toronto").floor("h").tz_localize(None)
-    start = now - pd.Timedelta(hours=n_context - 1)
-    context["ds"] = pd.date_range(start=start, periods=n_context, freq="h")
+    template = context if context is not None else get_context_store(fallback_csv_path).template(n_context)
+    n_ctx = len(template)
 
-    # Ligne future (t+1h)
-    future_ds = now + pd.Timedelta(hours=1)
+    # Le template reste partagé entre requêtes concurrentes : on copie le contexte
+    # (quelques centaines d'octets) et seules les lignes futures sont écrites.
+    block = np.empty((n_ctx + horizon, len(COLUMNS)), dtype=np.float64)
+    block[:n_ctx] = template
+    last_no2 = block[n_ctx - 1, 3]
 
-    future = {
-        "ds": future_ds,
-        "y": np.nan,
-        "T": float(new_feats["T"]),
-        "RH": float(new_feats["RH"]),
-        "NO2(GT)": float(new_feats["NO2(GT)"]) if new_feats["NO2(GT)"] is not None else float(context["NO2(GT)"].iloc[-1]),
-    }
+    for k in range(horizon):
+        feats = new_feats
+        if future_feats is not None and k < len(future_feats) and future_feats[k] is not None:
+            feats = future_feats[k]
+        no2 = feats.get("NO2(GT)")
+        if no2 is not None:
+            last_no2 = float(no2)
+        row = n_ctx + k
+        block[row, 0] = np.nan
+        block[row, 1] = float(feats["T"])
+        block[row, 2] = float(feats["RH"])
+        block[row, 3] = last_no2
 
-    df_future = pd.concat([context, pd.DataFrame([future])], ignore_index=True)
+    # Remapper les dates du contexte pour finir "maintenant" (heure courante arrondie),
+    # les `horizon` dernières lignes étant les pas futurs (t+1h ... t+horizon)
+    df_future = pd.DataFrame(block, columns=COLUMNS)
+    df_future.insert(0, "ds", _hourly_axis(len(block), horizon))
     return df_future
@@ -0,0 +1,63 @@
+"""
+Cache HTTP conditionnel : ETag faible + `If-None-Match` => 304, `Cache-Control: max-age`.
+
+L'ETag est calculé à partir de ce qui détermine la réponse (`ts` WeatherAPI, heure cible
+`ds`, entrées, version du modèle...) et non du corps : une requête dont l'ETag correspond
+est servie en 304 sans sérialiser (ni, pour /predict, calculer) la réponse.
+Faible (`W/`) car `age_s` évolue sans que les données changent.
+"""
+import hashlib
+import os
+from typing import Any, Callable, Optional
+
+import orjson
+from fastapi import Request, Response
+
+HTTP_CACHE_ENABLED = os.getenv("HTTP_CACHE_ENABLED", "1") == "1"
+
+
+def etag_for(*parts: Any) -> str:
+    digest = hashlib.blake2b(
+        orjson.dumps(parts, option=orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY),
+        digest_size=12,
+    ).hexdigest()
+    return f'W/"{digest}"'
+
+
+def _opaque(tag: str) -> str:
+    tag = tag.strip()
+    return tag[2:] if tag.startswith("W/") else tag
+
+
+def not_modified(request: Optional[Request], etag: str) -> bool:
+    """Comparaison faible de `If-None-Match` (liste ou `*`) avec `etag` ; GET/HEAD uniquement."""
+    if not HTTP_CACHE_ENABLED or request is None or request.method not in ("GET", "HEAD"):
+        return False
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    return _opaque(etag) in {_opaque(t) for t in header.split(",")}
+
+
+def cache_headers(etag: str, max_age_s: float) -> dict:
+    if not HTTP_CACHE_ENABLED:
+        return {}
+    # max-age=0 : à revalider à chaque fois (304 tant que l'ETag ne change pas)
+    return {"ETag": etag, "Cache-Control": f"max-age={max(0, int(max_age_s))}"}
+
+
+def conditional(
+    request: Optional[Request],
+    etag: str,
+    max_age_s: float,
+    render: Callable[[], Response],
+) -> Response:
+    """304 sans corps si le client a déjà cette version, sinon `render()` + ETag / Cache-Control."""
+    headers = cache_headers(etag, max_age_s)
+    if not_modified(request, etag):
+        return Response(status_code=304, headers=headers)
+    resp = render()
+    resp.headers.update(headers)
+    return resp
@@ -0,0 +1,97 @@
+import threading
+import weakref
+from typing import TYPE_CHECKING, Dict
+
+# pandas n'est importé qu'à l'exécution d'une prédiction (import de l'API léger)
+if TYPE_CHECKING:
+    import pandas as pd
+
+# NeuralProphet n'est pas thread-safe (trainer et état interne modifiés par `predict`) :
+# les passes sur un même modèle sont sérialisées, le pool d'inférence ne sert qu'à la file
+# et à la backpressure. Un verrou par modèle : après une bascule à chaud, l'ancien et le
+# nouveau modèle ne se bloquent pas mutuellement.
+_model_locks: "weakref.WeakKeyDictionary[object, threading.RLock]" = weakref.WeakKeyDictionary()
+_model_locks_guard = threading.Lock()
+
+
+def model_lock(m) -> threading.RLock:
+    with _model_locks_guard:
+        lock = _model_locks.get(m)
+        if lock is None:
+            lock = _model_locks[m] = threading.RLock()
+        return lock
+
+
+def postprocess_yhat(raw_yhat: float) -> float:
+    """Clip physique + clip "dataset-realistic" appliqués à la sortie brute du modèle."""
+    raw_yhat *= -1 if raw_yhat < 0 else 1
+    return float(min(max(raw_yhat, 0.0), 15.0))
+
+
+def predict_frames(m, frames: Dict[str, "pd.DataFrame"]) -> Dict[str, "pd.DataFrame"]:
+    """
+    Exécute UNE seule passe `m.predict` sur plusieurs df_future empilés.
+
+    Chaque frame reçoit une colonne `ID` (clé du dict) => NeuralProphet traite
+    le tout comme un df multi-séries et on redécoupe la sortie par ID.
+    """
+    if not frames:
+        return {}
+
+    if len(frames) == 1:
+        key, df = next(iter(frames.items()))
+        with model_lock(m):
+            return {key: m.predict(df)}
+
+    import pandas as pd
+
+    # IDs inconnus du modèle : normalisation globale (réglée au chargement,
+    # cf. `model_loader._prepare_for_serving`)
+    stacked = pd.concat(
+        [df.assign(ID=str(key)) for key, df in frames.items()],
+        ignore_index=True,
+    )
+    with model_lock(m):
+        fc = m.predict(stacked)
+    return {
+        key: part.drop(columns=["ID"]).reset_index(drop=True)
+        for key, part in fc.groupby("ID", sort=False)
+    }
+
+
+def _n_lags(m) -> int:
+    return int(getattr(m, "n_lags", 0) or 0)
+
+
+def forecast_trajectory(m, df_future: "pd.DataFrame", horizon: int) -> "pd.DataFrame":
+    """
+    Trajectoire (ds, yhat1) sur les `horizon` dernières lignes de `df_future`.
+
+    Sans lags AR, les pas futurs ne dépendent que des régresseurs => une seule passe.
+    Avec lags AR, chaque pas dépend des y précédents => déroulé récursif (y <- yhat1).
+    """
+    if horizon <= 1 or _n_lags(m) == 0:
+        with model_lock(m):
+            fc = m.predict(df_future)
+        return fc[["ds", "yhat1"]].tail(horizon).reset_index(drop=True)
+
+    df = df_future.copy()
+    first = len(df) - horizon
+    with model_lock(m):
+        for k in range(horizon):
+            fc = m.predict(df.iloc[: first + k + 1])
+            df.loc[first + k, "y"] = float(fc["yhat1"].iloc[-1])
+    out = df[["ds", "y"]].tail(horizon).rename(columns={"y": "yhat1"})
+    return out.reset_index(drop=True)
+
+
+def forecast_frames(m, frames: Dict[str, "pd.DataFrame"], horizons: Dict[str, int]) -> Dict[str, "pd.DataFrame"]:
+    """Trajectoires pour plusieurs df_future (une seule passe quand le modèle le permet)."""
+    if _n_lags(m) > 0 and any(h > 1 for h in horizons.values()):
+        return {key: forecast_trajectory(m, df, horizons[key]) for key, df in frames.items()}
+
+    fcs = predict_frames(m, frames)
+    return {
+        key: fc[["ds", "yhat1"]].tail(horizons[key]).reset_index(drop=True)
+        for key, fc in fcs.items()
+    }
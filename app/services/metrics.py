@@ -0,0 +1,185 @@
+"""
+Instrumentation légère : histogrammes / compteurs en mémoire, format texte Prometheus
+et en-tête `Server-Timing` par requête.
+
+Coût par observation : un lock + une recherche de bucket => négligeable face aux
+appels réseau / modèle, on peut le laisser actif en production.
+"""
+import bisect
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _labels_str(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    parts = [f'{n}="{v}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labelnames: Iterable[str] = ()):
+        self.name, self.help, self.labelnames = name, help, tuple(labelnames)
+        self._values: Dict[tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = tuple(str(labels.get(n, "")) for n in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, v in sorted(self._values.items()):
+                lines.append(f"{self.name}{_labels_str(self.labelnames, key)} {v}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labelnames: Iterable[str] = (), buckets=DEFAULT_BUCKETS):
+        self.name, self.help, self.labelnames = name, help, tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series: Dict[tuple, list] = {}  # key -> [counts par bucket..., +Inf, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(str(labels.get(n, "")) for n in self.labelnames)
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[i] += 1
+            series[-1] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = [(k, list(v)) for k, v in sorted(self._series.items())]
+        for key, series in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                le = 'le="%s"' % bound
+                lines.append(f"{self.name}_bucket{_labels_str(self.labelnames, key, le)} {cumulative}")
+            cumulative += series[len(self.buckets)]
+            le = 'le="+Inf"'
+            lines.append(f"{self.name}_bucket{_labels_str(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels_str(self.labelnames, key)} {series[-1]}")
+            lines.append(f"{self.name}_count{_labels_str(self.labelnames, key)} {cumulative}")
+        return lines
+
+
+class GaugeSet:
+    """Jauges calculées à la lecture (`collect()` -> {(nom, labels): valeur})."""
+
+    def __init__(self, name: str, help: str, collect: Callable[[], Dict[Tuple[str, ...], float]], labelnames=()):
+        self.name, self.help, self.collect, self.labelnames = name, help, collect, tuple(labelnames)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge"]
+        for key, v in sorted(self.collect().items()):
+            if v is None:
+                continue
+            lines.append(f"{self.name}{_labels_str(self.labelnames, key)} {float(v)}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for m in self._metrics:
+            lines.extend(m.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+STAGE_SECONDS = registry.register(Histogram(
+    "aq_stage_seconds", "Durée des étapes du pipeline (fetch_weather, build_future_df, predict...)", ["stage"]
+))
+HTTP_REQUEST_SECONDS = registry.register(Histogram(
+    "aq_http_request_seconds", "Durée des requêtes HTTP par route", ["method", "route"]
+))
+HTTP_REQUESTS = registry.register(Counter(
+    "aq_http_requests_total", "Requêtes HTTP par route et code de statut", ["method", "route", "status"]
+))
+UPSTREAM_REQUESTS = registry.register(Counter(
+    "aq_upstream_requests_total", "Appels WeatherAPI par endpoint et résultat (code HTTP, timeout, error)",
+    ["endpoint", "result"],
+))
+
+# Timings de la requête courante, pour l'en-tête Server-Timing
+_request_timings: contextvars.ContextVar[Optional[list]] = contextvars.ContextVar("request_timings", default=None)
+
+
+@contextmanager
+def stage(name: str):
+    """Mesure une étape : histogramme global + entrée Server-Timing de la requête courante."""
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        dt = time.perf_counter() - t0
+        STAGE_SECONDS.observe(dt, stage=name)
+        timings = _request_timings.get()
+        if timings is not None:
+            timings.append((name, dt))
+
+
+def server_timing_header(timings: List[Tuple[str, float]], total: float) -> str:
+    # Une étape peut apparaître plusieurs fois (ex: plusieurs villes) : on cumule
+    agg: Dict[str, float] = {}
+    for name, dt in timings:
+        agg[name] = agg.get(name, 0.0) + dt
+    parts = [f"{name};dur={dt * 1000:.1f}" for name, dt in agg.items()]
+    parts.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(parts)
+
+
+class MetricsMiddleware:
+    """Middleware ASGI pur (pas de BaseHTTPMiddleware) : durée/compteurs par route + Server-Timing."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timings: list = []
+        token = _request_timings.set(timings)
+        t0 = time.perf_counter()
+        status = {"code": 500}
+
+        async def _send(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+                header = server_timing_header(timings, time.perf_counter() - t0)
+                message = dict(message)
+                message["headers"] = list(message.get("headers", [])) + [(b"server-timing", header.encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, _send)
+        finally:
+            _request_timings.reset(token)
+            route = scope.get("route")
+            route_path = getattr(route, "path", "unmatched")
+            method = scope.get("method", "")
+            HTTP_REQUEST_SECONDS.observe(time.perf_counter() - t0, method=method, route=route_path)
+            HTTP_REQUESTS.inc(method=method, route=route_path, status=status["code"])
@@ -0,0 +1,239 @@
+"""
+Moteur d'inférence NumPy exporté depuis le modèle NeuralProphet.
+
+L'export lit les poids entraînés du `TimeNet` et les paramètres de normalisation
+(shift/scale de `ds`, `y` et des régresseurs) ; l'inférence refait le même calcul :
+
+    c(t)  = trend(t̃) + Σ saisonnalités de Fourier(t) + Σ w_r * x̃_r
+    ŷ(t)  = c(t) + Σ_j a_j * (ỹ(t-n+j) - c(t-n+j))          (AR linéaire sur n_lags)
+    yhat1 = ŷ(t) * scale_y + shift_y
+
+avec t̃ = (ds - shift_ds) / scale_ds, x̃ et ỹ normalisés : les lags AR sont
+"stationnarisés" (composantes non-AR retirées) comme dans `TimeNet.forward`.
+Les configurations non reproduites (AR profond, saisonnalité multiplicative, events...)
+sont refusées à l'export.
+
+    python -m app.services.numpy_engine --out models/neuralprophet_co_numpy.npz
+"""
+import argparse
+import json
+import os
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+
+_EPOCH = np.datetime64("1970-01-01", "ns")
+
+
+def _ns(ds) -> np.ndarray:
+    return (np.asarray(ds, dtype="datetime64[ns]") - _EPOCH).astype(np.int64)
+
+
+def _fourier(ds, period: float, order: int) -> np.ndarray:
+    """Termes de Fourier (sin, cos) par ordre, en float32 comme `time_dataset.fourier_series`."""
+    t = (_ns(ds) / 1e9).astype(np.float32) / (3600 * 24.0)
+    return np.column_stack(
+        [fun(2.0 * (i + 1) * np.pi * t / period) for i in range(order) for fun in (np.sin, np.cos)]
+    ).astype(np.float64)
+
+
+def _seasonalities(m) -> Dict[str, object]:
+    cfg = getattr(m, "config_seasonality", None)
+    return dict(getattr(cfg, "periods", None) or {})
+
+
+def _future_regressors(m) -> Dict[str, object]:
+    cfg = getattr(m, "config_regressors", None)
+    return dict(getattr(cfg, "regressors", None) or {})
+
+
+def _param(t) -> np.ndarray:
+    return t.detach().cpu().numpy().astype(np.float64)
+
+
+def check_supported(m) -> None:
+    """Lève ValueError si le modèle utilise des composantes non exportables."""
+    problems = []
+    if getattr(m, "model", None) is None:
+        problems.append("modèle non fitté")
+    if int(getattr(m, "n_forecasts", 1) or 1) != 1:
+        problems.append("n_forecasts > 1")
+    if len(getattr(m.config_model, "quantiles", None) or [0.5]) != 1:
+        problems.append("quantiles")
+    ar = getattr(m, "config_ar", None)
+    if ar is not None and getattr(ar, "ar_layers", None):
+        problems.append("AR-Net à couches cachées")
+    trend = getattr(m, "config_trend", None)
+    if trend is None or trend.growth != "linear" or trend.trend_global_local != "global":
+        problems.append("tendance non linéaire globale")
+    if getattr(m, "config_lagged_regressors", None):
+        problems.append("lagged regressors")
+    if getattr(m, "config_events", None) or getattr(m, "config_country_holidays", None):
+        problems.append("events / holidays")
+    season_cfg = getattr(m, "config_seasonality", None)
+    if season_cfg is not None and getattr(season_cfg, "mode", "additive") != "additive":
+        problems.append("saisonnalité multiplicative")
+    for name, season in _seasonalities(m).items():
+        if getattr(season, "condition_name", None) or getattr(season, "global_local", "global") != "global":
+            problems.append(f"saisonnalité conditionnelle / locale '{name}'")
+    reg_cfg = getattr(m, "config_regressors", None)
+    if _future_regressors(m) and getattr(reg_cfg, "model", "linear") != "linear":
+        problems.append("régresseurs non linéaires")
+    for name, reg in _future_regressors(m).items():
+        if getattr(reg, "mode", "additive") != "additive":
+            problems.append(f"régresseur multiplicatif '{name}'")
+    if not m.config_normalization.global_normalization:
+        problems.append("normalisation par série")
+    if problems:
+        raise ValueError("Modèle non exportable en NumPy: " + ", ".join(problems))
+
+
+def export_numpy_model(m) -> dict:
+    """Extrait poids et normalisation du modèle fitté ; retourne un dict sérialisable en .npz."""
+    check_supported(m)
+    net = m.model
+    norm = m.config_normalization.global_data_params
+
+    trend = net.trend
+    params = {
+        "ds_norm": np.array([pd.Timestamp(norm["ds"].shift).value, pd.Timedelta(norm["ds"].scale).value], dtype=np.float64),
+        "y_norm": np.array([norm["y"].shift, norm["y"].scale], dtype=np.float64),
+        "trend_bias": _param(trend.bias).ravel(),
+        "trend_k0": _param(trend.trend_k0).ravel(),
+        "trend_deltas": _param(trend.trend_deltas).ravel(),
+        "trend_changepoints": _param(trend.trend_changepoints_t).ravel(),
+    }
+
+    seasons = []
+    for name, season in _seasonalities(m).items():
+        params[f"season__{name}"] = _param(net.seasonality.season_params[name]).ravel()
+        seasons.append({"name": name, "period": float(season.period), "order": int(season.resolution)})
+
+    regs = []
+    for name in _future_regressors(m):
+        w = float(_param(net.future_regressors.get_reg_weights(name)).ravel()[0])
+        params[f"reg__{name}"] = np.array([w, norm[name].shift, norm[name].scale], dtype=np.float64)
+        regs.append(name)
+
+    n_lags = int(m.n_lags or 0)
+    if n_lags:
+        params["ar"] = _param(net.ar_net[0].weight).ravel()
+
+    params["meta"] = json.dumps({
+        "seasons": seasons,
+        "regressors": regs,
+        "n_lags": n_lags,
+        # trend_reg == 0 : deltas = pente de chaque segment (sinon écarts entre segments)
+        "segmentwise_trend": bool(trend.segmentwise_trend),
+    })
+    return params
+
+
+def save_numpy_model(params: dict, out_path: str) -> None:
+    tmp = f"{out_path}.tmp.npz"
+    np.savez(tmp, **params)
+    os.replace(tmp, out_path)
+
+
+class NumpyPredictor:
+    """
+    Remplaçant léger de `m.predict` pour l'inférence (même contrat : un DataFrame
+    avec `ds`, `y` (lags AR), les régresseurs, optionnellement `ID` => ajoute `yhat1`).
+    Les `n_lags` premières lignes de chaque série n'ont pas de prévision (NaN).
+    """
+
+    def __init__(self, params: Dict[str, np.ndarray]):
+        meta = json.loads(str(params["meta"]))
+        self.seasons: List[dict] = meta["seasons"]
+        self.regressors: List[str] = meta["regressors"]
+        self.n_lags = int(meta["n_lags"])
+        self.ds_shift, self.ds_scale = params["ds_norm"]
+        self.y_shift, self.y_scale = params["y_norm"]
+        self.season_coefs = {s["name"]: params[f"season__{s['name']}"] for s in self.seasons}
+        self.reg_coefs = {r: params[f"reg__{r}"] for r in self.regressors}
+        self.ar = params["ar"] if self.n_lags else None
+
+        # Pente et ordonnée par segment de tendance (segment i : t >= changepoints[i])
+        k0 = float(params["trend_k0"][0])
+        deltas = params["trend_deltas"]
+        changepoints = params["trend_changepoints"]
+        if meta["segmentwise_trend"]:
+            slopes = k0 + deltas
+            steps = deltas - np.concatenate([[k0], deltas[:-1]])
+        else:
+            slopes = k0 + np.cumsum(deltas)
+            steps = deltas
+        self._cp = changepoints[1:]
+        self._slopes = slopes
+        self._offsets = float(params["trend_bias"][0]) + np.concatenate(
+            [[0.0], np.cumsum(-self._cp * steps[1:])]
+        )
+
+    @classmethod
+    def load(cls, path: str) -> "NumpyPredictor":
+        with np.load(path, allow_pickle=False) as data:
+            return cls({k: data[k] for k in data.files})
+
+    def components(self, ds, regs: Dict[str, np.ndarray]) -> np.ndarray:
+        """Tendance + saisonnalités + régresseurs, en unités normalisées."""
+        t = (_ns(ds) - self.ds_shift) / self.ds_scale
+        segment = np.searchsorted(self._cp, t, side="right")
+        out = self._slopes[segment] * t + self._offsets[segment]
+        for s in self.seasons:
+            out += _fourier(ds, s["period"], s["order"]) @ self.season_coefs[s["name"]]
+        for r in self.regressors:
+            w, shift, scale = self.reg_coefs[r]
+            out += w * (np.asarray(regs[r], dtype=np.float64) - shift) / scale
+        return out
+
+    def predict_values(self, ds, regs: Dict[str, np.ndarray], y=None) -> np.ndarray:
+        c = self.components(ds, regs)
+        if not self.n_lags:
+            return c * self.y_scale + self.y_shift
+        n = self.n_lags
+        yhat = np.full(len(c), np.nan)
+        if len(c) > n:
+            resid = (np.asarray(y, dtype=np.float64) - self.y_shift) / self.y_scale - c
+            windows = np.lib.stride_tricks.sliding_window_view(resid, n)[:-1]
+            yhat[n:] = c[n:] + windows @ self.ar
+        return yhat * self.y_scale + self.y_shift
+
+    def _predict_one(self, df: pd.DataFrame) -> np.ndarray:
+        return self.predict_values(
+            df["ds"].to_numpy(),
+            {r: df[r].to_numpy() for r in self.regressors},
+            df["y"].to_numpy() if self.n_lags else None,
+        )
+
+    def predict(self, df: pd.DataFrame) -> pd.DataFrame:
+        out = df.copy()
+        if "ID" not in df:
+            out["yhat1"] = self._predict_one(df)
+            return out
+        # Lags AR calculés série par série
+        yhat = np.empty(len(df))
+        for _, idx in df.groupby("ID", sort=False).indices.items():
+            yhat[idx] = self._predict_one(df.iloc[idx])
+        out["yhat1"] = yhat
+        return out
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Exporte le modèle NeuralProphet vers un prédicteur NumPy.")
+    parser.add_argument("--model", default="models/neuralprophet_co_deployable.pkl")
+    parser.add_argument("--train-csv", default="models/train_df_deploy.csv")
+    parser.add_argument("--out", default="models/neuralprophet_co_numpy.npz")
+    args = parser.parse_args()
+
+    from app.model_loader import ensure_model_loaded
+
+    # Même modèle que celui servi (checkpoint, snapshot warm, sinon mini-fit)
+    m = ensure_model_loaded(args.model, args.train_csv, backend="neuralprophet")
+    params = export_numpy_model(m)
+    save_numpy_model(params, args.out)
+    print(f"Export écrit: {args.out} ({json.loads(params['meta'])})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,262 @@
+"""
+Stockage local (SQLite) des mesures temps réel observées via /realtime.
+
+- table `observations` : append-only, une ligne par (ville, `ts` WeatherAPI)
+- table `observations_hourly` : agrégats horaires produits par la compaction
+- index (city, ts_hour) => lecture rapide des "N dernières heures" d'une ville
+
+    python -m app.services.observations compact --older-than-days 7
+"""
+import argparse
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from typing import TYPE_CHECKING, Iterable, Optional
+
+# L'historisation (/realtime, poller) n'utilise que sqlite3 ; pandas / NumPy ne
+# sont importés que pour les lectures (contexte du modèle, mise à jour incrémentale)
+if TYPE_CHECKING:
+    import numpy as np
+    import pandas as pd
+
+OBSERVATIONS_DB = os.getenv("OBSERVATIONS_DB", "data/observations.sqlite")
+# Utiliser les observations comme contexte du modèle quand la couverture est suffisante
+OBSERVATIONS_CONTEXT = os.getenv("OBSERVATIONS_CONTEXT", "1") == "1"
+# Part minimale d'heures observées dans la fenêtre de contexte
+OBSERVATIONS_MIN_COVERAGE = float(os.getenv("OBSERVATIONS_MIN_COVERAGE", "0.75"))
+# Trous interpolés au plus sur ce nombre d'heures consécutives
+OBSERVATIONS_MAX_GAP_H = int(os.getenv("OBSERVATIONS_MAX_GAP_H", "3"))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS observations (
+    city TEXT NOT NULL,
+    ts TEXT NOT NULL,
+    ts_hour TEXT NOT NULL,
+    observed_at REAL NOT NULL,
+    co REAL, no2 REAL, o3 REAL, so2 REAL, pm2_5 REAL, pm10 REAL,
+    temp_c REAL, humidity REAL, us_epa_index REAL,
+    UNIQUE (city, ts)
+);
+CREATE INDEX IF NOT EXISTS idx_obs_city_hour ON observations (city, ts_hour);
+
+CREATE TABLE IF NOT EXISTS observations_hourly (
+    city TEXT NOT NULL,
+    ts_hour TEXT NOT NULL,
+    co REAL, no2 REAL, o3 REAL, so2 REAL, pm2_5 REAL, pm10 REAL,
+    temp_c REAL, humidity REAL, us_epa_index REAL,
+    n INTEGER NOT NULL,
+    PRIMARY KEY (city, ts_hour)
+);
+"""
+
+VALUE_COLUMNS = ["co", "no2", "o3", "so2", "pm2_5", "pm10", "temp_c", "humidity", "us_epa_index"]
+
+
+def _weighted_hourly_sql(group: str, where: str) -> str:
+    """
+    Moyennes horaires brutes + compactées pondérées par le nombre de mesures `n`
+    (par colonne : les valeurs manquantes ne comptent pas).
+    """
+    raw = ", ".join(f"SUM({c}) AS s_{c}, COUNT({c}) AS n_{c}" for c in VALUE_COLUMNS)
+    hourly = ", ".join(f"{c} * n AS s_{c}, CASE WHEN {c} IS NULL THEN 0 ELSE n END AS n_{c}" for c in VALUE_COLUMNS)
+    merged = ", ".join(f"SUM(s_{c}) / SUM(n_{c}) AS {c}" for c in VALUE_COLUMNS)
+    return f"""
+        SELECT {group}, {merged} FROM (
+            SELECT {group}, {raw} FROM observations WHERE {where} GROUP BY {group}
+            UNION ALL
+            SELECT {group}, {hourly} FROM observations_hourly WHERE {where}
+        )
+        GROUP BY {group}
+    """
+
+
+def city_key(city: str) -> str:
+    return city.strip().lower()
+
+
+def _hour_of(ts: str) -> Optional[str]:
+    """`last_updated` WeatherAPI ("YYYY-MM-DD HH:MM", heure locale) -> "YYYY-MM-DD HH:00"."""
+    if not ts or len(ts) < 13:
+        return None
+    return f"{ts[:13]}:00"
+
+
+def row_from_realtime(city: str, normalized: dict) -> Optional[dict]:
+    """Ligne à stocker depuis la sortie de `extract_realtime` (None si pas de timestamp)."""
+    ts = normalized.get("ts") or ""
+    hour = _hour_of(ts)
+    if hour is None:
+        return None
+    aq = normalized.get("current_air_quality") or {}
+    pol = aq.get("pollutants_ugm3") or {}
+    weather = normalized.get("current_weather") or {}
+    return {
+        "city": city_key(city),
+        "ts": ts,
+        "ts_hour": hour,
+        "observed_at": time.time(),
+        "co": pol.get("CO"),
+        "no2": pol.get("NO2"),
+        "o3": pol.get("O3"),
+        "so2": pol.get("SO2"),
+        "pm2_5": pol.get("PM2.5"),
+        "pm10": pol.get("PM10"),
+        "temp_c": weather.get("temp_c"),
+        "humidity": weather.get("humidity"),
+        "us_epa_index": (aq.get("aqi") or {}).get("us_epa_index"),
+    }
+
+
+class ObservationStore:
+    def __init__(self, path: str = OBSERVATIONS_DB):
+        self.path = path
+        self._local = threading.local()
+        self._init_lock = threading.Lock()
+        self._initialized = False
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            with self._init_lock:
+                if not self._initialized:
+                    conn.executescript(_SCHEMA)
+                    self._initialized = True
+            self._local.conn = conn
+        return conn
+
+    def append_many(self, rows: Iterable[dict]) -> int:
+        rows = [r for r in rows if r is not None]
+        if not rows:
+            return 0
+        cols = ["city", "ts", "ts_hour", "observed_at"] + VALUE_COLUMNS
+        sql = (
+            f"INSERT OR IGNORE INTO observations ({', '.join(cols)}) "
+            f"VALUES ({', '.join('?' for _ in cols)})"
+        )
+        conn = self._conn()
+        with conn:
+            cur = conn.executemany(sql, [tuple(r.get(c) for c in cols) for r in rows])
+        return cur.rowcount
+
+    def last_hours(self, city: str, start_hour: str, end_hour: str) -> "pd.DataFrame":
+        """Moyennes horaires (brutes + compactées, pondérées par `n`) de `city` sur [start_hour, end_hour]."""
+        import pandas as pd
+
+        # Une heure peut exister dans les deux tables (mesures arrivées après la compaction)
+        sql = _weighted_hourly_sql("ts_hour", "city = ? AND ts_hour BETWEEN ? AND ?")
+        key = city_key(city)
+        cur = self._conn().execute(sql, (key, start_hour, end_hour, key, start_hour, end_hour))
+        return pd.DataFrame(cur.fetchall(), columns=["ts_hour"] + VALUE_COLUMNS)
+
+    def hourly_since(self, after_hour: Optional[str], before_hour: str) -> "pd.DataFrame":
+        """Moyennes horaires de toutes les villes sur ]after_hour, before_hour[ (mise à jour du modèle)."""
+        import pandas as pd
+
+        after_hour = after_hour or ""
+        sql = _weighted_hourly_sql("city, ts_hour", "ts_hour > ? AND ts_hour < ?") + " ORDER BY city, ts_hour"
+        cur = self._conn().execute(sql, (after_hour, before_hour, after_hour, before_hour))
+        return pd.DataFrame(cur.fetchall(), columns=["city", "ts_hour"] + VALUE_COLUMNS)
+
+    def context_block(self, city: str, n_context: int, now_hour: datetime) -> Optional["np.ndarray"]:
+        """
+        Contexte (n_context, 4) = [y, T, RH, NO2(GT)] des heures observées finissant à `now_hour`.
+
+        None si la couverture est insuffisante (l'appelant retombe sur l'historique CSV).
+        """
+        import numpy as np
+        import pandas as pd
+
+        hours = pd.date_range(end=now_hour, periods=n_context, freq="h")
+        df = self.last_hours(
+            city,
+            hours[0].strftime("%Y-%m-%d %H:00"),
+            hours[-1].strftime("%Y-%m-%d %H:00"),
+        )
+        if df.empty:
+            return None
+
+        df.index = pd.to_datetime(df["ts_hour"])
+        df = df.reindex(hours)
+        ctx = pd.DataFrame({
+            # Modèle entraîné sur CO en mg/m³ ; WeatherAPI donne des µg/m³
+            "y": df["co"] / 1000.0,
+            "T": df["temp_c"],
+            "RH": df["humidity"],
+            "NO2(GT)": df["no2"],
+        })
+        if ctx[["y", "T", "RH"]].notna().all(axis=1).mean() < OBSERVATIONS_MIN_COVERAGE:
+            return None
+
+        ctx = ctx.interpolate(limit=OBSERVATIONS_MAX_GAP_H, limit_direction="both")
+        if ctx.isna().any().any():
+            return None
+        return ctx.to_numpy(dtype=np.float64)
+
+    def compact(self, older_than_days: float = 7.0, vacuum: bool = True) -> int:
+        """
+        Agrège en horaire les heures dont toutes les mesures brutes ont plus de
+        `older_than_days` jours, puis supprime ces mesures brutes.
+
+        Une heure déjà compactée (mesures arrivées en retard) est fusionnée avec
+        l'agrégat existant, moyennes pondérées par `n`.
+        """
+        cutoff = time.time() - older_than_days * 86400
+        avg = ", ".join(f"AVG({c})" for c in VALUE_COLUMNS)
+        merge = ", ".join(
+            f"""{c} = CASE
+                    WHEN excluded.{c} IS NULL THEN {c}
+                    WHEN {c} IS NULL THEN excluded.{c}
+                    ELSE ({c} * n + excluded.{c} * excluded.n) / (n + excluded.n)
+                END"""
+            for c in VALUE_COLUMNS
+        )
+        ready = """
+            SELECT city, ts_hour FROM observations
+            GROUP BY city, ts_hour
+            HAVING MAX(observed_at) < ?
+        """
+        conn = self._conn()
+        with conn:
+            # `WHERE true` : lève l'ambiguïté de syntaxe SQLite entre SELECT et ON CONFLICT
+            conn.execute(f"""
+                INSERT INTO observations_hourly (city, ts_hour, {', '.join(VALUE_COLUMNS)}, n)
+                SELECT city, ts_hour, {avg}, COUNT(*) FROM observations
+                WHERE true
+                GROUP BY city, ts_hour
+                HAVING MAX(observed_at) < ?
+                ON CONFLICT (city, ts_hour) DO UPDATE SET {merge}, n = n + excluded.n
+            """, (cutoff,))
+            # Seulement les heures agrégées ci-dessus (pas les mesures récentes d'une heure déjà compactée)
+            deleted = conn.execute(f"""
+                DELETE FROM observations
+                WHERE (city, ts_hour) IN ({ready})
+            """, (cutoff,)).rowcount
+        if vacuum and deleted:
+            conn.execute("VACUUM")
+        return deleted
+
+
+observation_store = ObservationStore()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Maintenance du stockage local des observations.")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    p_compact = sub.add_parser("compact")
+    p_compact.add_argument("--older-than-days", type=float, default=7.0)
+    p_compact.add_argument("--no-vacuum", action="store_true")
+    args = parser.parse_args()
+
+    if args.cmd == "compact":
+        deleted = observation_store.compact(args.older_than_days, vacuum=not args.no_vacuum)
+        print(f"{deleted} lignes brutes compactées")
+
+
+if __name__ == "__main__":
+    main()
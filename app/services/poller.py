@@ -0,0 +1,142 @@
+import asyncio
+import logging
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+log = logging.getLogger(__name__)
+
+POLLER_ENABLED = os.getenv("POLLER_ENABLED", "1") == "1"
+POLLER_INTERVAL_S = float(os.getenv("POLLER_INTERVAL_S", "300"))
+# Au-delà de cet âge, un snapshot n'est plus servi tel quel
+SNAPSHOT_MAX_AGE_S = float(os.getenv("SNAPSHOT_MAX_AGE_S", "900"))
+# Snapshot trop vieux : "on_demand" (recalcul à la requête) ou "stale" (servi, marqué stale)
+SNAPSHOT_FALLBACK = os.getenv("SNAPSHOT_FALLBACK", "on_demand")
+
+
+class CitySnapshot:
+    __slots__ = ("city", "data", "updated_at")
+
+    def __init__(self, city: str, data: Any, updated_at: float):
+        self.city = city
+        self.data = data
+        self.updated_at = updated_at
+
+    @property
+    def age_s(self) -> float:
+        return time.time() - self.updated_at
+
+
+class Poller:
+    """
+    Rafraîchit périodiquement chaque ville configurée (tâche de fond du lifespan).
+
+    `refresh(city, query)` produit les données pré-calculées de la ville ; les
+    endpoints lisent le dernier snapshot en O(1) via `get(city)`, et les listeners
+    (`add_listener`) sont notifiés de chaque nouveau snapshot (flux SSE).
+
+    Les villes configurées sont permanentes ; celles ajoutées par un abonnement
+    (`acquire`) sont retirées quand leur dernier abonné se désabonne (`release`).
+    """
+
+    def __init__(
+        self,
+        cities: Dict[str, str],
+        refresh: Callable[[str, str], Awaitable[Any]],
+        interval_s: float = POLLER_INTERVAL_S,
+    ):
+        self.cities = dict(cities)
+        self._pinned = set(cities)
+        self._refs: Dict[str, int] = {}
+        self.refresh = refresh
+        self.interval_s = interval_s
+        self._snapshots: Dict[str, CitySnapshot] = {}
+        self._listeners: List[Callable[[CitySnapshot], None]] = []
+        self._pending_refreshes = set()
+        self._task: Optional[asyncio.Task] = None
+        self.stats = {"rounds": 0, "refresh_ok": 0, "refresh_errors": 0, "last_round_seconds": None}
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def get(self, city: str) -> Optional[CitySnapshot]:
+        return self._snapshots.get(city)
+
+    def add_listener(self, fn: Callable[[CitySnapshot], None]):
+        """`fn(snapshot)` est appelé dans l'event loop : il ne doit pas bloquer."""
+        self._listeners.append(fn)
+
+    def add_city(self, city: str, query: str):
+        """Ajoute une ville au tour de rafraîchissement (rafraîchie tout de suite si le poller tourne)."""
+        if city in self.cities:
+            return
+        self.cities[city] = query
+        if self._task is not None and not self._task.done():
+            task = asyncio.get_running_loop().create_task(self._refresh_one(city, query))
+            self._pending_refreshes.add(task)
+            task.add_done_callback(self._pending_refreshes.discard)
+
+    def acquire(self, city: str, query: str):
+        """Un abonné de plus pour `city` (ajoutée au tour de rafraîchissement si besoin)."""
+        self._refs[city] = self._refs.get(city, 0) + 1
+        self.add_city(city, query)
+
+    def release(self, city: str) -> bool:
+        """Un abonné de moins ; True si `city` n'est plus suivie (dernier abonné, ville non configurée)."""
+        n = self._refs.get(city, 0) - 1
+        if n > 0:
+            self._refs[city] = n
+            return False
+        self._refs.pop(city, None)
+        if city in self._pinned:
+            return False
+        self.cities.pop(city, None)
+        self._snapshots.pop(city, None)
+        return True
+
+    async def _refresh_one(self, city: str, query: str):
+        try:
+            data = await self.refresh(city, query)
+        except Exception:
+            self.stats["refresh_errors"] += 1
+            log.exception("Rafraîchissement de %s impossible", city)
+            return
+        if city not in self.cities:
+            return  # retirée pendant le rafraîchissement
+        snap = self._snapshots[city] = CitySnapshot(city, data, time.time())
+        self.stats["refresh_ok"] += 1
+        for fn in self._listeners:
+            try:
+                fn(snap)
+            except Exception:
+                log.exception("Listener du poller en échec (%s)", city)
+
+    async def refresh_all(self):
+        t0 = time.perf_counter()
+        await asyncio.gather(*(self._refresh_one(c, q) for c, q in list(self.cities.items())))
+        self.stats["rounds"] += 1
+        self.stats["last_round_seconds"] = time.perf_counter() - t0
+
+    async def _run(self):
+        while True:
+            await self.refresh_all()
+            await asyncio.sleep(self.interval_s)
+
+    def snapshot_stats(self) -> dict:
+        return {
+            **self.stats,
+            "interval_s": self.interval_s,
+            "cities": len(self.cities),
+            "subscribed": dict(self._refs),
+            "ages_s": {c: round(s.age_s, 1) for c, s in self._snapshots.items()},
+        }
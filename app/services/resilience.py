@@ -0,0 +1,188 @@
+"""
+Résilience des appels amont (WeatherAPI) face à la latence de queue et aux pannes.
+
+- `deadline(s)` / `remaining()` : budget de temps de la requête courante (contextvar,
+  hérité par les tâches filles) partagé par tous ses appels amont
+- `Hedger` : si une requête n'a pas répondu après le p95 observé, une seconde requête
+  identique part en parallèle ; la première réponse gagne, l'autre est annulée
+- `CircuitBreaker` : après N échecs consécutifs, les appels échouent immédiatement
+  pendant `reset_s` (puis une requête d'essai décide de la réouverture)
+"""
+import asyncio
+import contextvars
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Awaitable, Callable, Optional
+
+# Échéance absolue (time.monotonic) de la requête en cours, None hors requête
+_deadline: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar("upstream_deadline", default=None)
+
+
+@contextmanager
+def deadline(seconds: float):
+    """Budget de `seconds` pour les appels amont du bloc (jamais plus long qu'un budget englobant)."""
+    at = time.monotonic() + seconds
+    current = _deadline.get()
+    token = _deadline.set(at if current is None else min(at, current))
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def remaining(default: float) -> float:
+    """Temps restant du budget courant (`default` hors budget), jamais négatif."""
+    at = _deadline.get()
+    if at is None:
+        return default
+    return max(0.0, min(default, at - time.monotonic()))
+
+
+class LatencyTracker:
+    """Fenêtre glissante des dernières latences réussies (quantiles pour le délai de couverture)."""
+
+    def __init__(self, window: int = 200, min_samples: int = 20):
+        self._samples = deque(maxlen=window)
+        self.min_samples = min_samples
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def quantile(self, q: float) -> Optional[float]:
+        """None tant qu'il n'y a pas assez de mesures."""
+        with self._lock:
+            if len(self._samples) < self.min_samples:
+                return None
+            ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class Hedger:
+    """Requête de couverture après le p95 de `tracker` (borné par [min_delay_s, max_delay_s])."""
+
+    def __init__(
+        self,
+        tracker: LatencyTracker,
+        default_delay_s: float,
+        min_delay_s: float,
+        max_delay_s: float,
+        quantile: float = 0.95,
+    ):
+        self.tracker = tracker
+        self.default_delay_s = default_delay_s
+        self.min_delay_s = min_delay_s
+        self.max_delay_s = max_delay_s
+        self.quantile = quantile
+        self.stats = {"calls": 0, "hedged": 0, "hedge_wins": 0}
+
+    def delay_s(self) -> float:
+        q = self.tracker.quantile(self.quantile)
+        delay = self.default_delay_s if q is None else q
+        return min(self.max_delay_s, max(self.min_delay_s, delay))
+
+    async def run(self, factory: Callable[[], Awaitable[Any]]) -> Any:
+        self.stats["calls"] += 1
+        first = asyncio.ensure_future(factory())
+        tasks = [first]
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=self.delay_s())
+            if done:
+                return first.result()
+
+            self.stats["hedged"] += 1
+            tasks.append(asyncio.ensure_future(factory()))
+            pending, error = set(tasks), None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for t in done:
+                    if t.exception() is None:
+                        if t is not first:
+                            self.stats["hedge_wins"] += 1
+                        return t.result()
+                    error = t.exception()
+            raise error
+        finally:
+            for t in tasks:
+                if not t.done():
+                    t.cancel()
+
+
+class CircuitOpenError(Exception):
+    pass
+
+
+class CircuitBreaker:
+    """closed -> open après `failure_threshold` échecs consécutifs -> half_open après `reset_s`.
+
+    En half_open, une seule requête d'essai passe ; les autres sont rejetées jusqu'à
+    son issue (`record_success` referme, `record_failure` rouvre).
+    """
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_s: float = 30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_s = reset_s
+        self.state = "closed"
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+        self.stats = {"opened": 0, "rejected": 0, "probes": 0}
+
+    def check(self) -> bool:
+        """Lève `CircuitOpenError` si le circuit est ouvert ; True pour la requête d'essai."""
+        with self._lock:
+            if self.state == "open":
+                if time.monotonic() - self._opened_at < self.reset_s:
+                    self.stats["rejected"] += 1
+                    raise CircuitOpenError(f"{self.name} indisponible (circuit ouvert)")
+                # Fenêtre écoulée : la prochaine requête sert d'essai
+                self.state = "half_open"
+            if self.state == "half_open":
+                if self._probe_in_flight:
+                    self.stats["rejected"] += 1
+                    raise CircuitOpenError(f"{self.name} indisponible (essai en cours)")
+                self._probe_in_flight = True
+                self.stats["probes"] += 1
+                return True
+            return False
+
+    def release_probe(self):
+        """Essai abandonné sans issue (annulation, erreur locale) : le suivant peut passer."""
+        with self._lock:
+            if self.state == "half_open":
+                self._probe_in_flight = False
+
+    def record_success(self):
+        with self._lock:
+            self.state = "closed"
+            self._failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._probe_in_flight = False
+            if self.state == "half_open" or self._failures >= self.failure_threshold:
+                if self.state != "open":
+                    self.stats["opened"] += 1
+                self.state = "open"
+                self._opened_at = time.monotonic()
+
+    def retry_after_s(self) -> float:
+        with self._lock:
+            if self.state != "open":
+                return 0.0
+            return max(0.0, self.reset_s - (time.monotonic() - self._opened_at))
+
+    def snapshot_stats(self) -> dict:
+        with self._lock:
+            return {
+                **self.stats,
+                "state": self.state,
+                "consecutive_failures": self._failures,
+            }
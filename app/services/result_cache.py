@@ -0,0 +1,43 @@
+import os
+from typing import List, Optional
+
+from app.services.cache import TTLCache
+
+# Quantification des features dans la clé (pas par feature ci-dessous) : deux requêtes dont les
+# features tombent dans le même "pas" partagent la même prédiction.
+QUANTUM = {
+    "T": float(os.getenv("RESULT_CACHE_Q_T", "0.1")),
+    "RH": float(os.getenv("RESULT_CACHE_Q_RH", "0.5")),
+    "NO2(GT)": float(os.getenv("RESULT_CACHE_Q_NO2", "0.5")),
+}
+RESULT_CACHE_TTL_S = float(os.getenv("RESULT_CACHE_TTL_S", "3600"))
+RESULT_CACHE_MAX_ENTRIES = int(os.getenv("RESULT_CACHE_MAX_ENTRIES", "4096"))
+RESULT_CACHE_ENABLED = os.getenv("RESULT_CACHE_ENABLED", "1") == "1"
+
+result_cache = TTLCache(ttl_s=RESULT_CACHE_TTL_S, max_entries=RESULT_CACHE_MAX_ENTRIES)
+
+
+def _quantize(feats: Optional[dict]) -> Optional[tuple]:
+    if feats is None:
+        return None
+    out = []
+    for name, q in QUANTUM.items():
+        v = feats.get(name)
+        out.append(None if v is None else int(round(float(v) / q)))
+    return tuple(out)
+
+
+def result_key(
+    feats: dict,
+    future_feats: Optional[List[dict]],
+    horizon: int,
+    target_hour: str,
+    model_version: Optional[str],
+    context_id: Optional[str] = None,
+) -> tuple:
+    """
+    Clé = (features quantifiées, régresseurs futurs quantifiés, heure cible `ds`,
+    version du modèle, contexte utilisé — ville si contexte observé, sinon historique partagé).
+    """
+    future = tuple(_quantize(f) for f in future_feats) if future_feats else None
+    return (_quantize(feats), future, horizon, target_hour, model_version, context_id)
@@ -0,0 +1,82 @@
+"""
+Sérialisation JSON rapide (orjson) et formats compacts des réponses.
+
+- `ORJSONResponse` : rendu orjson (NaN/inf => null, types NumPy, modèles Pydantic
+  via leur sérialiseur natif sans re-validation)
+- `project(obj, fields)` : projection `?fields=city,ts,current_air_quality.aqi`
+- `columnar(rows)` : plusieurs objets -> `{"colonne.pointée": [valeurs...]}`
+"""
+from typing import Any, Dict, Iterable, List, Optional
+
+import orjson
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+_ORJSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+
+def _default(obj: Any):
+    if isinstance(obj, BaseModel):
+        return obj.model_dump(mode="json", by_alias=True)
+    raise TypeError(f"Type non sérialisable: {type(obj).__name__}")
+
+
+def dumps(content: Any) -> bytes:
+    return orjson.dumps(content, default=_default, option=_ORJSON_OPTIONS)
+
+
+class ORJSONResponse(JSONResponse):
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def parse_fields(fields: Optional[str]) -> Optional[List[str]]:
+    """"city, ts,current_air_quality.aqi" -> ["city", "ts", "current_air_quality.aqi"] (None si vide)."""
+    if not fields:
+        return None
+    out = [f.strip() for f in fields.split(",") if f.strip()]
+    return out or None
+
+
+def project(obj: dict, fields: Iterable[str]) -> dict:
+    """Garde uniquement les chemins pointés demandés (chemins absents ignorés)."""
+    out: Dict[str, Any] = {}
+    for path in fields:
+        parts = path.split(".")
+        src, dst = obj, out
+        for i, key in enumerate(parts):
+            if not isinstance(src, dict) or key not in src:
+                break
+            if i == len(parts) - 1:
+                dst[key] = src[key]
+            else:
+                src = src[key]
+                nxt = dst.get(key)
+                if not isinstance(nxt, dict):
+                    nxt = dst[key] = {}
+                dst = nxt
+    return out
+
+
+def flatten(obj: dict, prefix: str = "") -> Dict[str, Any]:
+    """{"a": {"b": 1}} -> {"a.b": 1}"""
+    out: Dict[str, Any] = {}
+    for k, v in obj.items():
+        key = f"{prefix}{k}"
+        if isinstance(v, dict) and v:
+            out.update(flatten(v, key + "."))
+        else:
+            out[key] = v
+    return out
+
+
+def columnar(rows: List[dict]) -> Dict[str, list]:
+    """Une colonne par chemin pointé, une valeur par objet (None si absent)."""
+    flat = [flatten(r) for r in rows]
+    columns: Dict[str, list] = {}
+    for row in flat:
+        for k in row:
+            columns.setdefault(k, None)
+    return {k: [row.get(k) for row in flat] for k in columns}
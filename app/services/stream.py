@@ -0,0 +1,170 @@
+"""
+Diffusion des snapshots temps réel aux abonnés SSE (`GET /realtime/stream`).
+
+Un seul rafraîchissement amont (le poller) alimente tous les abonnés : le nombre
+d'appels WeatherAPI ne dépend pas du nombre de dashboards ouverts.
+
+Encodage delta : chaque ville a un numéro de version ; un abonné qui a déjà reçu
+la version précédente ne reçoit que les champs modifiés (`event: delta`), les
+autres reçoivent l'objet complet (`event: snapshot`). Le message SSE est encodé
+une seule fois par publication, puis partagé entre les abonnés.
+"""
+import asyncio
+import os
+import time
+from typing import Dict, Iterable, Optional, Set
+
+from app.services.serialization import dumps
+
+STREAM_HEARTBEAT_S = float(os.getenv("STREAM_HEARTBEAT_S", "15"))
+# Messages en attente par abonné ; au-delà, les plus anciens sont abandonnés (client lent)
+STREAM_QUEUE_SIZE = int(os.getenv("STREAM_QUEUE_SIZE", "64"))
+# Nombre max de villes suivies par le poller (villes par défaut + abonnements)
+STREAM_MAX_CITIES = int(os.getenv("STREAM_MAX_CITIES", "50"))
+
+_MISSING = object()
+
+
+def diff(old: dict, new: dict) -> dict:
+    """Champs de `new` modifiés par rapport à `old` (récursif ; clé supprimée => None)."""
+    out = {}
+    for k, v in new.items():
+        ov = old.get(k, _MISSING)
+        if isinstance(v, dict) and isinstance(ov, dict):
+            d = diff(ov, v)
+            if d:
+                out[k] = d
+        elif ov is _MISSING or v != ov:
+            out[k] = v
+    for k in old.keys() - new.keys():
+        out[k] = None
+    return out
+
+
+def sse_message(event: str, data: dict, event_id: Optional[str] = None) -> bytes:
+    lines = [f"event: {event}"]
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    return ("\n".join(lines) + "\ndata: ").encode() + dumps(data) + b"\n\n"
+
+
+HEARTBEAT = b": ping\n\n"
+
+
+class _CityState:
+    __slots__ = ("version", "data", "updated_at", "full_msg")
+
+    def __init__(self):
+        self.version = 0
+        self.data: dict = {}
+        self.updated_at = 0.0
+        self.full_msg = b""
+
+
+class Subscription:
+    def __init__(self, cities: Optional[Set[str]], maxsize: int = STREAM_QUEUE_SIZE):
+        self.cities = cities  # None => toutes les villes
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+        self.versions: Dict[str, int] = {}
+        self.dropped = 0
+
+    def wants(self, city: str) -> bool:
+        return self.cities is None or city in self.cities
+
+    def drop_oldest(self):
+        # Client trop lent : on jette le plus ancien message ; un delta a pu être perdu,
+        # donc les prochains envois seront des objets complets
+        self.queue.get_nowait()
+        self.dropped += 1
+        self.versions.clear()
+
+    def push(self, msg: bytes):
+        if self.queue.full():
+            self.drop_oldest()
+        self.queue.put_nowait(msg)
+
+
+class RealtimeBroadcaster:
+    def __init__(self):
+        self._subs: Set[Subscription] = set()
+        self._state: Dict[str, _CityState] = {}
+        self.stats = {"published": 0, "unchanged": 0, "messages": 0, "deltas": 0}
+
+    def subscribe(self, cities: Optional[Iterable[str]] = None) -> Subscription:
+        sub = Subscription(set(cities) if cities is not None else None)
+        self._subs.add(sub)
+        # État courant immédiatement (objets complets)
+        for city, st in self._state.items():
+            if st.version and sub.wants(city):
+                sub.push(st.full_msg)
+                sub.versions[city] = st.version
+        return sub
+
+    def unsubscribe(self, sub: Subscription):
+        self._subs.discard(sub)
+
+    def forget(self, city: str):
+        """Ville plus suivie : son dernier état n'est plus envoyé aux nouveaux abonnés."""
+        self._state.pop(city, None)
+
+    def publish(self, city: str, data: dict, updated_at: Optional[float] = None):
+        """Nouvel état de `city` ; n'émet rien si aucun champ n'a changé."""
+        st = self._state.setdefault(city, _CityState())
+        delta = diff(st.data, data) if st.version else None
+        if st.version and not delta:
+            self.stats["unchanged"] += 1
+            return
+
+        base = st.version
+        st.version += 1
+        st.data = data
+        st.updated_at = updated_at if updated_at is not None else time.time()
+        event_id = f"{city}:{st.version}"
+        st.full_msg = sse_message(
+            "snapshot",
+            {"city": city, "version": st.version, "updated_at": st.updated_at, "data": data},
+            event_id,
+        )
+        delta_msg = None
+        if delta is not None:
+            delta_msg = sse_message(
+                "delta",
+                {"city": city, "version": st.version, "base": base, "updated_at": st.updated_at, "delta": delta},
+                event_id,
+            )
+
+        self.stats["published"] += 1
+        for sub in self._subs:
+            if not sub.wants(city):
+                continue
+            if sub.queue.full():
+                sub.drop_oldest()
+            if delta_msg is not None and sub.versions.get(city) == base:
+                sub.push(delta_msg)
+                self.stats["deltas"] += 1
+            else:
+                sub.push(st.full_msg)
+            sub.versions[city] = st.version
+            self.stats["messages"] += 1
+
+    async def events(self, sub: Subscription, heartbeat_s: float = STREAM_HEARTBEAT_S):
+        """Générateur SSE d'un abonné (commentaire `: ping` si rien à envoyer)."""
+        try:
+            while True:
+                try:
+                    yield await asyncio.wait_for(sub.queue.get(), heartbeat_s)
+                except asyncio.TimeoutError:
+                    yield HEARTBEAT
+        finally:
+            self.unsubscribe(sub)
+
+    def snapshot_stats(self) -> dict:
+        return {
+            **self.stats,
+            "subscribers": len(self._subs),
+            "dropped": sum(s.dropped for s in self._subs),
+            "versions": {c: st.version for c, st in self._state.items()},
+        }
+
+
+realtime_broadcaster = RealtimeBroadcaster()
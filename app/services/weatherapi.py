@@ -1,26 +1,443 @@
+import asyncio
+import contextvars
+import logging
 import os
-import requests
+import random
+import time
+from typing import Awaitable, Callable, Dict, List, NamedTuple, Optional
+
+import aiohttp
+
+from app.services.batcher import MicroBatcher
+from app.services.cache import TTLCache
+from app.services.metrics import UPSTREAM_REQUESTS, stage
+from app.services.resilience import CircuitBreaker, CircuitOpenError, Hedger, LatencyTracker, remaining
+
+log = logging.getLogger(__name__)
 
 WEATHERAPI_SOURCE_NAME = "WeatherAPI"
 
+# URL de base configurable (ex: serveur stub local pour les benchmarks)
+WEATHERAPI_BASE_URL = os.getenv("WEATHERAPI_BASE_URL", "https://api.weatherapi.com/v1").rstrip("/")
+WEATHER_TIMEOUT_S = float(os.getenv("WEATHER_TIMEOUT_S", "15"))
+WEATHER_MAX_CONCURRENCY = int(os.getenv("WEATHER_MAX_CONCURRENCY", "8"))
+WEATHER_RETRIES = int(os.getenv("WEATHER_RETRIES", "2"))
+WEATHER_BACKOFF_BASE_S = float(os.getenv("WEATHER_BACKOFF_BASE_S", "0.2"))
 
-def fetch_weather(q: str) -> dict:
-    """
-    Appelle WeatherAPI current.json.
+# WeatherAPI rafraîchit `current` environ toutes les 15 min (`last_updated`) :
+# inutile de rappeler l'API avant la prochaine mise à jour attendue.
+WEATHER_CACHE_TTL_S = float(os.getenv("WEATHER_CACHE_TTL_S", "900"))
+# TTL plancher quand la prochaine mise à jour attendue est déjà passée
+WEATHER_CACHE_MIN_TTL_S = float(os.getenv("WEATHER_CACHE_MIN_TTL_S", "60"))
 
-    `q` peut être:
-    - un nom de ville ("Montreal")
-    - ou une coordonnée "lat,lon" (recommandé pour éviter ambiguïtés)
-    """
+# Requêtes bulk (POST current.json?q=bulk) : les miss `current.json` concurrents arrivant
+# dans une fenêtre de WEATHER_BULK_WAIT_MS partent en un seul aller-retour (50 lieux max,
+# limite WeatherAPI). Si le plan ne donne pas accès au bulk (code 2009), retour définitif aux
+# GET unitaires ; toute autre 4xx (clé invalide, requête refusée) ne concerne que le lot.
+WEATHER_BULK_ENABLED = os.getenv("WEATHER_BULK_ENABLED", "1") == "1"
+WEATHER_BULK_MAX = min(50, int(os.getenv("WEATHER_BULK_MAX", "50")))
+WEATHER_BULK_WAIT_MS = float(os.getenv("WEATHER_BULK_WAIT_MS", "10"))
+
+# Budget par requête API pour les appels amont : au-delà, réponse "stale" si possible, sinon 502
+WEATHER_DEADLINE_S = float(os.getenv("WEATHER_DEADLINE_S", "3"))
+# Requête de couverture après le p95 des latences observées (borné), 0 = désactivé
+WEATHER_HEDGE_ENABLED = os.getenv("WEATHER_HEDGE_ENABLED", "1") == "1"
+WEATHER_HEDGE_MIN_MS = float(os.getenv("WEATHER_HEDGE_MIN_MS", "100"))
+WEATHER_HEDGE_DEFAULT_MS = float(os.getenv("WEATHER_HEDGE_DEFAULT_MS", "800"))
+# Circuit ouvert après N échecs consécutifs (timeouts, 5xx), pendant WEATHER_BREAKER_RESET_S
+WEATHER_BREAKER_FAILURES = int(os.getenv("WEATHER_BREAKER_FAILURES", "5"))
+WEATHER_BREAKER_RESET_S = float(os.getenv("WEATHER_BREAKER_RESET_S", "30"))
+# Dernière réponse valide par lieu : servie tout de suite (et rafraîchie en tâche de fond)
+# si son âge < WEATHER_SWR_MAX_AGE_S ; servie en secours d'une panne jusqu'à WEATHER_STALE_IF_ERROR_S
+WEATHER_SWR_MAX_AGE_S = float(os.getenv("WEATHER_SWR_MAX_AGE_S", "1800"))
+WEATHER_STALE_IF_ERROR_S = float(os.getenv("WEATHER_STALE_IF_ERROR_S", "86400"))
+
+weather_cache = TTLCache(ttl_s=WEATHER_CACHE_TTL_S)
+# clé -> (payload, reçu_à)
+last_known_good = TTLCache(ttl_s=WEATHER_STALE_IF_ERROR_S, max_entries=4096)
+
+
+class UpstreamError(Exception):
+    """WeatherAPI indisponible (timeout, 5xx, circuit ouvert) et aucune réponse de secours."""
+
+
+def weather_ttl(payload: dict) -> float:
+    """TTL aligné sur `last_updated_epoch` : expire à la prochaine mise à jour attendue."""
+    epoch = (payload.get("current") or {}).get("last_updated_epoch")
+    if epoch is None:
+        return WEATHER_CACHE_TTL_S
+    expires_in = float(epoch) + WEATHER_CACHE_TTL_S - time.time()
+    return min(WEATHER_CACHE_TTL_S, max(WEATHER_CACHE_MIN_TTL_S, expires_in))
+
+
+def _cache_key(q: str) -> str:
+    return q.strip().lower()
+
+
+def _api_key() -> str:
     key = os.getenv("WEATHER_API_KEY")
     if not key:
         raise RuntimeError("WEATHER_API_KEY manquant dans .env")
+    return key
+
+
+# ----------------------------
+# Client asynchrone (pool keep-alive partagé)
+# ----------------------------
+
+class _RetryableStatus(Exception):
+    def __init__(self, status: int):
+        super().__init__(f"WeatherAPI HTTP {status}")
+        self.status = status
+
+
+class WeatherAPIClientError(aiohttp.ClientResponseError):
+    """Réponse 4xx de WeatherAPI, avec son code d'erreur applicatif (`error.code`)."""
+
+    def __init__(self, *args, api_code: Optional[int] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.api_code = api_code
+
+
+class AsyncWeatherClient:
+    """
+    Client aiohttp partagé par le process : pool de connexions keep-alive,
+    concurrence bornée (sémaphore), retries avec backoff exponentiel + jitter
+    (dans le budget de la requête), requêtes de couverture et circuit breaker.
+
+    `start()` / `close()` sont appelés par le lifespan FastAPI.
+    """
+
+    def __init__(
+        self,
+        base_url: str = WEATHERAPI_BASE_URL,
+        max_concurrency: int = WEATHER_MAX_CONCURRENCY,
+        retries: int = WEATHER_RETRIES,
+        timeout_s: float = WEATHER_TIMEOUT_S,
+    ):
+        self.base_url = base_url
+        self.max_concurrency = max_concurrency
+        self.retries = retries
+        self.timeout_s = timeout_s
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._sem: Optional[asyncio.Semaphore] = None
+        self.breaker = CircuitBreaker("WeatherAPI", WEATHER_BREAKER_FAILURES, WEATHER_BREAKER_RESET_S)
+        self._hedgers: Dict[str, Hedger] = {}
+
+    async def start(self):
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=self.max_concurrency, keepalive_timeout=60)
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=self.timeout_s),
+            )
+            self._sem = asyncio.Semaphore(self.max_concurrency)
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    async def get_json(self, path: str, params: dict) -> dict:
+        return await self._request("GET", path, params)
+
+    async def post_json(self, path: str, params: dict, body: dict, endpoint: Optional[str] = None) -> dict:
+        return await self._request("POST", path, params, body, endpoint)
+
+    async def _request(
+        self,
+        method: str,
+        path: str,
+        params: dict,
+        body: Optional[dict] = None,
+        endpoint: Optional[str] = None,
+    ) -> dict:
+        if self._session is None or self._session.closed:
+            await self.start()
+
+        url = f"{self.base_url}/{path.lstrip('/')}"
+        endpoint = endpoint or path
+        try:
+            probe = self.breaker.check()
+        except CircuitOpenError:
+            UPSTREAM_REQUESTS.inc(endpoint=endpoint, result="circuit_open")
+            raise
+
+        try:
+            return await self._request_with_retries(method, url, params, body, endpoint)
+        finally:
+            if probe:
+                # Sans effet si l'essai a abouti (succès ou échec déjà enregistré)
+                self.breaker.release_probe()
+
+    async def _request_with_retries(
+        self, method: str, url: str, params: dict, body: Optional[dict], endpoint: str
+    ) -> dict:
+        attempt = 0
+        while True:
+            try:
+                if WEATHER_HEDGE_ENABLED:
+                    data = await self._hedger(endpoint).run(lambda: self._attempt(method, url, params, body, endpoint))
+                else:
+                    data = await self._attempt(method, url, params, body, endpoint)
+                self.breaker.record_success()
+                return data
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError, _RetryableStatus) as e:
+                if not isinstance(e, _RetryableStatus):
+                    UPSTREAM_REQUESTS.inc(
+                        endpoint=endpoint, result="timeout" if isinstance(e, asyncio.TimeoutError) else "error"
+                    )
+                backoff = random.uniform(0, WEATHER_BACKOFF_BASE_S * (2 ** attempt))
+                # Plus de retry si le budget de la requête ne le permet pas
+                if attempt >= self.retries or remaining(self.timeout_s) <= backoff:
+                    self.breaker.record_failure()
+                    raise
+                # Backoff exponentiel avec "full jitter"
+                await asyncio.sleep(backoff)
+                attempt += 1
+            except aiohttp.ClientResponseError:
+                # 4xx (clé invalide, ville inconnue...) => pas de retry ; l'amont répond,
+                # le circuit n'est pas en cause
+                self.breaker.record_success()
+                raise
+
+    def _hedger(self, endpoint: str) -> Hedger:
+        h = self._hedgers.get(endpoint)
+        if h is None:
+            h = self._hedgers[endpoint] = Hedger(
+                LatencyTracker(),
+                default_delay_s=WEATHER_HEDGE_DEFAULT_MS / 1000.0,
+                min_delay_s=WEATHER_HEDGE_MIN_MS / 1000.0,
+                max_delay_s=self.timeout_s / 2,
+            )
+        return h
+
+    async def _attempt(self, method: str, url: str, params: dict, body: Optional[dict], endpoint: str) -> dict:
+        t0 = time.perf_counter()
+        async with self._sem:
+            async with self._session.request(method, url, params=params, json=body) as r:
+                UPSTREAM_REQUESTS.inc(endpoint=endpoint, result=r.status)
+                if r.status == 429 or r.status >= 500:
+                    raise _RetryableStatus(r.status)
+                if r.status >= 400:
+                    raise await _client_error(r)
+                data = await r.json()
+        self._hedger(endpoint).tracker.record(time.perf_counter() - t0)
+        return data
+
+    def snapshot_stats(self) -> dict:
+        return {
+            "circuit": self.breaker.snapshot_stats(),
+            "hedging": {
+                ep: {**h.stats, "delay_ms": round(h.delay_s() * 1000, 1)} for ep, h in self._hedgers.items()
+            },
+        }
+
+
+async def _client_error(r: aiohttp.ClientResponse) -> WeatherAPIClientError:
+    """4xx -> exception portant le message et le code d'erreur WeatherAPI (corps JSON `error`)."""
+    try:
+        err = (await r.json(content_type=None)).get("error") or {}
+    except (ValueError, AttributeError, aiohttp.ClientError):
+        err = {}
+    return WeatherAPIClientError(
+        r.request_info,
+        r.history,
+        status=r.status,
+        message=err.get("message") or r.reason or "",
+        headers=r.headers,
+        api_code=err.get("code"),
+    )
+
+
+weather_client = AsyncWeatherClient()
+
+
+def bulk_body(queries: List[str]) -> dict:
+    """Corps du POST bulk : `custom_id` = position de la requête (démultiplexage)."""
+    return {"locations": [{"q": q, "custom_id": str(i)} for i, q in enumerate(queries)]}
+
+
+def split_bulk(payload: dict, n: int) -> List[object]:
+    """
+    Réponse bulk -> un payload `current.json` ({"location", "current"}) par requête,
+    dans l'ordre d'envoi ; une erreur par lieu (ex: lieu introuvable) devient une exception.
+    """
+    out: List[object] = [ValueError("WeatherAPI: lieu absent de la réponse bulk") for _ in range(n)]
+    for entry in payload.get("bulk") or []:
+        item = entry.get("query") or {}
+        try:
+            i = int(item.get("custom_id"))
+        except (TypeError, ValueError):
+            continue
+        if not 0 <= i < n:
+            continue
+        err = item.get("error")
+        if err:
+            out[i] = ValueError(f"WeatherAPI ({item.get('q')}): {err.get('message', err)}")
+        else:
+            out[i] = {"location": item.get("location") or {}, "current": item.get("current") or {}}
+    return out
+
+
+_bulk_state = {"supported": True}
+# "API key does not have access to the resource" : le plan n'inclut pas le bulk
+BULK_UNAVAILABLE_CODES = {2009}
 
-    url = "https://api.weatherapi.com/v1/current.json"
-    params = {"key": key, "q": q, "aqi": "yes"}
-    r = requests.get(url, params=params, timeout=15)
-    r.raise_for_status()
-    return r.json()
+
+async def _get_current(q: str) -> dict:
+    return await weather_client.get_json("current.json", {"key": _api_key(), "q": q, "aqi": "yes"})
+
+
+async def _fetch_current_batch(queries: List[str]) -> List[object]:
+    """Lot du micro-batcher : un seul POST bulk (un GET si une seule requête)."""
+    if len(queries) == 1 or not _bulk_state["supported"]:
+        return await asyncio.gather(*(_get_current(q) for q in queries), return_exceptions=True)
+    try:
+        payload = await weather_client.post_json(
+            "current.json",
+            {"key": _api_key(), "q": "bulk", "aqi": "yes"},
+            bulk_body(queries),
+            endpoint="current.json:bulk",
+        )
+    except aiohttp.ClientResponseError as e:
+        if not 400 <= e.status < 500:
+            raise
+        if getattr(e, "api_code", None) in BULK_UNAVAILABLE_CODES:
+            # Plan sans accès au bulk : on n'essaie plus pour ce process
+            _bulk_state["supported"] = False
+            log.warning("Bulk WeatherAPI non inclus dans le plan (HTTP %s) : requêtes unitaires", e.status)
+        else:
+            # Clé refusée, corps rejeté... : ce lot seulement, chaque requête reçoit sa propre erreur
+            log.info("Bulk WeatherAPI refusé (HTTP %s : %s) : lot en requêtes unitaires", e.status, e.message)
+        return await asyncio.gather(*(_get_current(q) for q in queries), return_exceptions=True)
+    return split_bulk(payload, len(queries))
+
+
+weather_bulk = MicroBatcher(_fetch_current_batch, WEATHER_BULK_MAX, WEATHER_BULK_WAIT_MS)
+
+
+async def fetch_weather_async(q: str) -> dict:
+    """
+    Appelle WeatherAPI current.json via le cache TTL partagé (single-flight : les miss
+    concurrents pour une même requête `q` ne produisent qu'un seul appel réseau).
+
+    Les miss concurrents (plusieurs villes de /realtime, tour du poller, /predict/batch)
+    sont regroupés en requêtes bulk.
+    """
+    async def _fetch():
+        if WEATHER_BULK_ENABLED:
+            payload = await weather_bulk.submit(q)
+        else:
+            payload = await _get_current(q)
+        _remember(_cache_key(q), payload)
+        return payload
+
+    with stage("fetch_weather"):
+        return await weather_cache.aget_or_compute(_cache_key(q), _fetch, ttl_for=weather_ttl)
+
+
+async def fetch_forecast_async(q: str, hours: int) -> dict:
+    """WeatherAPI forecast.json (prévisions horaires + air_quality) couvrant `hours` heures."""
+    key = _forecast_key(q, hours)
+
+    async def _fetch():
+        params = {"key": _api_key(), "q": q, "days": _forecast_days(hours), "aqi": "yes", "alerts": "no"}
+        payload = await weather_client.get_json("forecast.json", params)
+        _remember(key, payload)
+        return payload
+
+    with stage("fetch_forecast"):
+        return await weather_cache.aget_or_compute(key, _fetch, ttl_for=weather_ttl)
+
+
+def _forecast_days(hours: int) -> int:
+    return min(3, hours // 24 + 2)  # +1 jour pour l'heure courante qui déborde sur le lendemain
+
+
+def _forecast_key(q: str, hours: int) -> str:
+    return f"forecast:{_forecast_days(hours)}:{_cache_key(q)}"
+
+
+# ----------------------------
+# Dernière réponse valide + stale-while-revalidate
+# ----------------------------
+
+class WeatherResult(NamedTuple):
+    payload: dict
+    age_s: Optional[float]  # None = réponse fraîche (cache ou amont)
+    stale: bool
+
+
+_stale_stats = {"served_stale": 0, "served_stale_error": 0, "upstream_errors": 0, "background_refresh": 0}
+
+
+def _remember(key: str, payload: dict):
+    last_known_good.set(key, (payload, time.time()))
+
+
+def _is_bad_query(e: BaseException) -> bool:
+    """Lieu inconnu / requête invalide : erreur client, pas de repli sur une réponse ancienne."""
+    return isinstance(e, ValueError) or (isinstance(e, aiohttp.ClientResponseError) and e.status == 400)
+
+
+def _log_refresh(task: "asyncio.Task"):
+    if not task.cancelled() and task.exception() is not None and not _is_bad_query(task.exception()):
+        log.warning("Rafraîchissement WeatherAPI en tâche de fond échoué : %r", task.exception())
+
+
+async def _resilient(key: str, refresh: Callable[[], Awaitable[dict]]) -> WeatherResult:
+    """
+    Réponse fraîche si possible dans le budget de la requête (`deadline`), sinon la
+    dernière réponse valide marquée `stale` ; `UpstreamError` s'il n'y en a pas.
+    """
+    cached = weather_cache.get(key)
+    if cached is not None:
+        return WeatherResult(cached, None, False)
+
+    # Contexte vierge : le rafraîchissement n'est pas borné par le budget de cette requête
+    task = asyncio.get_running_loop().create_task(refresh(), context=contextvars.Context())
+    lkg = last_known_good.get(key)
+    if lkg is not None and time.time() - lkg[1] <= WEATHER_SWR_MAX_AGE_S:
+        # Stale-while-revalidate : on répond tout de suite, l'amont rafraîchit en arrière-plan
+        task.add_done_callback(_log_refresh)
+        _stale_stats["served_stale"] += 1
+        _stale_stats["background_refresh"] += 1
+        return WeatherResult(lkg[0], time.time() - lkg[1], True)
+
+    try:
+        payload = await asyncio.wait_for(asyncio.shield(task), remaining(WEATHER_DEADLINE_S))
+        return WeatherResult(payload, None, False)
+    except Exception as e:
+        if _is_bad_query(e):
+            raise
+        # Le rafraîchissement continue (il alimentera le cache pour les requêtes suivantes)
+        task.add_done_callback(_log_refresh)
+        _stale_stats["upstream_errors"] += 1
+        if lkg is not None:
+            _stale_stats["served_stale_error"] += 1
+            return WeatherResult(lkg[0], time.time() - lkg[1], True)
+        if isinstance(e, asyncio.TimeoutError):
+            raise UpstreamError(f"WeatherAPI n'a pas répondu en {WEATHER_DEADLINE_S:g} s") from e
+        raise UpstreamError(f"WeatherAPI indisponible : {e}") from e
+
+
+async def fetch_current(q: str) -> WeatherResult:
+    """current.json pour une requête API : budget `WEATHER_DEADLINE_S`, repli sur la dernière réponse."""
+    return await _resilient(_cache_key(q), lambda: fetch_weather_async(q))
+
+
+async def fetch_forecast(q: str, hours: int) -> WeatherResult:
+    """forecast.json pour une requête API (même politique que `fetch_current`)."""
+    return await _resilient(_forecast_key(q, hours), lambda: fetch_forecast_async(q, hours))
+
+
+def upstream_stats() -> dict:
+    return {
+        **weather_client.snapshot_stats(),
+        **_stale_stats,
+        "last_known_good": last_known_good.snapshot_stats()["size"],
+    }
 
 
 def extract_features(payload: dict) -> dict:
@@ -42,6 +459,28 @@ def extract_features(payload: dict) -> dict:
         "NO2(GT)": float(NO2) if NO2 is not None else None
     }
 
+def extract_hourly_features(payload: dict) -> Dict[str, dict]:
+    """
+    Régresseurs (T, RH, NO2) par heure locale depuis une réponse forecast.json.
+
+    Clé: "YYYY-MM-DD HH:00" (heure locale de la ville, format `hour.time` de WeatherAPI).
+    """
+    out = {}
+    for day in (payload.get("forecast") or {}).get("forecastday", []):
+        for hour in day.get("hour", []):
+            T = hour.get("temp_c")
+            RH = hour.get("humidity")
+            if T is None or RH is None:
+                continue
+            no2 = (hour.get("air_quality") or {}).get("no2")
+            out[str(hour.get("time"))] = {
+                "T": float(T),
+                "RH": float(RH),
+                "NO2(GT)": float(no2) if no2 is not None else None,
+            }
+    return out
+
+
 from app.services.weatherapi import WEATHERAPI_SOURCE_NAME  # si besoin (sinon garde ta constante)
 
 
@@ -0,0 +1,99 @@
+"""
+Requêtes WeatherAPI unitaires vs bulk, contre le serveur factice local (hors-ligne).
+
+Démarre `weather_stub` dans le process, récupère N lieux concurrents en cache froid avec
+`fetch_weather_async` (GET bornés par WEATHER_MAX_CONCURRENCY, puis POST bulk de 50 lieux
+max via le micro-batcher) et compare durée, allers-retours amont et parité des payloads.
+
+    python -m benchmarks.bench_bulk --locations 10,50,120 --latency-ms 80 [--save]
+"""
+import argparse
+import asyncio
+import os
+import socket
+import time
+
+from aiohttp import web
+
+os.environ.setdefault("WEATHER_API_KEY", "stub")
+
+from app.services import weatherapi  # noqa: E402
+from app.services.weatherapi import extract_realtime, fetch_weather_async, weather_cache  # noqa: E402
+from benchmarks.results import save  # noqa: E402
+from benchmarks.weather_stub import make_app  # noqa: E402
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+async def run_case(queries, bulk: bool, stats: dict) -> dict:
+    weather_cache.clear()
+    weatherapi.WEATHER_BULK_ENABLED = bulk
+    calls0 = stats["calls"]
+    t0 = time.perf_counter()
+    # Erreurs par lieu conservées : elles ne font pas échouer les autres
+    payloads = await asyncio.gather(*(fetch_weather_async(q) for q in queries), return_exceptions=True)
+    res = dict(zip(queries, payloads))
+    elapsed = time.perf_counter() - t0
+    errors = [q for q, v in res.items() if isinstance(v, Exception)]
+    return {
+        "seconds": elapsed,
+        "round_trips": stats["calls"] - calls0,
+        "errors": len(errors),
+        "payloads": res,
+    }
+
+
+async def amain(args):
+    port = _free_port()
+    app = make_app(args.latency_ms, args.jitter_ms)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", port).start()
+    stats = app["stats"]
+
+    client = weatherapi.weather_client
+    client.base_url = f"http://127.0.0.1:{port}/v1"
+    await client.start()
+
+    results = {}
+    try:
+        print(f"{'lieux':>6} | {'mode':<8} | {'durée (ms)':>10} | {'allers-retours':>14} | erreurs")
+        for n in [int(x) for x in args.locations.split(",")]:
+            queries = [f"{45 + i * 0.01:.4f},{-73.5 - i * 0.01:.4f}" for i in range(n)]
+            single = await run_case(queries, bulk=False, stats=stats)
+            bulk = await run_case(queries, bulk=True, stats=stats)
+
+            # Parité : le démultiplexage bulk doit donner les mêmes données par lieu
+            mismatched = sum(
+                1 for q in queries
+                if not isinstance(single["payloads"][q], Exception)
+                and extract_realtime(single["payloads"][q], q) != extract_realtime(bulk["payloads"][q], q)
+            )
+            for mode, r in (("unitaire", single), ("bulk", bulk)):
+                print(f"{n:>6} | {mode:<8} | {r['seconds'] * 1000:>10.1f} | {r['round_trips']:>14} | {r['errors']}")
+                results[f"{mode}_{n}"] = {k: v for k, v in r.items() if k != "payloads"}
+            print(f"{'':>6}   speedup x{single['seconds'] / bulk['seconds']:.1f}, payloads différents: {mismatched}")
+    finally:
+        await weatherapi.weather_bulk.stop()
+        await client.close()
+        await runner.cleanup()
+
+    if args.save:
+        save("bulk", results)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--locations", default="10,50,120")
+    parser.add_argument("--latency-ms", type=float, default=80.0)
+    parser.add_argument("--jitter-ms", type=float, default=10.0)
+    parser.add_argument("--save", action="store_true", help="stocke les résultats dans benchmarks/results/")
+    asyncio.run(amain(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
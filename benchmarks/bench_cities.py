@@ -0,0 +1,54 @@
+"""
+Latence des recherches du registre de villes en fonction de sa taille
+(registres synthétiques tirés dans l'emprise du Québec).
+
+Usage: python -m benchmarks.bench_cities --sizes 100,1000,10000,100000 --queries 2000
+"""
+import argparse
+import time
+
+import numpy as np
+
+from app.services.cities import City, CityRegistry
+
+
+def synthetic_registry(n: int, seed: int = 0) -> CityRegistry:
+    rng = np.random.default_rng(seed)
+    lat = rng.uniform(45.0, 62.0, n)
+    lon = rng.uniform(-79.5, -57.0, n)
+    return CityRegistry([City(f"ville-{i}", float(a), float(b)) for i, (a, b) in enumerate(zip(lat, lon))])
+
+
+def per_call_us(fn, args_list) -> float:
+    t0 = time.perf_counter()
+    for args in args_list:
+        fn(*args)
+    return (time.perf_counter() - t0) / len(args_list) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="100,1000,10000,100000")
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--k", type=int, default=5)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(1)
+    points = list(zip(rng.uniform(45.0, 62.0, args.queries), rng.uniform(-79.5, -57.0, args.queries)))
+
+    print(f"{'taille':>8} | {'nom (µs)':>9} | {'nearest k=1':>11} | {f'nearest k={args.k}':>11} | {'build (ms)':>10}")
+    for size in (int(s) for s in args.sizes.split(",")):
+        registry = synthetic_registry(size)
+        t0 = time.perf_counter()
+        registry.nearest(46.0, -72.0)  # construit le KD-tree
+        build_ms = (time.perf_counter() - t0) * 1000
+
+        names = [(f"Ville-{i % size}",) for i in range(args.queries)]
+        t_name = per_call_us(registry.get, names)
+        t_k1 = per_call_us(lambda a, b: registry.nearest(a, b, 1), points)
+        t_k = per_call_us(lambda a, b: registry.nearest(a, b, args.k), points)
+        print(f"{size:>8} | {t_name:>9.2f} | {t_k1:>11.2f} | {t_k:>11.2f} | {build_ms:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""
+Compare une trajectoire de N heures calculée en une passe (`forecast_trajectory`)
+à N appels successifs "un pas" (ancien comportement de /predict).
+
+Usage: python -m benchmarks.bench_forecast --horizon 24 --repeat 5
+"""
+import argparse
+import statistics
+import time
+
+from app.main import FALLBACK, get_model
+from app.services.features import build_future_df
+from app.services.inference import forecast_trajectory
+
+FEATS = {"T": 12.0, "RH": 55.0, "NO2(GT)": 40.0}
+
+
+def one_pass(m, horizon: int):
+    df_future = build_future_df(FALLBACK, FEATS, horizon=horizon)
+    return forecast_trajectory(m, df_future, horizon)
+
+
+def sequential(m, horizon: int):
+    # N requêtes /predict indépendantes (1 pas chacune)
+    return [m.predict(build_future_df(FALLBACK, FEATS)) for _ in range(horizon)]
+
+
+def timeit(fn, repeat: int) -> list:
+    out = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        out.append(time.perf_counter() - t0)
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--horizon", type=int, default=24)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    m = get_model()
+    one_pass(m, args.horizon)  # warm-up
+
+    t_one = timeit(lambda: one_pass(m, args.horizon), args.repeat)
+    t_seq = timeit(lambda: sequential(m, args.horizon), args.repeat)
+
+    med_one, med_seq = statistics.median(t_one), statistics.median(t_seq)
+    print(f"horizon={args.horizon} repeat={args.repeat}")
+    print(f"  une passe       : {med_one * 1000:8.1f} ms (médiane)")
+    print(f"  {args.horizon} appels 1 pas : {med_seq * 1000:8.1f} ms (médiane)")
+    print(f"  speedup         : x{med_seq / med_one:.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Parité et latence du backend NumPy vs `m.predict` NeuralProphet.
+
+Usage: python -m benchmarks.bench_numpy_engine [--export models/neuralprophet_co_numpy.npz]
+
+Sans `--export`, le modèle chargé est exporté en mémoire : utile sans snapshot warm,
+où chaque process refait un mini-fit (poids différents de ceux du fichier exporté).
+"""
+import argparse
+import statistics
+import sys
+import time
+
+import numpy as np
+
+from app.main import FALLBACK, MODEL_PATH, TRAIN_CSV
+from app.model_loader import ensure_model_loaded
+from app.services.features import build_future_df
+from app.services.inference import forecast_trajectory
+from app.services.numpy_engine import NumpyPredictor, export_numpy_model
+
+# Écart max toléré sur yhat1 (unités de y, mg/m³) ; NeuralProphet calcule en float32
+PARITY_ATOL = 1e-3
+PARITY_RTOL = 1e-5
+
+
+def random_feats(rng) -> dict:
+    return {
+        "T": float(rng.uniform(-30, 40)),
+        "RH": float(rng.uniform(5, 100)),
+        "NO2(GT)": float(rng.uniform(0, 300)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--export", default=None)
+    parser.add_argument("--cases", type=int, default=50)
+    parser.add_argument("--horizon", type=int, default=24)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    m = ensure_model_loaded(MODEL_PATH, TRAIN_CSV, backend="neuralprophet")
+    npm = NumpyPredictor.load(args.export) if args.export else NumpyPredictor(export_numpy_model(m))
+    rng = np.random.default_rng(0)
+
+    # 1) Parité sur des entrées aléatoires : horizon déroulé pas à pas (lags AR), comme /forecast
+    worst = 0.0
+    for _ in range(args.cases):
+        df = build_future_df(FALLBACK, random_feats(rng), horizon=args.horizon)
+        ref = forecast_trajectory(m, df, args.horizon)["yhat1"].to_numpy(dtype=float)
+        got = forecast_trajectory(npm, df, args.horizon)["yhat1"].to_numpy(dtype=float)
+        worst = max(worst, float(np.max(np.abs(ref - got) / (PARITY_ATOL + PARITY_RTOL * np.abs(ref)))))
+    print(f"parité: max |Δyhat1| / tolérance = {worst:.2f} sur {args.cases} cas (atol {PARITY_ATOL}, rtol {PARITY_RTOL})")
+
+    # 2) Latence d'un /predict (contexte + 1 heure)
+    df = build_future_df(FALLBACK, random_feats(rng), horizon=1)
+    for name, fn in (("neuralprophet", m.predict), ("numpy", npm.predict)):
+        times = []
+        for _ in range(args.repeat if name == "numpy" else max(5, args.repeat // 20)):
+            t0 = time.perf_counter()
+            fn(df)
+            times.append(time.perf_counter() - t0)
+        print(f"{name:>14}: médiane {statistics.median(times) * 1000:8.3f} ms")
+
+    if worst > 1.0:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
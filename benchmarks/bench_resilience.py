@@ -0,0 +1,147 @@
+"""
+Latence de queue et pannes WeatherAPI, contre le serveur factice local (hors-ligne).
+
+1. Latence : N lieux en cache froid, une part `--slow-rate` des réponses amont prenant
+   `--slow-ms` ; p50 / p95 / p99 de `fetch_current` avec et sans requêtes de couverture.
+2. Panne : l'amont renvoie des 503 ; la dernière réponse valide est servie (`stale`),
+   puis sans réponse de secours `UpstreamError` (502) dans le budget, puis circuit ouvert.
+
+    python -m benchmarks.bench_resilience --requests 200 --slow-rate 0.05 [--save]
+"""
+import argparse
+import asyncio
+import os
+import socket
+import time
+
+from aiohttp import web
+
+os.environ.setdefault("WEATHER_API_KEY", "stub")
+
+from app.services import weatherapi  # noqa: E402
+from app.services.resilience import deadline  # noqa: E402
+from app.services.weatherapi import UpstreamError, fetch_current, last_known_good, weather_cache  # noqa: E402
+from benchmarks.results import save  # noqa: E402
+from benchmarks.weather_stub import make_app  # noqa: E402
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _pct(values, q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+async def _timed(q: str):
+    t0 = time.perf_counter()
+    try:
+        with deadline(weatherapi.WEATHER_DEADLINE_S):
+            res = await fetch_current(q)
+        outcome = "stale" if res.stale else "ok"
+    except UpstreamError:
+        outcome = "upstream_error"
+    return time.perf_counter() - t0, outcome
+
+
+async def latency_case(n: int, hedge: bool, offset: int) -> dict:
+    weatherapi.WEATHER_HEDGE_ENABLED = hedge
+    weather_cache.clear()
+    last_known_good.clear()
+    samples = []
+    for i in range(n):
+        seconds, _ = await _timed(f"{45 + (offset + i) * 0.001:.4f},-73.5")
+        samples.append(seconds * 1000)
+    return {"p50_ms": _pct(samples, 0.5), "p95_ms": _pct(samples, 0.95), "p99_ms": _pct(samples, 0.99)}
+
+
+async def outage_case(fault: dict) -> dict:
+    client = weatherapi.weather_client
+    q = "45.5000,-73.5700"
+    weather_cache.clear()
+    last_known_good.clear()
+    await fetch_current(q)  # réponse valide mémorisée
+
+    fault["fail_rate"] = 1.0
+    weather_cache.clear()  # expiration du cache frais
+    _, with_lkg = await _timed(q)
+
+    last_known_good.clear()
+    seconds, without_lkg = await _timed("46.8100,-71.2100")
+
+    # Échecs consécutifs jusqu'à l'ouverture du circuit, puis rejet immédiat
+    for i in range(client.breaker.failure_threshold):
+        if client.breaker.state == "open":
+            break
+        await _timed(f"47.{i:04d},-70.0")
+    open_seconds, open_outcome = await _timed("48.0000,-70.0")
+    fault["fail_rate"] = 0.0
+    return {
+        "with_last_known_good": with_lkg,
+        "without_last_known_good": without_lkg,
+        "failure_ms": seconds * 1000,
+        "circuit": client.breaker.state,
+        "circuit_open_outcome": open_outcome,
+        "circuit_open_ms": open_seconds * 1000,
+    }
+
+
+async def amain(args):
+    port = _free_port()
+    app = make_app(args.latency_ms, args.jitter_ms, slow_rate=args.slow_rate, slow_ms=args.slow_ms)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", port).start()
+
+    weatherapi.WEATHER_BULK_ENABLED = False  # une requête amont par lieu
+    client = weatherapi.weather_client
+    client.base_url = f"http://127.0.0.1:{port}/v1"
+    await client.start()
+
+    results = {}
+    try:
+        # Échantillons de latence pour le p95 du délai de couverture
+        await latency_case(30, hedge=True, offset=10_000)
+        print(f"{'mode':<16} | {'p50 (ms)':>8} | {'p95 (ms)':>8} | {'p99 (ms)':>8}")
+        for name, hedge, offset in (("sans couverture", False, 0), ("couverture p95", True, args.requests)):
+            r = await latency_case(args.requests, hedge, offset)
+            results[name.replace(" ", "_")] = r
+            print(f"{name:<16} | {r['p50_ms']:>8.1f} | {r['p95_ms']:>8.1f} | {r['p99_ms']:>8.1f}")
+        print(f"couverture : {client.snapshot_stats()['hedging']}")
+
+        app["fault"]["slow_rate"] = 0.0
+        outage = await outage_case(app["fault"])
+        results["outage"] = {k: v for k, v in outage.items() if isinstance(v, float)}
+        print(
+            f"\npanne amont : avec réponse de secours -> {outage['with_last_known_good']}, "
+            f"sans -> {outage['without_last_known_good']} en {outage['failure_ms']:.0f} ms "
+            f"(budget {weatherapi.WEATHER_DEADLINE_S:g} s)"
+        )
+        print(
+            f"circuit {outage['circuit']} : {outage['circuit_open_outcome']} "
+            f"en {outage['circuit_open_ms']:.1f} ms"
+        )
+    finally:
+        await client.close()
+        await runner.cleanup()
+
+    if args.save:
+        save("resilience", results)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--latency-ms", type=float, default=40.0)
+    parser.add_argument("--jitter-ms", type=float, default=10.0)
+    parser.add_argument("--slow-rate", type=float, default=0.05)
+    parser.add_argument("--slow-ms", type=float, default=1500.0)
+    parser.add_argument("--save", action="store_true", help="stocke les résultats dans benchmarks/results/")
+    asyncio.run(amain(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+Sérialisation des réponses /realtime et /predict : ancien chemin (construction Pydantic
+validée + re-validation `response_model` + json stdlib) vs nouveau (dicts / model_construct
++ orjson), et taille des formats compacts (`?fields=`, `?format=columnar`).
+
+    python -m benchmarks.bench_serialization [--cities 10] [--horizon 24] [--save]
+"""
+import argparse
+import json
+import statistics
+import time
+
+from app.schemas import ForecastPoint, PredictResponse, RealtimeCityResponse, RealtimeResponse
+from app.services.serialization import ORJSONResponse, columnar, project
+from app.services.weatherapi import extract_realtime
+from benchmarks.load_test import percentile
+from benchmarks.results import save
+from benchmarks.weather_stub import sample_current
+
+FIELDS = ["city", "ts", "current_air_quality.pollutants_ugm3.CO", "current_air_quality.aqi.us_epa_index"]
+
+
+def bench(fn, repeat: int) -> dict:
+    fn()  # warm-up
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    return {"n": repeat, "p50_ms": statistics.median(times) * 1000, "p95_ms": percentile(times, 95) * 1000}
+
+
+def stdlib_render(content) -> bytes:
+    # Rendu de starlette.responses.JSONResponse
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode()
+
+
+def fastapi_pipeline(model_cls, model) -> bytes:
+    """Ancien chemin : modèle retourné -> dict -> validation response_model -> dump JSON -> json.dumps."""
+    validated = model_cls.model_validate(model.model_dump(by_alias=True))
+    return stdlib_render(validated.model_dump(mode="json", by_alias=True))
+
+
+def realtime_before(rows):
+    model = RealtimeResponse(cities=[RealtimeCityResponse(**r) for r in rows])
+    return fastapi_pipeline(RealtimeResponse, model)
+
+
+def realtime_after(rows):
+    return ORJSONResponse({"cities": [{**r, "age_s": None, "stale": False} for r in rows]}).body
+
+
+def realtime_fields(rows):
+    return ORJSONResponse({"cities": [project(r, FIELDS) for r in rows]}).body
+
+
+def realtime_columnar(rows):
+    return ORJSONResponse({"count": len(rows), "columns": columnar(rows)}).body
+
+
+def predict_before(points, feats):
+    model = PredictResponse(
+        city="Montreal",
+        ds=points[0][0],
+        yhat1=points[0][1],
+        inputs=feats,
+        trajectory=[ForecastPoint(ds=ds, yhat1=y) for ds, y in points],
+    )
+    return fastapi_pipeline(PredictResponse, model)
+
+
+def predict_after(points, feats):
+    model = PredictResponse.model_construct(
+        city="Montreal",
+        ds=points[0][0],
+        yhat1=points[0][1],
+        inputs=feats,
+        trajectory=[ForecastPoint.model_construct(ds=ds, yhat1=y) for ds, y in points],
+        age_s=None,
+        stale=False,
+    )
+    return ORJSONResponse(model).body
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--cities", type=int, default=10)
+    parser.add_argument("--horizon", type=int, default=24)
+    parser.add_argument("--repeat", type=int, default=2000)
+    parser.add_argument("--save", action="store_true", help="stocke les résultats dans benchmarks/results/")
+    args = parser.parse_args()
+
+    rows = [
+        extract_realtime(sample_current(f"{45 + i * 0.1:.4f},-73.5"), city_fallback=f"Ville {i}")
+        for i in range(args.cities)
+    ]
+    feats = {"T": 12.0, "RH": 55.0, "NO2(GT)": 40.0}
+    points = [(f"2026-01-01 {h % 24:02d}:00:00", 0.5 + h * 0.01) for h in range(args.horizon)]
+
+    cases = {
+        "realtime_before": lambda: realtime_before(rows),
+        "realtime_after": lambda: realtime_after(rows),
+        "realtime_fields": lambda: realtime_fields(rows),
+        "realtime_columnar": lambda: realtime_columnar(rows),
+        "predict_before": lambda: predict_before(points, feats),
+        "predict_after": lambda: predict_after(points, feats),
+    }
+
+    results = {}
+    print(f"{args.cities} villes, horizon {args.horizon}")
+    print(f"{'cas':<20} | {'p50 (µs)':>9} | {'p95 (µs)':>9} | {'octets':>7}")
+    for name, fn in cases.items():
+        r = bench(fn, args.repeat)
+        r["bytes"] = len(fn())
+        results[name] = r
+        print(f"{name:<20} | {r['p50_ms'] * 1000:>9.1f} | {r['p95_ms'] * 1000:>9.1f} | {r['bytes']:>7}")
+
+    for prefix in ("realtime", "predict"):
+        before, after = results[f"{prefix}_before"]["p50_ms"], results[f"{prefix}_after"]["p50_ms"]
+        print(f"speedup {prefix}: x{before / after:.1f}")
+
+    if args.save:
+        print("résultats:", save("serialization", results))
+
+
+if __name__ == "__main__":
+    main()
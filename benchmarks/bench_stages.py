@@ -0,0 +1,88 @@
+"""
+Micro-benchmarks des étapes du chemin chaud, chacune isolée.
+
+    python -m benchmarks.bench_stages [--save]
+
+- extract_realtime / extract_features sur un payload WeatherAPI type
+- build_future_df (parse CSV à froid vs contexte en cache)
+- chargement du modèle (snapshot / warm-fit, mesuré une fois)
+- m.predict sur un df_future de 49 lignes
+"""
+import argparse
+import statistics
+import time
+
+import psutil
+
+from app.main import FALLBACK, MODEL_PATH, TRAIN_CSV
+from app.model_loader import ensure_model_loaded, model_status
+from app.services.features import build_future_df, get_context_store
+from app.services.weatherapi import extract_features, extract_realtime
+from benchmarks.load_test import percentile
+from benchmarks.results import save
+from benchmarks.weather_stub import sample_current
+
+FEATS = {"T": 12.0, "RH": 55.0, "NO2(GT)": 40.0}
+
+
+def bench(fn, repeat: int, warmup: int = 3) -> dict:
+    for _ in range(warmup):
+        fn()
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    return {
+        "n": repeat,
+        "p50_ms": statistics.median(times) * 1000,
+        "p95_ms": percentile(times, 95) * 1000,
+        "p99_ms": percentile(times, 99) * 1000,
+    }
+
+
+def build_cold():
+    # Invalide le contexte en cache => relecture + parse du CSV (ancien comportement)
+    get_context_store(FALLBACK)._values = None
+    build_future_df(FALLBACK, FEATS)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--save", action="store_true", help="stocke les résultats dans benchmarks/results/")
+    args = parser.parse_args()
+
+    proc = psutil.Process()
+    payload = sample_current("45.5017,-73.5673")
+    results = {}
+
+    results["extract_realtime"] = bench(lambda: extract_realtime(payload, city_fallback="Montreal"), args.repeat * 10)
+    results["extract_features"] = bench(lambda: extract_features(payload), args.repeat * 10)
+    results["build_future_df_cold"] = bench(build_cold, args.repeat)
+    results["build_future_df_cached"] = bench(lambda: build_future_df(FALLBACK, FEATS), args.repeat)
+
+    rss_before = proc.memory_info().rss
+    t0 = time.perf_counter()
+    m = ensure_model_loaded(MODEL_PATH, TRAIN_CSV)
+    results["model_load"] = {
+        "n": 1,
+        "p50_ms": (time.perf_counter() - t0) * 1000,
+        "rss_delta_mb": (proc.memory_info().rss - rss_before) / 2**20,
+        "source": model_status()["source"],
+    }
+
+    df = build_future_df(FALLBACK, FEATS)
+    results["predict_49_rows"] = bench(lambda: m.predict(df), max(10, args.repeat // 10))
+    results["process"] = {"rss_mb": proc.memory_info().rss / 2**20}
+
+    for name, r in results.items():
+        cols = "  ".join(f"{k}={v:.3f}" if isinstance(v, float) else f"{k}={v}" for k, v in r.items())
+        print(f"{name:>24}  {cols}")
+
+    if args.save:
+        save("stages", results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Bout-en-bout : API réelle (uvicorn) + WeatherAPI factice local, charge sur /realtime et /predict.
+
+    python -m benchmarks.e2e --duration 15 --concurrency 16 --save
+
+Rapporte débit, latences p50/p95/p99, RSS du serveur et nombre d'appels upstream.
+"""
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import time
+
+import aiohttp
+import psutil
+
+from benchmarks.load_test import predict_payload, print_result, run_load, wait_ready
+from benchmarks.results import save
+
+SCENARIOS = [
+    # (nom, méthode, chemin, corps de requête)
+    ("realtime", "GET", "/realtime", None),
+    ("realtime_city", "GET", "/realtime?city=Montreal", None),
+    ("predict_features", "POST", "/predict?nocache=true", predict_payload),
+    ("predict_weatherapi", "POST", "/predict", lambda: {"city": "Montreal"}),
+]
+
+
+def _spawn(args, env=None) -> subprocess.Popen:
+    return subprocess.Popen(
+        [sys.executable, "-m"] + args,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+
+
+async def _stub_stats(url: str) -> dict:
+    async with aiohttp.ClientSession() as session:
+        async with session.get(f"{url}/stats") as r:
+            return await r.json()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--duration", type=float, default=15.0)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--api-port", type=int, default=8766)
+    parser.add_argument("--stub-port", type=int, default=8799)
+    parser.add_argument("--stub-latency-ms", type=float, default=50.0)
+    parser.add_argument("--save", action="store_true")
+    args = parser.parse_args()
+
+    stub_url = f"http://127.0.0.1:{args.stub_port}"
+    api_url = f"http://127.0.0.1:{args.api_port}"
+
+    stub = _spawn(["benchmarks.weather_stub", "--port", str(args.stub_port), "--latency-ms", str(args.stub_latency_ms)])
+    env = dict(
+        os.environ,
+        WEATHERAPI_BASE_URL=f"{stub_url}/v1",
+        WEATHER_API_KEY="stub",
+        POLLER_ENABLED="0",
+    )
+    api = _spawn(["uvicorn", "app.main:app", "--port", str(args.api_port), "--log-level", "warning"], env=env)
+    try:
+        t0 = time.perf_counter()
+        asyncio.run(wait_ready(api_url))
+        startup_s = time.perf_counter() - t0
+        server = psutil.Process(api.pid)
+
+        results = {"startup": {"seconds_to_ready": startup_s, "rss_mb": server.memory_info().rss / 2**20}}
+        for name, method, path, payload_fn in SCENARIOS:
+            calls_before = asyncio.run(_stub_stats(stub_url))["calls"]
+            res = asyncio.run(run_load(
+                api_url, path, method, args.concurrency, args.duration,
+                payload_fn=payload_fn or predict_payload,
+            ))
+            res["upstream_calls"] = asyncio.run(_stub_stats(stub_url))["calls"] - calls_before
+            res["rss_mb"] = server.memory_info().rss / 2**20
+            results[name] = res
+            print_result(name, res)
+            print(f"{'':>12}   upstream={res['upstream_calls']}  rss={res['rss_mb']:.0f} MB")
+
+        if args.save:
+            save("e2e", results)
+    finally:
+        for p in (api, stub):
+            p.terminate()
+            p.wait(timeout=30)
+
+
+if __name__ == "__main__":
+    main()
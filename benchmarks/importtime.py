@@ -0,0 +1,124 @@
+"""
+Temps d'import de l'API (`python -X importtime`) et garde-fou contre les régressions.
+
+Échoue (code 1) si l'import de `app.main` charge un module lourd interdit (torch,
+NeuralProphet, pandas...) ou dépasse le budget / la référence d'un run précédent.
+
+    python -m benchmarks.importtime                      # rapport + vérifications
+    python -m benchmarks.importtime --save               # stocke la référence dans benchmarks/results/
+    python -m benchmarks.importtime --baseline benchmarks/results/importtime_....json
+"""
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+from typing import Dict, List, NamedTuple
+
+from benchmarks.results import save
+
+# Modules qui ne doivent être importés qu'au chargement du modèle / à la première prédiction
+FORBIDDEN = ["torch", "neuralprophet", "pytorch_lightning", "lightning", "joblib", "pandas", "numpy", "scipy"]
+
+_LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)\s*$")
+
+
+class ImportRecord(NamedTuple):
+    module: str
+    self_us: int
+    cumulative_us: int
+    depth: int
+
+
+def parse_importtime(stderr: str) -> List[ImportRecord]:
+    out = []
+    for line in stderr.splitlines():
+        m = _LINE.match(line)
+        if m:
+            # Indentation de 2 espaces par niveau (1 espace de base)
+            out.append(ImportRecord(m.group(4), int(m.group(1)), int(m.group(2)), (len(m.group(3)) - 1) // 2))
+    return out
+
+
+def measure(module: str) -> List[ImportRecord]:
+    env = {**os.environ, "PYTHONDONTWRITEBYTECODE": "1"}
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        env=env,
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    )
+    if proc.returncode != 0:
+        tail = "\n".join(proc.stderr.splitlines()[-5:])
+        raise RuntimeError(f"import {module} impossible :\n{tail}")
+    return parse_importtime(proc.stderr)
+
+
+def summarize(records: List[ImportRecord], module: str, top: int) -> dict:
+    total = next((r.cumulative_us for r in reversed(records) if r.module == module), None)
+    if total is None:
+        total = sum(r.self_us for r in records)
+    # Coût par paquet racine (cumulé des imports de premier niveau de chaque paquet)
+    packages: Dict[str, int] = {}
+    for r in records:
+        if r.depth == 0:
+            root = r.module.split(".")[0]
+            packages[root] = packages.get(root, 0) + r.cumulative_us
+    return {
+        "total_ms": total / 1000,
+        "modules": len(records),
+        "packages_ms": {k: v / 1000 for k, v in sorted(packages.items(), key=lambda kv: -kv[1])[:top]},
+        "slowest_self_ms": {r.module: r.self_us / 1000 for r in sorted(records, key=lambda r: -r.self_us)[:top]},
+        "imported": sorted({r.module.split(".")[0] for r in records}),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--module", default="app.main")
+    parser.add_argument("--repeat", type=int, default=3, help="mesures (on garde la plus rapide)")
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--budget-ms", type=float, default=float(os.getenv("IMPORT_BUDGET_MS", "1500")))
+    parser.add_argument("--baseline", default=None, help="résultat JSON de référence (--save)")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="dérive tolérée vs la référence")
+    parser.add_argument("--forbid", default=",".join(FORBIDDEN))
+    parser.add_argument("--save", action="store_true", help="stocke les résultats dans benchmarks/results/")
+    args = parser.parse_args()
+
+    runs = [summarize(measure(args.module), args.module, args.top) for _ in range(max(1, args.repeat))]
+    res = min(runs, key=lambda r: r["total_ms"])
+
+    print(f"import {args.module} : {res['total_ms']:.0f} ms ({res['modules']} modules, meilleur de {len(runs)})")
+    print(f"{'paquet':<28} | {'cumulé (ms)':>11}")
+    for name, ms in res["packages_ms"].items():
+        print(f"{name:<28} | {ms:>11.1f}")
+    print(f"\n{'module (temps propre)':<40} | {'ms':>7}")
+    for name, ms in res["slowest_self_ms"].items():
+        print(f"{name:<40} | {ms:>7.1f}")
+
+    failures = []
+    forbidden = [m for m in args.forbid.split(",") if m]
+    leaked = [m for m in forbidden if m in res["imported"]]
+    if leaked:
+        failures.append(f"modules lourds importés au démarrage : {', '.join(leaked)}")
+    if res["total_ms"] > args.budget_ms:
+        failures.append(f"{res['total_ms']:.0f} ms > budget {args.budget_ms:.0f} ms")
+    if args.baseline:
+        with open(args.baseline) as f:
+            ref = json.load(f)["metrics"][args.module]["total_ms"]
+        if res["total_ms"] > ref * (1 + args.tolerance):
+            failures.append(f"{res['total_ms']:.0f} ms > référence {ref:.0f} ms (+{args.tolerance:.0%})")
+
+    if args.save:
+        save("importtime", {args.module: {"total_ms": res["total_ms"], "modules": res["modules"]}})
+
+    if failures:
+        print("\nÉCHEC :\n- " + "\n- ".join(failures))
+        sys.exit(1)
+    print("\nOK")
+
+
+if __name__ == "__main__":
+    main()
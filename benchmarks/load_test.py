@@ -0,0 +1,149 @@
+"""
+Générateur de charge HTTP (aiohttp) : débit et latences p50/p95/p99.
+
+    # contre un serveur déjà lancé
+    python -m benchmarks.load_test --url http://127.0.0.1:8000 --concurrency 32 --duration 20
+
+    # montée en charge multi-cœurs : lance gunicorn avec 1, 2, 4 workers successivement
+    python -m benchmarks.load_test --workers-sweep 1,2,4
+
+Par défaut on cible POST /predict avec des features fournies (pas d'appel WeatherAPI)
+et `?nocache=true`, pour mesurer le coût réel de l'inférence.
+"""
+import argparse
+import asyncio
+import os
+import random
+import signal
+import subprocess
+import sys
+import time
+from typing import Callable, List
+
+import aiohttp
+
+
+def percentile(values: List[float], p: float) -> float:
+    if not values:
+        return float("nan")
+    s = sorted(values)
+    k = min(len(s) - 1, max(0, int(round(p / 100.0 * (len(s) - 1)))))
+    return s[k]
+
+
+def predict_payload() -> dict:
+    return {
+        "city": "Montreal",
+        "temp_c": round(random.uniform(-20, 30), 1),
+        "rh": round(random.uniform(20, 95), 1),
+        "no2_ugm3": round(random.uniform(5, 120), 1),
+    }
+
+
+async def run_load(
+    url: str,
+    path: str,
+    method: str,
+    concurrency: int,
+    duration: float,
+    payload_fn: Callable[[], dict] = predict_payload,
+) -> dict:
+    latencies: List[float] = []
+    errors = 0
+    deadline = time.perf_counter() + duration
+
+    async def worker(session: aiohttp.ClientSession):
+        nonlocal errors
+        while time.perf_counter() < deadline:
+            t0 = time.perf_counter()
+            try:
+                if method == "POST":
+                    resp = session.post(f"{url}{path}", json=payload_fn())
+                else:
+                    resp = session.get(f"{url}{path}")
+                async with resp as r:
+                    await r.read()
+                    if r.status >= 400:
+                        errors += 1
+                        continue
+            except aiohttp.ClientError:
+                errors += 1
+                continue
+            latencies.append(time.perf_counter() - t0)
+
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        t_start = time.perf_counter()
+        await asyncio.gather(*(worker(session) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - t_start
+
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": len(latencies) / elapsed if elapsed else 0.0,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+    }
+
+
+def print_result(label: str, res: dict):
+    print(
+        f"{label:>12} | {res['rps']:8.1f} req/s | p50 {res['p50_ms']:7.1f} ms | "
+        f"p95 {res['p95_ms']:7.1f} ms | p99 {res['p99_ms']:7.1f} ms | "
+        f"n={res['requests']} err={res['errors']}"
+    )
+
+
+async def wait_ready(url: str, timeout_s: float = 300):
+    deadline = time.time() + timeout_s
+    async with aiohttp.ClientSession() as session:
+        while time.time() < deadline:
+            try:
+                async with session.get(f"{url}/ready") as r:
+                    if r.status == 200:
+                        return
+            except aiohttp.ClientError:
+                pass
+            await asyncio.sleep(0.5)
+    raise TimeoutError("le serveur n'est pas prêt")
+
+
+def sweep(workers_list: List[int], args):
+    port = 8765
+    url = f"http://127.0.0.1:{port}"
+    for n in workers_list:
+        env = dict(os.environ, WEB_CONCURRENCY=str(n), BIND=f"127.0.0.1:{port}")
+        proc = subprocess.Popen(
+            [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "app.main:app"],
+            env=env,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        try:
+            asyncio.run(wait_ready(url))
+            res = asyncio.run(run_load(url, args.path, args.method, args.concurrency, args.duration))
+            print_result(f"{n} worker(s)", res)
+        finally:
+            proc.send_signal(signal.SIGTERM)
+            proc.wait(timeout=60)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--path", default="/predict?nocache=true")
+    parser.add_argument("--method", default="POST", choices=["GET", "POST"])
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=20.0)
+    parser.add_argument("--workers-sweep", default=None, help="ex: 1,2,4 (lance gunicorn pour chaque valeur)")
+    args = parser.parse_args()
+
+    if args.workers_sweep:
+        sweep([int(x) for x in args.workers_sweep.split(",")], args)
+    else:
+        print_result(args.path, asyncio.run(run_load(args.url, args.path, args.method, args.concurrency, args.duration)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Stockage et comparaison des résultats de benchmark entre commits.
+
+    python -m benchmarks.results list
+    python -m benchmarks.results compare benchmarks/results/A.json benchmarks/results/B.json
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from typing import Dict
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+# Métriques où "plus grand = mieux" (sinon plus petit = mieux : latences, RSS)
+HIGHER_IS_BETTER = ("rps",)
+
+
+def git_sha() -> str:
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True)
+        return out.stdout.strip()
+    except Exception:
+        return "unknown"
+
+
+def save(suite: str, metrics: Dict[str, dict]) -> str:
+    """Écrit `results/<suite>_<timestamp>_<sha>.json` et retourne le chemin."""
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    sha = git_sha()
+    path = os.path.join(RESULTS_DIR, f"{suite}_{time.strftime('%Y%m%d-%H%M%S')}_{sha}.json")
+    doc = {
+        "suite": suite,
+        "git_sha": sha,
+        "created_at": time.time(),
+        "python": sys.version.split()[0],
+        "machine": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "metrics": metrics,
+    }
+    with open(path, "w") as f:
+        json.dump(doc, f, indent=2)
+    print(f"Résultats: {path}")
+    return path
+
+
+def compare(path_a: str, path_b: str, threshold: float = 0.10) -> int:
+    """Affiche les écarts B vs A ; retourne le nombre de régressions au-delà de `threshold`."""
+    with open(path_a) as f:
+        a = json.load(f)
+    with open(path_b) as f:
+        b = json.load(f)
+    print(f"A={a['git_sha']}  B={b['git_sha']}  (suite {a['suite']})")
+
+    regressions = 0
+    for name, ma in a["metrics"].items():
+        mb = b["metrics"].get(name)
+        if mb is None:
+            continue
+        for key, va in ma.items():
+            vb = mb.get(key)
+            if not isinstance(va, (int, float)) or not isinstance(vb, (int, float)) or va == 0:
+                continue
+            delta = (vb - va) / abs(va)
+            worse = delta < -threshold if key in HIGHER_IS_BETTER else delta > threshold
+            regressions += worse
+            flag = "  <-- régression" if worse else ""
+            print(f"{name:>28}.{key:<14} {va:12.3f} -> {vb:12.3f}  ({delta:+.1%}){flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    sub.add_parser("list")
+    p_cmp = sub.add_parser("compare")
+    p_cmp.add_argument("a")
+    p_cmp.add_argument("b")
+    p_cmp.add_argument("--threshold", type=float, default=0.10)
+    args = parser.parse_args()
+
+    if args.cmd == "list":
+        for name in sorted(os.listdir(RESULTS_DIR)) if os.path.isdir(RESULTS_DIR) else []:
+            print(name)
+    else:
+        sys.exit(1 if compare(args.a, args.b, args.threshold) else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+"""
+Serveur WeatherAPI factice (aiohttp) pour les benchmarks hors-ligne.
+
+    python -m benchmarks.weather_stub --port 8799 --latency-ms 80
+    WEATHERAPI_BASE_URL=http://127.0.0.1:8799/v1 WEATHER_API_KEY=stub uvicorn app.main:app
+
+Sert `current.json` (GET, et POST `q=bulk` : `{"locations": [{"q", "custom_id"}]}`,
+50 lieux max) et `forecast.json` avec des valeurs plausibles, une latence simulée,
+et compte les appels reçus sur `/stats`. `--no-bulk` simule un plan sans bulk (403) ;
+`--slow-rate` / `--slow-ms` une latence de queue, `--fail-rate` des 503 aléatoires.
+"""
+import argparse
+import asyncio
+import random
+from datetime import datetime, timedelta
+
+from aiohttp import web
+
+
+def _air_quality(rng: random.Random) -> dict:
+    return {
+        "co": round(rng.uniform(150, 600), 1),
+        "no2": round(rng.uniform(2, 60), 1),
+        "o3": round(rng.uniform(20, 90), 1),
+        "so2": round(rng.uniform(0.5, 8), 1),
+        "pm2_5": round(rng.uniform(1, 35), 1),
+        "pm10": round(rng.uniform(2, 50), 1),
+        "us-epa-index": rng.randint(1, 3),
+        "gb-defra-index": rng.randint(1, 4),
+    }
+
+
+def sample_current(q: str, now: datetime = None) -> dict:
+    """Payload `current.json` réaliste (déterministe par ville et par quart d'heure)."""
+    now = now or datetime.now()
+    rng = random.Random(f"{q}:{now.strftime('%Y%m%d%H')}{now.minute // 15}")
+    last_updated = now.replace(minute=(now.minute // 15) * 15, second=0, microsecond=0)
+    lat, lon = (q.split(",") + ["0"])[:2] if "," in q else ("45.5", "-73.57")
+    return {
+        "location": {
+            "name": q if "," not in q else "Stubville",
+            "lat": float(lat),
+            "lon": float(lon),
+            "localtime": now.strftime("%Y-%m-%d %H:%M"),
+        },
+        "current": {
+            "last_updated_epoch": int(last_updated.timestamp()),
+            "last_updated": last_updated.strftime("%Y-%m-%d %H:%M"),
+            "temp_c": round(rng.uniform(-10, 28), 1),
+            "humidity": rng.randint(30, 95),
+            "wind_kph": round(rng.uniform(0, 30), 1),
+            "wind_dir": rng.choice(["N", "NE", "E", "SE", "S", "SW", "W", "NW"]),
+            "pressure_mb": round(rng.uniform(995, 1030), 1),
+            "precip_mm": 0.0,
+            "cloud": rng.randint(0, 100),
+            "feelslike_c": round(rng.uniform(-15, 30), 1),
+            "vis_km": 10.0,
+            "air_quality": _air_quality(rng),
+        },
+    }
+
+
+def sample_forecast(q: str, days: int) -> dict:
+    payload = sample_current(q)
+    rng = random.Random(q)
+    start = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    forecastday = []
+    for d in range(days):
+        hours = []
+        for h in range(24):
+            t = start + timedelta(days=d, hours=h)
+            hours.append({
+                "time_epoch": int(t.timestamp()),
+                "time": t.strftime("%Y-%m-%d %H:%M"),
+                "temp_c": round(rng.uniform(-10, 28), 1),
+                "humidity": rng.randint(30, 95),
+                "air_quality": _air_quality(rng),
+            })
+        forecastday.append({"date": (start + timedelta(days=d)).strftime("%Y-%m-%d"), "hour": hours})
+    payload["forecast"] = {"forecastday": forecastday}
+    return payload
+
+
+BULK_MAX = 50
+
+
+def sample_bulk(locations: list) -> dict:
+    """Réponse bulk : un élément `query` par lieu (avec son `custom_id`), ou une erreur."""
+    out = []
+    for loc in locations:
+        q, custom_id = str(loc.get("q") or ""), loc.get("custom_id")
+        if not q:
+            error = {"code": 1006, "message": "No location found matching parameter 'q'"}
+            out.append({"query": {"custom_id": custom_id, "q": q, "error": error}})
+            continue
+        out.append({"query": {"custom_id": custom_id, "q": q, **sample_current(q)}})
+    return {"bulk": out}
+
+
+def make_app(
+    latency_ms: float = 50.0,
+    jitter_ms: float = 20.0,
+    bulk: bool = True,
+    slow_rate: float = 0.0,
+    slow_ms: float = 2000.0,
+    fail_rate: float = 0.0,
+) -> web.Application:
+    # `fault` est modifiable à chaud par les benchmarks (ex: panne totale avec fail_rate=1)
+    stats = {"calls": 0, "locations": 0, "failed": 0, "slow": 0, "by_endpoint": {}}
+    fault = {"slow_rate": slow_rate, "slow_ms": slow_ms, "fail_rate": fail_rate}
+
+    async def _delay():
+        ms = latency_ms + random.uniform(-jitter_ms, jitter_ms)
+        if random.random() < fault["slow_rate"]:
+            stats["slow"] += 1
+            ms = fault["slow_ms"]
+        await asyncio.sleep(max(0.0, ms) / 1000.0)
+
+    def _count(name: str):
+        stats["calls"] += 1
+        stats["by_endpoint"][name] = stats["by_endpoint"].get(name, 0) + 1
+
+    def _failure():
+        if random.random() < fault["fail_rate"]:
+            stats["failed"] += 1
+            return web.json_response({"error": {"code": 9999, "message": "Internal application error."}}, status=503)
+        return None
+
+    async def current(request: web.Request):
+        _count("current.json")
+        stats["locations"] += 1
+        await _delay()
+        return _failure() or web.json_response(sample_current(request.query.get("q", "")))
+
+    async def current_bulk(request: web.Request):
+        _count("current.json:bulk")
+        if not bulk or request.query.get("q") != "bulk":
+            return web.json_response(
+                {"error": {"code": 2009, "message": "API key does not have access to the resource."}}, status=403
+            )
+        locations = (await request.json()).get("locations") or []
+        if len(locations) > BULK_MAX:
+            return web.json_response({"error": {"code": 9000, "message": "Too many locations"}}, status=400)
+        stats["locations"] += len(locations)
+        await _delay()
+        return _failure() or web.json_response(sample_bulk(locations))
+
+    async def forecast(request: web.Request):
+        _count("forecast.json")
+        await _delay()
+        return _failure() or web.json_response(
+            sample_forecast(request.query.get("q", ""), int(request.query.get("days", "1")))
+        )
+
+    async def get_stats(request: web.Request):
+        return web.json_response(stats)
+
+    app = web.Application()
+    app.router.add_get("/v1/current.json", current)
+    app.router.add_post("/v1/current.json", current_bulk)
+    app.router.add_get("/v1/forecast.json", forecast)
+    app.router.add_get("/stats", get_stats)
+    app["stats"] = stats
+    app["fault"] = fault
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8799)
+    parser.add_argument("--latency-ms", type=float, default=50.0)
+    parser.add_argument("--jitter-ms", type=float, default=20.0)
+    parser.add_argument("--no-bulk", action="store_true", help="refuse les requêtes bulk (403)")
+    parser.add_argument("--slow-rate", type=float, default=0.0, help="part des requêtes très lentes")
+    parser.add_argument("--slow-ms", type=float, default=2000.0)
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="part des requêtes en 503")
+    args = parser.parse_args()
+    app = make_app(
+        args.latency_ms,
+        args.jitter_ms,
+        bulk=not args.no_bulk,
+        slow_rate=args.slow_rate,
+        slow_ms=args.slow_ms,
+        fail_rate=args.fail_rate,
+    )
+    web.run_app(app, host=args.host, port=args.port, print=None)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Lanceur production : gunicorn + workers uvicorn, modèle chargé UNE fois dans le master.
+
+    gunicorn -c gunicorn.conf.py app.main:app
+
+Avec `preload_app`, le master importe l'app et charge/warm le modèle avant de
+forker : les workers partagent les pages mémoire du modèle en copy-on-write
+au lieu de refaire chacun le chargement (et de multiplier la RAM torch par N).
+"""
+import gc
+import multiprocessing
+import os
+
+bind = os.getenv("BIND", "0.0.0.0:8000")
+workers = int(os.getenv("WEB_CONCURRENCY", str(multiprocessing.cpu_count())))
+worker_class = "uvicorn_worker.UvicornWorker"
+preload_app = True
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
+graceful_timeout = 30
+keepalive = 5
+
+# Threads torch par worker : les cœurs sont répartis entre workers (pas de sur-souscription)
+TORCH_THREADS = int(os.getenv("TORCH_THREADS_PER_WORKER", str(max(1, multiprocessing.cpu_count() // workers))))
+
+# Chaque worker fait tourner son propre poller (snapshots, cache WeatherAPI et abonnés SSE
+# sont locaux au process) : le coût amont est multiplié par `workers`. Sauf réglage
+# explicite, l'intervalle par worker est allongé pour garder le débit amont d'un seul
+# process, borné pour que les snapshots restent servis (< SNAPSHOT_MAX_AGE_S).
+# Lu par app.services.poller à l'import de l'app (preload), donc avant le fork.
+if "POLLER_INTERVAL_S" not in os.environ:
+    _max_age = float(os.getenv("SNAPSHOT_MAX_AGE_S", "900"))
+    os.environ["POLLER_INTERVAL_S"] = str(min(300.0 * workers, 0.8 * _max_age))
+POLLER_INTERVAL_S = float(os.environ["POLLER_INTERVAL_S"])
+
+
+def _set_torch_threads(n: int):
+    os.environ["OMP_NUM_THREADS"] = str(n)
+    os.environ["MKL_NUM_THREADS"] = str(n)
+    try:
+        import torch
+    except ImportError:  # backend NumPy : pas de torch
+        return
+    torch.set_num_threads(n)
+
+
+def on_starting(server):
+    # Le master ne fait qu'un chargement : on reste mono-thread pour que le fork
+    # ne duplique pas un pool OpenMP actif (source de blocages dans les enfants).
+    _set_torch_threads(1)
+
+
+def when_ready(server):
+    from app.main import get_model
+
+    try:
+        get_model()
+        server.log.info("Modèle chargé dans le master (partagé en copy-on-write)")
+    except Exception:
+        # Les workers retenteront le chargement (lifespan / première requête)
+        server.log.exception("Chargement du modèle dans le master impossible")
+
+    # Les objets existants ne seront plus parcourus par le GC : évite que les
+    # mises à jour de refcount/GC des workers ne dupliquent les pages partagées.
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    _set_torch_threads(TORCH_THREADS)
+    server.log.info(
+        f"Worker {worker.pid}: {TORCH_THREADS} thread(s) torch, poller toutes les {POLLER_INTERVAL_S:g} s "
+        f"({workers} pollers => ~{workers / POLLER_INTERVAL_S * 3600:.0f} tours/h vers WeatherAPI)"
+    )
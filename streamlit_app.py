@@ -1,11 +1,17 @@
 import os
+import copy
 import json
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
 from datetime import datetime
 from typing import Any, Dict, List, Optional, Tuple
 
 import pandas as pd
 import requests
 import streamlit as st
+from requests.adapters import HTTPAdapter
 
 # Plotly optionnel (si pas installé, on retombe sur charts Streamlit)
 try:
@@ -55,31 +61,232 @@ st.markdown(
 
 DEFAULT_API_BASE = os.getenv("API_BASE_URL", "http://127.0.0.1:8000").rstrip("/")
 
-# IMPORTANT: doit matcher exactement les valeurs acceptées par ton backend
+# Repli si le registre (/cities) est injoignable ; sinon la liste vient du backend
 VALID_CITIES = ["Montreal", "Trois-Rivieres"]
 
+# Rafraîchissement automatique de la section temps réel seule (0 = désactivé)
+UI_REALTIME_REFRESH_S = float(os.getenv("UI_REALTIME_REFRESH_S", "30"))
+
+# Flux SSE /realtime/stream : nombre max d'URLs d'API suivies, arrêt après inactivité
+UI_FEED_MAX = int(os.getenv("UI_FEED_MAX", "4"))
+UI_FEED_IDLE_S = float(os.getenv("UI_FEED_IDLE_S", "300"))
+
 
 # ===========================
 # HELPERS API
 # ===========================
 
-def api_get(api_base: str, path: str, params: Optional[dict] = None) -> dict:
-    url = f"{api_base.rstrip('/')}{path}"
-    r = requests.get(url, params=params, timeout=20)
-    r.raise_for_status()
-    return r.json()
+class ConditionalStore:
+    """
+    Dernière réponse (ETag, JSON) par URL : `api_get` envoie `If-None-Match`,
+    un 304 réutilise le JSON déjà parsé (ni corps transféré, ni parsing).
+    """
+
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self._data: "OrderedDict[str, Tuple[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Tuple[str, Any]]:
+        with self._lock:
+            item = self._data.get(key)
+            if item is not None:
+                self._data.move_to_end(key)
+            return item
+
+    def set(self, key: str, etag: str, data: Any):
+        with self._lock:
+            self._data[key] = (etag, data)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
 
-def api_post(api_base: str, path: str, payload: dict) -> dict:
+@st.cache_resource
+def conditional_store() -> ConditionalStore:
+    return ConditionalStore()
+
+
+@st.cache_resource
+def http_session() -> requests.Session:
+    """Session keep-alive partagée par toutes les sessions Streamlit (pool de connexions vers l'API)."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def api_get(api_base: str, path: str, params: Optional[dict] = None) -> dict:
     url = f"{api_base.rstrip('/')}{path}"
-    r = requests.post(url, json=payload, timeout=40)
+    key = requests.Request("GET", url, params=params).prepare().url
+    store = conditional_store()
+    cached = store.get(key)
+    headers = {"If-None-Match": cached[0]} if cached else None
+    r = http_session().get(url, params=params, headers=headers, timeout=20)
+    if r.status_code == 304 and cached:
+        return copy.deepcopy(cached[1])
     r.raise_for_status()
-    return r.json()
+    data = r.json()
+    etag = r.headers.get("ETag")
+    if etag:
+        store.set(key, etag, copy.deepcopy(data))
+    return data
 
 @st.cache_data(ttl=60)
 def cached_realtime(api_base: str) -> dict:
     # /realtime renvoie déjà les 2 villes
     return api_get(api_base, "/realtime")
 
+@st.cache_data(ttl=60)
+def cached_realtime_city(api_base: str, city: str) -> dict:
+    # Villes hors de la liste par défaut de /realtime
+    return api_get(api_base, "/realtime", params={"city": city})
+
+@st.cache_data(ttl=3600)
+def cached_cities(api_base: str) -> List[str]:
+    try:
+        return api_get(api_base, "/cities").get("cities") or VALID_CITIES
+    except Exception:
+        return VALID_CITIES
+
+def merge_delta(target: dict, delta: dict):
+    """Applique un `event: delta` de /realtime/stream (champs modifiés, récursif)."""
+    for k, v in delta.items():
+        if isinstance(v, dict) and isinstance(target.get(k), dict):
+            merge_delta(target[k], v)
+        else:
+            target[k] = v
+
+
+class RealtimeFeed:
+    """
+    Abonnement SSE à /realtime/stream (villes par défaut, sans `?city=` : le poller du backend
+    n'est jamais agrandi par l'UI), partagé par tous les onglets du serveur Streamlit :
+    une seule connexion vers l'API, quel que soit le nombre de viewers.
+
+    Le thread s'arrête de lui-même après `idle_s` sans lecture, ou après `max_client_errors`
+    réponses 4xx consécutives (URL qui n'est pas l'API : inutile de réessayer en boucle).
+    """
+
+    def __init__(self, api_base: str, idle_s: float = UI_FEED_IDLE_S, max_client_errors: int = 3):
+        self.api_base = api_base
+        self.idle_s = idle_s
+        self.max_client_errors = max_client_errors
+        self.cities: Dict[str, dict] = {}
+        self.connected = False
+        self.failed = False
+        self.last_used = time.monotonic()
+        self.stopped_at: Optional[float] = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    @property
+    def alive(self) -> bool:
+        return self._thread.is_alive()
+
+    def stop(self):
+        self._stop.set()
+
+    def _done(self) -> bool:
+        return self._stop.is_set() or time.monotonic() - self.last_used > self.idle_s
+
+    def _run(self):
+        client_errors = 0
+        while not self._done():
+            try:
+                # Timeout de lecture > heartbeat serveur (15 s)
+                with requests.get(f"{self.api_base}/realtime/stream", stream=True, timeout=(5, 60)) as r:
+                    r.raise_for_status()
+                    client_errors = 0
+                    self.connected = True
+                    event, data = None, []
+                    for line in r.iter_lines(decode_unicode=True):
+                        if self._done():
+                            break
+                        if line is None:
+                            continue
+                        if line == "":
+                            if event and data:
+                                self._apply(event, json.loads("\n".join(data)))
+                            event, data = None, []
+                        elif line.startswith("event:"):
+                            event = line[6:].strip()
+                        elif line.startswith("data:"):
+                            data.append(line[5:].strip())
+            except requests.HTTPError as e:
+                status = e.response.status_code if e.response is not None else 0
+                if 400 <= status < 500:
+                    client_errors += 1
+                    if client_errors >= self.max_client_errors:
+                        self.failed = True
+                        break
+            except Exception:
+                pass
+            self.connected = False
+            self._stop.wait(5)
+        self.connected = False
+        self.stopped_at = time.monotonic()
+
+    def _apply(self, event: str, msg: dict):
+        with self._lock:
+            if event == "snapshot":
+                self.cities[msg["city"]] = msg["data"]
+            elif event == "delta" and msg["city"] in self.cities:
+                merge_delta(self.cities[msg["city"]], msg["delta"])
+
+    def get(self, city: str) -> Optional[dict]:
+        self.last_used = time.monotonic()
+        with self._lock:
+            data = self.cities.get(city)
+            return copy.deepcopy(data) if data is not None else None
+
+    def payload(self) -> Optional[dict]:
+        """Même forme que la réponse /realtime (None tant que rien n'a été reçu)."""
+        self.last_used = time.monotonic()
+        with self._lock:
+            if not self.cities:
+                return None
+            return {"cities": copy.deepcopy(list(self.cities.values()))}
+
+
+class FeedRegistry:
+    """
+    Flux SSE par URL d'API, au plus `max_feeds` : le moins récemment lu est arrêté en premier.
+    Un flux arrêté faute de lecteurs repart au besoin ; un flux en échec (4xx) n'est
+    retenté qu'après `retry_s`.
+    """
+
+    def __init__(self, max_feeds: int = UI_FEED_MAX, retry_s: float = UI_FEED_IDLE_S):
+        self.max_feeds = max_feeds
+        self.retry_s = retry_s
+        self._feeds: "OrderedDict[str, RealtimeFeed]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, api_base: str, create: bool = True) -> Optional[RealtimeFeed]:
+        with self._lock:
+            feed = self._feeds.get(api_base)
+            if feed is not None and not feed.alive:
+                if not feed.failed or time.monotonic() - feed.stopped_at > self.retry_s:
+                    del self._feeds[api_base]
+                    feed = None
+            if feed is None:
+                if not create:
+                    return None
+                feed = self._feeds[api_base] = RealtimeFeed(api_base)
+            self._feeds.move_to_end(api_base)
+            while len(self._feeds) > self.max_feeds:
+                _, oldest = self._feeds.popitem(last=False)
+                oldest.stop()
+            return feed
+
+
+@st.cache_resource
+def feed_registry() -> FeedRegistry:
+    return FeedRegistry()
+
 def fetch_realtime_for_city(realtime_payload: dict, city: str) -> Optional[dict]:
     for c in realtime_payload.get("cities", []):
         if c.get("city") == city:
@@ -114,6 +321,7 @@ def safe_float(x: Any) -> Optional[float]:
     except Exception:
         return None
 
+@st.cache_data(max_entries=64, show_spinner=False)
 def mk_pollutants_df(pollutants_ugm3: Dict[str, Any]) -> pd.DataFrame:
     rows = []
     for k, v in (pollutants_ugm3 or {}).items():
@@ -123,6 +331,7 @@ def mk_pollutants_df(pollutants_ugm3: Dict[str, Any]) -> pd.DataFrame:
         df = df.sort_values("Polluant")
     return df
 
+@st.cache_data(max_entries=64, show_spinner=False)
 def mk_weather_df(weather: Dict[str, Any]) -> pd.DataFrame:
     if not weather:
         return pd.DataFrame(columns=["Variable", "Valeur"])
@@ -135,6 +344,7 @@ def mk_weather_df(weather: Dict[str, Any]) -> pd.DataFrame:
     return df
 
 
+@st.cache_data(max_entries=64, show_spinner=False)
 def mk_features_df(feats: Dict[str, Any]) -> pd.DataFrame:
     if not feats:
         return pd.DataFrame(columns=["Feature", "Valeur"])
@@ -147,6 +357,66 @@ def mk_features_df(feats: Dict[str, Any]) -> pd.DataFrame:
     return df
 
 
+@st.cache_data(max_entries=64, show_spinner=False)
+def mk_comparison_df(city_blocks: List[dict]) -> pd.DataFrame:
+    rows = []
+    for city_block in city_blocks:
+        a = (city_block.get("current_air_quality", {}) or {})
+        p = (a.get("pollutants_ugm3", {}) or {})
+        aq = (a.get("aqi", {}) or {})
+        rows.append({
+            "city": city_block.get("city"),
+            "ts": city_block.get("ts"),
+            "CO (µg/m³)": safe_float(p.get("CO")),
+            "NO2 (µg/m³)": safe_float(p.get("NO2")),
+            "PM2.5 (µg/m³)": safe_float(p.get("PM2.5")),
+            "AQI (US EPA)": safe_float(aq.get("us_epa_index")),
+        })
+    return pd.DataFrame(rows)
+
+
+# Figures Plotly reconstruites seulement quand leurs données changent
+@st.cache_data(max_entries=64, show_spinner=False)
+def pollutants_figure(pol_df: pd.DataFrame):
+    return px.bar(pol_df, x="Polluant", y="Valeur (µg/m³)", title="Concentrations (µg/m³)")
+
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def trend_figure(h_city: pd.DataFrame):
+    fig = go.Figure()
+    x = h_city["ts_dt"] if "ts_dt" in h_city.columns else h_city["ts"]
+    fig.add_trace(go.Scatter(x=x, y=h_city["CO"], mode="lines+markers", name="CO (µg/m³)"))
+    fig.add_trace(go.Scatter(x=x, y=h_city["NO2"], mode="lines+markers", name="NO2 (µg/m³)"))
+    fig.update_layout(
+        title="CO & NO2 (depuis les rafraîchissements)",
+        xaxis_title="Temps",
+        yaxis_title="µg/m³",
+        hovermode="x unified",
+        height=330,
+    )
+    return fig
+
+
+# ===========================
+# TEMPS DE RENDU PAR SECTION
+# ===========================
+
+@contextmanager
+def timed(section: str):
+    """`with timed("Temps réel"):` mesure le rendu d'une section (panneau de la barre latérale)."""
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings = st.session_state.setdefault("timings", {})
+        runs = timings.get(section, {}).get("runs", 0) + 1
+        timings[section] = {
+            "ms": (time.perf_counter() - t0) * 1000,
+            "runs": runs,
+            "at": datetime.now().strftime("%H:%M:%S"),
+        }
+
+
 
 # ===========================
 # SESSION HISTORY (optionnel mais utile pour "tendance")
@@ -154,10 +424,12 @@ def mk_features_df(feats: Dict[str, Any]) -> pd.DataFrame:
 
 def init_history():
     if "history" not in st.session_state:
-        st.session_state.history = []  # list of dict rows
+        st.session_state.history = {}  # (city, ts) -> row : une ligne par mesure, pas par rerun
 
 def append_history(city: str, ts: str, pollutants: Dict[str, Any], aqi: Dict[str, Any]):
     init_history()
+    if (city, ts) in st.session_state.history:
+        return
     row = {
         "city": city,
         "ts": ts,
@@ -169,13 +441,11 @@ def append_history(city: str, ts: str, pollutants: Dict[str, Any], aqi: Dict[str
         "SO2": safe_float(pollutants.get("SO2")),
         "us_epa_index": safe_float(aqi.get("us_epa_index")),
     }
-    st.session_state.history.append(row)
+    st.session_state.history[(city, ts)] = row
 
-def history_df() -> pd.DataFrame:
-    init_history()
-    if not st.session_state.history:
-        return pd.DataFrame()
-    df = pd.DataFrame(st.session_state.history)
+@st.cache_data(max_entries=32, show_spinner=False)
+def _history_frame(rows: List[dict]) -> pd.DataFrame:
+    df = pd.DataFrame(rows)
     # convert ts for plotting if possible
     try:
         df["ts_dt"] = pd.to_datetime(df["ts"])
@@ -183,6 +453,263 @@ def history_df() -> pd.DataFrame:
         df["ts_dt"] = df["ts"]
     return df
 
+def history_df() -> pd.DataFrame:
+    init_history()
+    if not st.session_state.history:
+        return pd.DataFrame()
+    return _history_frame(list(st.session_state.history.values()))
+
+
+# ===========================
+# SECTIONS (fragments : chacune se ré-exécute seule)
+# ===========================
+
+def load_realtime(api_base: str, city: str, use_feed: bool = True) -> Optional[Tuple[dict, dict]]:
+    """(payload /realtime des villes par défaut, ville sélectionnée) ; None après affichage de l'erreur."""
+    # Villes par défaut : flux SSE partagé, sinon appel /realtime
+    registry = feed_registry()
+    feed = registry.get(api_base, create=False) if use_feed else None
+    rt = feed.payload() if feed is not None else None
+    if rt is None:
+        try:
+            with st.spinner("📡 Récupération des données temps réel..."):
+                rt = cached_realtime(api_base)
+        except Exception as e:
+            st.error("❌ Impossible de joindre l’API (/realtime). Vérifie que FastAPI tourne.")
+            st.exception(e)
+            return None
+        # L'URL répond comme l'API : flux démarré pour les rendus suivants
+        # (pas de thread pour une URL mal saisie)
+        registry.get(api_base)
+
+    # Ville hors liste par défaut : /realtime?city= (cache 60 s), sans flux dédié
+    selected = fetch_realtime_for_city(rt, city)
+    if not selected:
+        try:
+            selected = (cached_realtime_city(api_base, city).get("cities") or [None])[0]
+        except Exception as e:
+            st.error(f"❌ Impossible de récupérer /realtime pour {city}.")
+            st.exception(e)
+            return None
+    if not selected:
+        st.error("❌ Ville introuvable dans la réponse /realtime.")
+        st.code(json.dumps(rt, indent=2, ensure_ascii=False), language="json")
+        return None
+    return rt, selected
+
+
+@st.fragment(run_every=UI_REALTIME_REFRESH_S or None)
+def realtime_section(api_base: str, city: str):
+    with timed("Temps réel"):
+        # « Rafraîchir » : une lecture /realtime directe plutôt que le flux
+        use_feed = not st.session_state.pop("bypass_feed", False)
+        loaded = load_realtime(api_base, city, use_feed=use_feed)
+        # Réutilisé par la section téléchargements (une seule lecture par rendu)
+        st.session_state.realtime = loaded
+        if loaded is None:
+            return
+        rt, selected = loaded
+
+        # Extract blocks
+        air = selected.get("current_air_quality", {}) or {}
+        pollutants = (air.get("pollutants_ugm3", {}) or {})
+        aqi = (air.get("aqi", {}) or {})
+        availability = (air.get("availability", {}) or {})
+        weather = selected.get("current_weather", {}) or {}
+        feats = selected.get("features_used_for_prediction", {}) or {}
+
+        us_epa = safe_float(aqi.get("us_epa_index"))
+        aqi_text, aqi_emoji = aqi_label(us_epa)
+
+        # Append to history (for trend chart)
+        append_history(
+            city=selected.get("city", city),
+            ts=str(selected.get("ts", "")),
+            pollutants=pollutants,
+            aqi=aqi
+        )
+
+        # Header + metadata
+        st.subheader(f"📍 Temps réel — {selected.get('city')}")
+        st.caption(
+            f"Source: {selected.get('source')} • Timestamp: {selected.get('ts')} • "
+            f"Coord: ({selected.get('lat')}, {selected.get('lon')})"
+        )
+
+        # Top metrics
+        c1, c2, c3, c4 = st.columns(4)
+        with c1:
+            st.metric("AQI (US EPA)", f"{aqi_emoji} {us_epa if us_epa is not None else '—'}")
+            st.caption(aqi_text)
+        with c2:
+            st.metric("CO (µg/m³)", f"{pollutants.get('CO') if pollutants.get('CO') is not None else '—'}")
+        with c3:
+            st.metric("NO₂ (µg/m³)", f"{pollutants.get('NO2') if pollutants.get('NO2') is not None else '—'}")
+        with c4:
+            st.metric("PM2.5 (µg/m³)", f"{pollutants.get('PM2.5') if pollutants.get('PM2.5') is not None else '—'}")
+
+        # Availability note
+        missing = [k for k, ok in availability.items() if ok is False]
+        if missing:
+            st.info(f"Certaines données ne sont pas disponibles via la source actuelle: {', '.join(missing)}")
+
+        st.markdown("---")
+
+        # Layout: Pollutants / Weather+Features
+        left, right = st.columns([1.25, 1.0])
+
+        with left:
+            st.markdown("### 🌫️ Polluants (µg/m³)")
+            pol_df = mk_pollutants_df(pollutants)
+            st.dataframe(pol_df, width="stretch")
+
+            if not pol_df.empty:
+                if PLOTLY_OK:
+                    st.plotly_chart(pollutants_figure(pol_df), width="stretch")
+                else:
+                    st.bar_chart(pol_df.set_index("Polluant"), height=280)
+
+            st.markdown("### 📈 Tendance (historique local UI)")
+            hdf = history_df()
+            if hdf.empty:
+                st.caption("Aucune donnée historique (rafraîchis pour accumuler).")
+            else:
+                # chart only for selected city
+                h_city = hdf[hdf["city"] == selected.get("city")]
+                if not h_city.empty:
+                    if PLOTLY_OK:
+                        st.plotly_chart(trend_figure(h_city), width="stretch")
+                    else:
+                        st.line_chart(h_city.set_index("ts_dt")[["CO", "NO2"]], height=280)
+
+        with right:
+            st.markdown("### 🌤️ Météo (actuelle)")
+            st.dataframe(mk_weather_df(weather), width="stretch")
+
+            st.markdown("### 🧠 Features utilisées pour la prédiction")
+            st.dataframe(mk_features_df(feats), width="stretch")
+
+            st.markdown("### 🧩 Comparaison rapide (Montréal vs Trois-Rivières)")
+            # Use rt payload to build a tiny comparison table
+            st.dataframe(mk_comparison_df(rt.get("cities", [])), width="stretch")
+
+
+@st.fragment
+def prediction_section(api_base: str, city: str):
+    # Le clic ne ré-exécute que cette section (pas le temps réel ni les graphiques)
+    with timed("Prédiction"):
+        st.subheader("🔮 Prédiction CO (via le backend FastAPI)")
+
+        st.caption("Le frontend n’exécute aucun modèle : il appelle uniquement l’endpoint `/predict`.")
+
+        btn_col, info_col = st.columns([0.25, 0.75])
+        with btn_col:
+            do_pred = st.button("📈 Lancer la prédiction", type="primary")
+        with info_col:
+            st.info("Démo facile : montre `/realtime` (temps réel) puis clique sur 'Lancer la prédiction'.")
+
+        predictions = st.session_state.setdefault("predictions", {})
+        if do_pred:
+            try:
+                with st.spinner("🧠 Appel à /predict..."):
+                    # GET : 304 si la prédiction n'a pas changé (même heure cible, mêmes entrées)
+                    predictions[city] = api_get(api_base, "/predict", params={"city": city})
+            except Exception as e:
+                st.error("❌ Erreur lors de l’appel à `/predict`.")
+                st.exception(e)
+                return
+
+        pred = predictions.get(city)
+        if pred is None:
+            return
+
+        # Ton API renvoie: city, ds, yhat1, inputs
+        st.success("✅ Prédiction reçue.")
+        p1, p2, p3 = st.columns(3)
+        with p1:
+            st.metric("Ville", pred.get("city", city))
+        with p2:
+            st.metric("Timestamp prédit (ds)", pred.get("ds", "—"))
+        with p3:
+            st.metric("CO prédit (valeur API)", pred.get("yhat1", "—"))
+
+        with st.expander("Voir le JSON de prédiction"):
+            st.code(json.dumps(pred, indent=2, ensure_ascii=False), language="json")
+
+
+@st.fragment
+def downloads_section(city: str):
+    with timed("Téléchargements"):
+        st.subheader("💾 Télécharger les données")
+        loaded = st.session_state.get("realtime")
+        if loaded is None:
+            st.caption("Aucune donnée temps réel à télécharger.")
+            return
+        rt, selected = loaded
+        colD1, colD2, colD3 = st.columns(3)
+
+        with colD1:
+            st.download_button(
+                "📥 Télécharger /realtime (JSON)",
+                data=json.dumps(rt, indent=2, ensure_ascii=False),
+                file_name=f"realtime_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json",
+                mime="application/json",
+            )
+
+        with colD2:
+            merged = {
+                "city": selected.get("city"),
+                "ts": selected.get("ts"),
+                "source": selected.get("source"),
+                "lat": selected.get("lat"),
+                "lon": selected.get("lon"),
+                "current_air_quality": selected.get("current_air_quality"),
+                "current_weather": selected.get("current_weather"),
+                "features_used_for_prediction": selected.get("features_used_for_prediction"),
+            }
+            st.download_button(
+                "📥 Ville sélectionnée (JSON)",
+                data=json.dumps(merged, indent=2, ensure_ascii=False),
+                file_name=f"{city}_details_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json",
+                mime="application/json",
+            )
+
+        with colD3:
+            hdf = history_df()
+            if hdf.empty:
+                st.download_button(
+                    "📥 Historique UI (CSV)",
+                    data="",
+                    file_name="history_empty.csv",
+                    mime="text/csv",
+                    disabled=True
+                )
+            else:
+                st.download_button(
+                    "📥 Historique UI (CSV)",
+                    data=hdf.to_csv(index=False),
+                    file_name=f"history_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
+                    mime="text/csv",
+                )
+
+
+@st.fragment(run_every=5)
+def timing_panel():
+    """Durée du dernier rendu de chaque section (les fragments se ré-exécutent seuls)."""
+    timings = st.session_state.get("timings") or {}
+    with st.expander("⏱️ Temps de rendu par section", expanded=False):
+        if not timings:
+            st.caption("Aucune mesure pour l’instant.")
+            return
+        st.dataframe(
+            pd.DataFrame([
+                {"Section": name, "Dernier rendu (ms)": round(t["ms"], 1), "Exécutions": t["runs"], "À": t["at"]}
+                for name, t in timings.items()
+            ]),
+            hide_index=True,
+            width="stretch",
+        )
+
 
 # ===========================
 # APP
@@ -193,7 +720,7 @@ def main():
     st.markdown('<div class="subtle">Frontend Streamlit connecté à ton backend FastAPI : <code>/realtime</code> et <code>/predict</code></div>', unsafe_allow_html=True)
 
     # Sidebar
-    with st.sidebar:
+    with timed("Barre latérale"), st.sidebar:
         st.header("⚙️ Configuration")
 
         api_base = st.text_input(
@@ -202,239 +729,41 @@ def main():
             help="Ex: http://127.0.0.1:8000",
         ).rstrip("/")
 
-        city = st.selectbox("Ville", VALID_CITIES, index=0)
+        cities = cached_cities(api_base)
+        city = st.selectbox("Ville", cities, index=cities.index("Montreal") if "Montreal" in cities else 0)
 
         st.markdown("---")
         colA, colB = st.columns(2)
         with colA:
             if st.button("🔄 Rafraîchir", type="primary"):
                 cached_realtime.clear()
+                cached_realtime_city.clear()
+                st.session_state.bypass_feed = True
                 st.rerun()
         with colB:
             if st.button("🧹 Vider historique"):
-                st.session_state.history = []
+                st.session_state.history = {}
                 st.rerun()
 
         st.markdown("---")
-        st.caption("Cache /realtime : 60 secondes (pour éviter de spam l’API).")
+        st.caption("Temps réel poussé par le flux SSE /realtime/stream (repli : cache /realtime de 60 s).")
+        if UI_REALTIME_REFRESH_S:
+            st.caption(f"Section temps réel ré-affichée seule toutes les {UI_REALTIME_REFRESH_S:g} s.")
 
         st.markdown("---")
         st.caption("Astuce terminal :")
         st.code("export API_BASE_URL=http://127.0.0.1:8000", language="bash")
 
-    # Fetch realtime (both cities)
-    try:
-        with st.spinner("📡 Récupération des données temps réel..."):
-            rt = cached_realtime(api_base)
-    except Exception as e:
-        st.error("❌ Impossible de joindre l’API (/realtime). Vérifie que FastAPI tourne.")
-        st.exception(e)
-        return
-
-    selected = fetch_realtime_for_city(rt, city)
-    if not selected:
-        st.error("❌ Ville introuvable dans la réponse /realtime.")
-        st.code(json.dumps(rt, indent=2, ensure_ascii=False), language="json")
-        return
-
-    # Extract blocks
-    air = selected.get("current_air_quality", {}) or {}
-    pollutants = (air.get("pollutants_ugm3", {}) or {})
-    aqi = (air.get("aqi", {}) or {})
-    availability = (air.get("availability", {}) or {})
-    weather = selected.get("current_weather", {}) or {}
-    feats = selected.get("features_used_for_prediction", {}) or {}
-
-    us_epa = safe_float(aqi.get("us_epa_index"))
-    aqi_text, aqi_emoji = aqi_label(us_epa)
-
-    # Append to history (for trend chart)
-    append_history(
-        city=selected.get("city", city),
-        ts=str(selected.get("ts", "")),
-        pollutants=pollutants,
-        aqi=aqi
-    )
-
-    # Header + metadata
-    st.subheader(f"📍 Temps réel — {selected.get('city')}")
-    st.caption(
-        f"Source: {selected.get('source')} • Timestamp: {selected.get('ts')} • "
-        f"Coord: ({selected.get('lat')}, {selected.get('lon')})"
-    )
-
-    # Top metrics
-    c1, c2, c3, c4 = st.columns(4)
-    with c1:
-        st.metric("AQI (US EPA)", f"{aqi_emoji} {us_epa if us_epa is not None else '—'}")
-        st.caption(aqi_text)
-    with c2:
-        st.metric("CO (µg/m³)", f"{pollutants.get('CO') if pollutants.get('CO') is not None else '—'}")
-    with c3:
-        st.metric("NO₂ (µg/m³)", f"{pollutants.get('NO2') if pollutants.get('NO2') is not None else '—'}")
-    with c4:
-        st.metric("PM2.5 (µg/m³)", f"{pollutants.get('PM2.5') if pollutants.get('PM2.5') is not None else '—'}")
-
-    # Availability note
-    missing = [k for k, ok in availability.items() if ok is False]
-    if missing:
-        st.info(f"Certaines données ne sont pas disponibles via la source actuelle: {', '.join(missing)}")
+    realtime_section(api_base, city)
 
     st.markdown("---")
-
-    # Layout: Pollutants / Weather+Features
-    left, right = st.columns([1.25, 1.0])
-
-    with left:
-        st.markdown("### 🌫️ Polluants (µg/m³)")
-        pol_df = mk_pollutants_df(pollutants)
-        st.dataframe(pol_df, width="stretch")
-
-        if not pol_df.empty:
-            if PLOTLY_OK:
-                fig = px.bar(pol_df, x="Polluant", y="Valeur (µg/m³)", title="Concentrations (µg/m³)")
-                st.plotly_chart(fig, width="stretch")
-            else:
-                st.bar_chart(pol_df.set_index("Polluant"), height=280)
-
-        st.markdown("### 📈 Tendance (historique local UI)")
-        hdf = history_df()
-        if hdf.empty:
-            st.caption("Aucune donnée historique (rafraîchis pour accumuler).")
-        else:
-            # chart only for selected city
-            h_city = hdf[hdf["city"] == selected.get("city")]
-            if not h_city.empty:
-                if PLOTLY_OK:
-                    fig2 = go.Figure()
-                    if "ts_dt" in h_city.columns:
-                        x = h_city["ts_dt"]
-                    else:
-                        x = h_city["ts"]
-                    fig2.add_trace(go.Scatter(x=x, y=h_city["CO"], mode="lines+markers", name="CO (µg/m³)"))
-                    fig2.add_trace(go.Scatter(x=x, y=h_city["NO2"], mode="lines+markers", name="NO2 (µg/m³)"))
-                    fig2.update_layout(
-                        title="CO & NO2 (depuis les rafraîchissements)",
-                        xaxis_title="Temps",
-                        yaxis_title="µg/m³",
-                        hovermode="x unified",
-                        height=330,
-                    )
-                    st.plotly_chart(fig2, width="stretch")
-                else:
-                    st.line_chart(h_city.set_index("ts_dt")[["CO", "NO2"]], height=280)
-
-    with right:
-        st.markdown("### 🌤️ Météo (actuelle)")
-        w_df = mk_weather_df(weather)
-        st.dataframe(w_df, width="stretch")
-
-        st.markdown("### 🧠 Features utilisées pour la prédiction")
-        f_df = mk_features_df(feats)
-        st.dataframe(f_df, width="stretch")
-
-        st.markdown("### 🧩 Comparaison rapide (Montréal vs Trois-Rivières)")
-        # Use rt payload to build a tiny comparison table
-        comp_rows = []
-        for city_block in rt.get("cities", []):
-            a = (city_block.get("current_air_quality", {}) or {})
-            p = (a.get("pollutants_ugm3", {}) or {})
-            aq = (a.get("aqi", {}) or {})
-            comp_rows.append({
-                "city": city_block.get("city"),
-                "ts": city_block.get("ts"),
-                "CO (µg/m³)": safe_float(p.get("CO")),
-                "NO2 (µg/m³)": safe_float(p.get("NO2")),
-                "PM2.5 (µg/m³)": safe_float(p.get("PM2.5")),
-                "AQI (US EPA)": safe_float(aq.get("us_epa_index")),
-            })
-        comp_df = pd.DataFrame(comp_rows)
-        st.dataframe(comp_df, width="stretch")
+    prediction_section(api_base, city)
 
     st.markdown("---")
+    downloads_section(city)
 
-    # Prediction section
-    st.subheader("🔮 Prédiction CO (via le backend FastAPI)")
-
-    st.caption("Le frontend n’exécute aucun modèle : il appelle uniquement l’endpoint `/predict`.")
-
-    btn_col, info_col = st.columns([0.25, 0.75])
-    with btn_col:
-        do_pred = st.button("📈 Lancer la prédiction", type="primary")
-    with info_col:
-        st.info("Démo facile : montre `/realtime` (temps réel) puis clique sur 'Lancer la prédiction'.")
-
-    if do_pred:
-        try:
-            with st.spinner("🧠 Appel à /predict..."):
-                pred = api_post(api_base, "/predict", {"city": city})
-        except Exception as e:
-            st.error("❌ Erreur lors de l’appel à `/predict`.")
-            st.exception(e)
-            return
-
-        # Ton API renvoie: city, ds, yhat1, inputs
-        st.success("✅ Prédiction reçue.")
-        p1, p2, p3 = st.columns(3)
-        with p1:
-            st.metric("Ville", pred.get("city", city))
-        with p2:
-            st.metric("Timestamp prédit (ds)", pred.get("ds", "—"))
-        with p3:
-            st.metric("CO prédit (valeur API)", pred.get("yhat1", "—"))
-
-        with st.expander("Voir le JSON de prédiction"):
-            st.code(json.dumps(pred, indent=2, ensure_ascii=False), language="json")
-
-    st.markdown("---")
-
-    # Downloads
-    st.subheader("💾 Télécharger les données")
-    colD1, colD2, colD3 = st.columns(3)
-
-    with colD1:
-        st.download_button(
-            "📥 Télécharger /realtime (JSON)",
-            data=json.dumps(rt, indent=2, ensure_ascii=False),
-            file_name=f"realtime_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json",
-            mime="application/json",
-        )
-
-    with colD2:
-        merged = {
-            "city": selected.get("city"),
-            "ts": selected.get("ts"),
-            "source": selected.get("source"),
-            "lat": selected.get("lat"),
-            "lon": selected.get("lon"),
-            "current_air_quality": selected.get("current_air_quality"),
-            "current_weather": selected.get("current_weather"),
-            "features_used_for_prediction": selected.get("features_used_for_prediction"),
-        }
-        st.download_button(
-            "📥 Ville sélectionnée (JSON)",
-            data=json.dumps(merged, indent=2, ensure_ascii=False),
-            file_name=f"{city}_details_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json",
-            mime="application/json",
-        )
-
-    with colD3:
-        hdf = history_df()
-        if hdf.empty:
-            st.download_button(
-                "📥 Historique UI (CSV)",
-                data="",
-                file_name="history_empty.csv",
-                mime="text/csv",
-                disabled=True
-            )
-        else:
-            st.download_button(
-                "📥 Historique UI (CSV)",
-                data=hdf.to_csv(index=False),
-                file_name=f"history_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
-                mime="text/csv",
-            )
+    with st.sidebar:
+        timing_panel()
 
     st.caption(f"Dernière mise à jour UI : {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
 
@@ -0,0 +1,27 @@
+"""L'import de l'API ne doit charger aucun module lourd (torch, NeuralProphet, pandas...)."""
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+pytest.importorskip("fastapi")
+pytest.importorskip("aiohttp")
+
+from benchmarks.importtime import FORBIDDEN  # noqa: E402
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_app_main_import_is_light():
+    # Process neuf : le process pytest a pu importer ces modules par ailleurs
+    code = (
+        "import json, sys\n"
+        "import app.main\n"
+        f"print(json.dumps(sorted(m for m in {FORBIDDEN!r} if m in sys.modules)))\n"
+    )
+    proc = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, cwd=ROOT)
+    assert proc.returncode == 0, proc.stderr
+    loaded = json.loads(proc.stdout.strip().splitlines()[-1])
+    assert loaded == [], f"modules lourds importés par app.main : {loaded}"
@@ -0,0 +1,69 @@
+"""Parité du backend NumPy exporté avec `m.predict` NeuralProphet."""
+import pytest
+
+pytest.importorskip("neuralprophet")
+np = pytest.importorskip("numpy")
+pd = pytest.importorskip("pandas")
+
+from app.model_loader import ensure_model_loaded  # noqa: E402
+from app.services.features import build_future_df  # noqa: E402
+from app.services.inference import forecast_trajectory  # noqa: E402
+from app.services.numpy_engine import NumpyPredictor, export_numpy_model  # noqa: E402
+
+MODEL_PATH = "models/neuralprophet_co_deployable.pkl"
+TRAIN_CSV = "models/train_df_deploy.csv"
+FALLBACK = "models/airquality_fallback_final.csv"
+
+# Écart max toléré sur yhat1 (unités de y, mg/m³), comme benchmarks/bench_numpy_engine.py ;
+# NeuralProphet calcule en float32 (tendance extrapolée loin de l'entraînement => |yhat| grand)
+PARITY_ATOL = 1e-3
+PARITY_RTOL = 1e-5
+
+
+@pytest.fixture(scope="module")
+def models():
+    m = ensure_model_loaded(MODEL_PATH, TRAIN_CSV, backend="neuralprophet")
+    return m, NumpyPredictor(export_numpy_model(m))
+
+
+def fixed_frame(feats: dict, horizon: int = 1) -> "pd.DataFrame":
+    """Contexte fallback + horizon, sur des dates fixes (résultat indépendant de l'heure courante)."""
+    df = build_future_df(FALLBACK, feats, horizon=horizon)
+    df["ds"] = pd.date_range("2025-01-15 00:00", periods=len(df), freq="h")
+    return df
+
+
+@pytest.mark.parametrize("feats", [
+    {"T": 12.0, "RH": 55.0, "NO2(GT)": 40.0},
+    {"T": -25.0, "RH": 90.0, "NO2(GT)": 5.0},
+    {"T": 35.0, "RH": 10.0, "NO2(GT)": 250.0},
+])
+def test_yhat_matches_neuralprophet(models, feats):
+    m, npm = models
+    df = fixed_frame(feats)
+    ref = m.predict(df)["yhat1"].to_numpy(dtype=float)
+    got = npm.predict(df)["yhat1"].to_numpy(dtype=float)
+    assert len(got) == len(ref)
+    # Pas de prévision sur les n_lags premières lignes (lags AR incomplets), des deux côtés
+    np.testing.assert_array_equal(np.isnan(got), np.isnan(ref))
+    mask = ~np.isnan(ref)
+    assert mask.sum() == len(df) - m.n_lags
+    np.testing.assert_allclose(got[mask], ref[mask], rtol=PARITY_RTOL, atol=PARITY_ATOL)
+
+
+def test_stacked_series_do_not_share_lags(models):
+    _, npm = models
+    df = fixed_frame({"T": 12.0, "RH": 55.0, "NO2(GT)": 40.0})
+    single = npm.predict(df)["yhat1"].to_numpy(dtype=float)
+    stacked = pd.concat([df.assign(ID="a"), df.assign(ID="b")], ignore_index=True)
+    both = npm.predict(stacked)["yhat1"].to_numpy(dtype=float)
+    np.testing.assert_array_equal(both, np.concatenate([single, single]))
+
+
+def test_recursive_trajectory_matches(models):
+    # Avec lags AR, l'horizon se déroule pas à pas (y <- yhat1) : même chemin pour les deux backends
+    m, npm = models
+    df = fixed_frame({"T": 12.0, "RH": 55.0, "NO2(GT)": 40.0}, horizon=6)
+    ref = forecast_trajectory(m, df, 6)["yhat1"].to_numpy(dtype=float)
+    got = forecast_trajectory(npm, df, 6)["yhat1"].to_numpy(dtype=float)
+    np.testing.assert_allclose(got, ref, rtol=PARITY_RTOL, atol=PARITY_ATOL)
@@ -0,0 +1,122 @@
+"""Requêtes bulk WeatherAPI contre le serveur factice : démultiplexage, erreurs par lieu, repli 4xx."""
+import asyncio
+import socket
+from contextlib import asynccontextmanager
+
+import pytest
+
+pytest.importorskip("aiohttp")
+
+from aiohttp import web  # noqa: E402
+
+from app.services import weatherapi  # noqa: E402
+from benchmarks.weather_stub import make_app  # noqa: E402
+
+QUERIES = [f"{45 + i * 0.01:.4f},{-73.5 - i * 0.01:.4f}" for i in range(5)]
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+@pytest.fixture(autouse=True)
+def fresh_client(monkeypatch):
+    monkeypatch.setenv("WEATHER_API_KEY", "stub")
+    monkeypatch.setattr(weatherapi, "WEATHER_BULK_ENABLED", True)
+    monkeypatch.setattr(weatherapi, "WEATHER_HEDGE_ENABLED", False)
+    monkeypatch.setitem(weatherapi._bulk_state, "supported", True)
+    weatherapi.weather_cache.clear()
+    yield
+    weatherapi.weather_cache.clear()
+
+
+@asynccontextmanager
+async def stub_server(**kwargs):
+    """Serveur factice local ; le client partagé pointe dessus le temps du test."""
+    port = _free_port()
+    app = make_app(latency_ms=5, jitter_ms=0, **kwargs)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", port).start()
+    client = weatherapi.weather_client
+    base_url = client.base_url
+    client.base_url = f"http://127.0.0.1:{port}/v1"
+    await client.start()
+    try:
+        yield app["stats"]
+    finally:
+        await weatherapi.weather_bulk.stop()
+        await client.close()
+        client.base_url = base_url
+        await runner.cleanup()
+
+
+def _coords(payload: dict):
+    return f"{payload['location']['lat']:.4f},{payload['location']['lon']:.4f}"
+
+
+def test_bulk_demultiplexes_like_single_gets():
+    async def scenario():
+        async with stub_server() as stats:
+            singles = [await weatherapi._get_current(q) for q in QUERIES]
+            # Miss concurrents : regroupés par le micro-batcher en un seul POST
+            bulk = await asyncio.gather(*(weatherapi.fetch_weather_async(q) for q in QUERIES))
+            return singles, bulk, dict(stats["by_endpoint"])
+
+    singles, bulk, calls = asyncio.run(scenario())
+    assert calls.get("current.json:bulk") == 1
+    assert calls.get("current.json") == len(QUERIES)  # les GET unitaires seulement
+    for q, single, item in zip(QUERIES, singles, bulk):
+        # Chaque lieu reçoit sa propre réponse, identique à celle du GET unitaire
+        assert _coords(item) == q
+        assert item["current"] == single["current"]
+
+
+def test_bulk_reports_errors_per_location():
+    async def scenario():
+        async with stub_server():
+            return await weatherapi._fetch_current_batch([QUERIES[0], "", QUERIES[1]])
+
+    ok, missing, other = asyncio.run(scenario())
+    assert _coords(ok) == QUERIES[0]
+    assert isinstance(missing, ValueError)
+    assert _coords(other) == QUERIES[1]
+
+
+def test_split_bulk_flags_locations_absent_from_the_response():
+    payload = {"bulk": [{"query": {"custom_id": "1", "q": QUERIES[1], "location": {}, "current": {}}}]}
+    first, second = weatherapi.split_bulk(payload, 2)
+    assert isinstance(first, ValueError)
+    assert second == {"location": {}, "current": {}}
+
+
+def test_bulk_refused_falls_back_to_single_gets():
+    async def scenario():
+        async with stub_server(bulk=False) as stats:
+            first = await weatherapi._fetch_current_batch(QUERIES)
+            second = await weatherapi._fetch_current_batch(QUERIES)
+            return first, second, dict(stats["by_endpoint"])
+
+    first, second, calls = asyncio.run(scenario())
+    assert weatherapi._bulk_state["supported"] is False
+    # Un seul POST refusé (403), puis GET unitaires pour ce lot et les suivants
+    assert calls.get("current.json:bulk") == 1
+    assert calls.get("current.json") == 2 * len(QUERIES)
+    assert [_coords(p) for p in first] == QUERIES
+    assert [_coords(p) for p in second] == QUERIES
+
+
+def test_other_bulk_errors_only_affect_the_batch():
+    queries = [f"{46 + i * 0.01:.4f},-72.0000" for i in range(51)]  # > 50 lieux : 400 du serveur
+
+    async def scenario():
+        async with stub_server() as stats:
+            results = await weatherapi._fetch_current_batch(queries)
+            return results, dict(stats["by_endpoint"])
+
+    results, calls = asyncio.run(scenario())
+    assert weatherapi._bulk_state["supported"] is True
+    assert calls.get("current.json:bulk") == 1
+    assert [_coords(p) for p in results] == queries